@@ -1,3 +1,12 @@
 from .base import BaseDataSource, ImageItem
-from .cheesechaser import CheeseChaserDataSource
+from .codec import CodecProfile
 from .local import LocalDataSource
+from .mixed import MixedDataSource, SourceStats
+from .ordering import OrderedDataSource, OrderingStats
+from ..utils.lazy import lazy_attrs
+
+# cheesechaser is only loaded when that datasource is used
+__getattr__, __dir__ = lazy_attrs(__name__, globals(), {
+    'CheeseChaserDataSource': '.cheesechaser',
+    'PipeStats': '.cheesechaser',
+})
@@ -3,12 +3,14 @@ import pathlib
 from contextlib import contextmanager
 from dataclasses import dataclass
 from os import PathLike
-from typing import Union, Any, Optional, ContextManager, Iterator, Callable
+from typing import Union, Any, Optional, ContextManager, Iterator, Callable, List
 
 from PIL import Image
 from hbutils.random import random_sha1_with_timestamp
 from hbutils.system import TemporaryDirectory
-from imgutils.data import load_image, grid_transparent
+
+from .codec import CodecProfile, is_codec_format
+from ..utils.resize import load_image_fit, area_fit_size
 
 
 @dataclass
@@ -18,50 +20,58 @@ class ImageItem:
     annotation: Optional[Any]
 
     def make_pil(self, max_size: int = 1536, background_mode: str = 'white') -> Image.Image:
+        def _fn_size(size):
+            return area_fit_size(size, max_size ** 2)
+
         if background_mode == 'grid':
-            image = load_image(self.image, mode='RGBA', force_background=None)
-            image = grid_transparent(image).convert('RGB')
+            from imgutils.data import grid_transparent
+            image = load_image_fit(self.image, _fn_size, mode='RGBA', force_background=None)
+            return grid_transparent(image).convert('RGB')
         else:
-            image = load_image(self.image, mode='RGB', force_background=background_mode)
-
-        r = (image.width * image.height) / (max_size ** 2)
-        if r > 1.0:
-            new_width = int(round(image.width / r))
-            new_height = int(round(image.height / r))
-            image = image.resize((new_width, new_height))
-
-        return image
+            return load_image_fit(self.image, _fn_size, mode='RGB', force_background=background_mode)
 
     @contextmanager
     def make_file(self, max_size: int = 2048, format: str = 'webp', quality: Optional[int] = None,
-                  force_reencode: bool = False) -> ContextManager[str]:
-        if not force_reencode and isinstance(self.image, (str, PathLike)):
+                  force_reencode: bool = False, codec: Optional[CodecProfile] = None) -> ContextManager[str]:
+        if isinstance(self.image, (str, PathLike)) and not force_reencode and \
+                (codec is None or codec.is_compliant(self.image)):
+            # fast path, files are used as they are, with a codec only the already compliant ones
             yield str(pathlib.Path(self.image).resolve())
-        else:
+        elif codec is None and not is_codec_format(format):
+            # other formats are left to PIL, by the file extension
             with TemporaryDirectory() as td:
-                image = load_image(self.image, mode='RGB', force_background='white')
-                r = (image.width * image.height) / (max_size ** 2)
-                if r > 1.0:
-                    new_width = int(round(image.width / r))
-                    new_height = int(round(image.height / r))
-                    image = image.resize((new_width, new_height), resample=Image.BICUBIC)
-
+                image = load_image_fit(self.image, lambda size: area_fit_size(size, max_size ** 2))
                 filename = os.path.join(td, f'{self.id or random_sha1_with_timestamp()}.{format}')
                 save_cfg = {}
                 if quality:
                     save_cfg['quality'] = quality
                 image.save(filename, **save_cfg)
-
                 yield filename
+        else:
+            codec = codec or CodecProfile(format=format, max_size=max_size, quality=quality, passthrough=False)
+            with TemporaryDirectory() as td:
+                image = load_image_fit(self.image, lambda size: area_fit_size(size, codec.max_size ** 2))
+                filename = os.path.join(td, f'{self.id or random_sha1_with_timestamp()}.{codec.extension}')
+                yield codec.encode(image, filename)
 
 
 class BaseDataSource:
-    def __init__(self, fn_contains_id: Optional[Callable[[str], bool]] = None):
+    def __init__(self, fn_contains_id: Optional[Callable[[str], bool]] = None,
+                 fn_contains_ids: Optional[Callable[[List[str]], List[bool]]] = None):
         self._status = 'idle'
         self._fn_contains_id = fn_contains_id or (lambda x: False)
+        self._fn_contains_ids = fn_contains_ids
 
-    def set_fn_contains_id(self, fn_contains_id: Optional[Callable[[str], bool]] = None):
+    def set_fn_contains_id(self, fn_contains_id: Optional[Callable[[str], bool]] = None,
+                           fn_contains_ids: Optional[Callable[[List[str]], List[bool]]] = None):
         self._fn_contains_id = fn_contains_id or (lambda x: False)
+        self._fn_contains_ids = fn_contains_ids
+
+    def _contains_ids(self, ids: List[str]) -> List[bool]:
+        if self._fn_contains_ids:
+            return list(self._fn_contains_ids(ids))
+        else:
+            return [self._fn_contains_id(id_) for id_ in ids]
 
     def _iter(self):
         raise NotImplementedError  # pragma: no cover
@@ -1,4 +1,11 @@
-from typing import Optional, Callable, Union, Iterable
+import heapq
+import itertools
+import logging
+import time
+from dataclasses import dataclass
+from queue import Queue, Empty, Full
+from threading import Thread, Lock, Event, Semaphore
+from typing import Optional, Callable, Union, Iterable, List
 
 from cheesechaser.datapool import DataPool
 from cheesechaser.pipe import Pipe, SimpleImagePipe, PipeItem
@@ -7,9 +14,31 @@ from hbutils.string import underscore
 from .base import BaseDataSource
 
 
+@dataclass
+class PipeStats:
+    retrieved: int = 0
+    failed: int = 0
+    start_time: Optional[float] = None
+    end_time: Optional[float] = None
+
+    @property
+    def duration(self) -> float:
+        if self.start_time is None:
+            return 0.0
+        return (self.end_time or time.time()) - self.start_time
+
+    @property
+    def throughput(self) -> float:
+        return self.retrieved / self.duration if self.duration > 0 else 0.0
+
+
+_PIPE_END = object()
+
+
 class CheeseChaserDataSource(BaseDataSource):
     def __init__(self, source: Union[DataPool, Pipe], id_generator: Iterable[Union[str, int]],
-                 source_id: Optional[str] = None, fn_contains_id: Optional[Callable[[str], bool]] = None):
+                 source_id: Optional[str] = None, fn_contains_id: Optional[Callable[[str], bool]] = None,
+                 pipes: int = 1, max_workers: int = 12, reorder_buffer: int = 0, check_batch_size: int = 64):
         if isinstance(source, DataPool):
             self._pipe = SimpleImagePipe(source)
             default_source_id = underscore(source.__class__.__name__.replace('DataPool', ''))
@@ -18,8 +47,15 @@ class CheeseChaserDataSource(BaseDataSource):
             default_source_id = None
         else:
             raise TypeError(f'Unknown source type - {source!r}.')
+        if pipes <= 0:
+            raise ValueError(f'Number of pipes should be positive, but {pipes!r} found.')
         self._source_id = source_id or default_source_id
         self._id_generator = id_generator
+        self._pipes = pipes
+        self._max_workers = max_workers
+        self._reorder_buffer = reorder_buffer
+        self._check_batch_size = check_batch_size
+        self.stats: List[PipeStats] = [PipeStats() for _ in range(self._pipes)]
         BaseDataSource.__init__(self, fn_contains_id=fn_contains_id)
 
     def _cid_to_id(self, cid) -> str:
@@ -29,12 +65,96 @@ class CheeseChaserDataSource(BaseDataSource):
             return f'cheesechaser__{cid}'
 
     def _iter_cids(self):
-        for cid in self._id_generator:
-            if not self._fn_contains_id(self._cid_to_id(cid)):
-                yield cid
+        id_iter = iter(self._id_generator)
+        while True:
+            cids = list(itertools.islice(id_iter, self._check_batch_size))
+            if not cids:
+                break
+            for cid, contains in zip(cids, self._contains_ids([self._cid_to_id(cid) for cid in cids])):
+                if not contains:
+                    yield cid
 
     def _iter(self):
-        with self._pipe.batch_retrieve(self._iter_cids()) as session:
-            for item in session:
-                item: PipeItem
-                yield self._cid_to_id(item.id), item.data, None
+        # the cids are dispatched to the pipes with a shared lock, each pipe is only allowed to
+        # hold a bounded number of in-flight cids, so the faster pipes naturally take more of them
+        cid_iter = enumerate(self._iter_cids())
+        cid_lock = Lock()
+        is_stopped = Event()
+        queue = Queue(maxsize=self._pipes * self._max_workers * 3)
+        self.stats = [PipeStats() for _ in range(self._pipes)]
+
+        def _pipe_worker(pipe_index: int):
+            stats = self.stats[pipe_index]
+            stats.start_time = time.time()
+            in_flight = Semaphore(self._max_workers * 2)
+            orders = {}
+
+            def _pipe_cids():
+                while not is_stopped.is_set():
+                    if not in_flight.acquire(timeout=1.0):
+                        continue
+                    with cid_lock:
+                        try:
+                            order, cid = next(cid_iter)
+                        except StopIteration:
+                            return
+                    orders.setdefault(cid, []).append(order)
+                    yield cid
+
+            def _put(item):
+                while not is_stopped.is_set():
+                    try:
+                        queue.put(item, block=True, timeout=1.0)
+                    except Full:
+                        continue
+                    else:
+                        break
+
+            try:
+                with self._pipe.batch_retrieve(_pipe_cids(), max_workers=self._max_workers) as session:
+                    while not (session.is_stopped.is_set() and session.queue.empty()) and not is_stopped.is_set():
+                        try:
+                            data = session.next(block=True, timeout=1.0)
+                        except Empty:
+                            continue
+
+                        in_flight.release()
+                        if isinstance(data, PipeItem):
+                            stats.retrieved += 1
+                        else:
+                            stats.failed += 1
+                        _put((orders[data.id].pop(0), data))
+            finally:
+                stats.end_time = time.time()
+                logging.info(f'Pipe #{pipe_index} of {self!r} finished, {stats.retrieved} retrieved, '
+                             f'{stats.failed} failed, {stats.throughput:.2f} items/s.')
+                _put((None, _PIPE_END))
+
+        threads = [Thread(target=_pipe_worker, args=(i,), daemon=True) for i in range(self._pipes)]
+        for t in threads:
+            t.start()
+
+        try:
+            heap, next_order, finished = [], 0, 0
+            while finished < self._pipes or heap:
+                if finished < self._pipes:
+                    order, data = queue.get()
+                    if data is _PIPE_END:
+                        finished += 1
+                    else:
+                        heapq.heappush(heap, (order, data))
+
+                # yield in the original order, unless the reorder buffer is full or all the pipes ended
+                while heap and (heap[0][0] <= next_order or len(heap) > self._reorder_buffer or
+                                finished >= self._pipes):
+                    order, data = heapq.heappop(heap)
+                    next_order = max(next_order, order + 1)
+                    if isinstance(data, PipeItem):
+                        yield self._cid_to_id(data.id), data.data, None
+        finally:
+            is_stopped.set()
+            for t in threads:
+                t.join()
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__} source_id: {self._source_id!r}, pipes: {self._pipes!r}>'
@@ -0,0 +1,100 @@
+import logging
+import os
+from dataclasses import dataclass, field, asdict
+from os import PathLike
+from typing import Optional, List, Union
+
+from PIL import Image, features
+
+from ..utils.resize import resize, area_fit_size
+
+_FORMATS = {
+    # format: (pil format, extension, feature to check)
+    'webp': ('WEBP', 'webp', 'webp'),
+    'jpeg': ('JPEG', 'jpg', 'jpg'),
+    'png': ('PNG', 'png', None),
+    'avif': ('AVIF', 'avif', 'avif'),
+}
+_FORMAT_ALIASES = {
+    'jpg': 'jpeg',
+    'jpe': 'jpeg',
+    'jfif': 'jpeg',
+}
+
+
+def normalize_format(format: str) -> str:
+    format = format.lower()
+    return _FORMAT_ALIASES.get(format, format)
+
+
+def is_codec_format(format: str) -> bool:
+    return normalize_format(format) in _FORMATS
+
+
+def _is_format_available(format: str) -> bool:
+    _, _, feature = _FORMATS[format]
+    return feature is None or bool(features.check(feature))
+
+
+@dataclass
+class CodecProfile:
+    format: str = 'webp'
+    max_size: int = 2048
+    quality: Optional[int] = None
+    lossless: bool = False
+    passthrough: bool = True
+    accept: List[str] = field(default_factory=list)
+
+    def __post_init__(self):
+        self.format = normalize_format(self.format)
+        self.accept = [normalize_format(format) for format in self.accept]
+        for format in [self.format, *self.accept]:
+            if format not in _FORMATS:
+                raise ValueError(f'Unknown image format {format!r}, {sorted(_FORMATS)!r} expected.')
+        if self.max_size <= 0:
+            raise ValueError(f'Max size should be positive, but {self.max_size!r} found.')
+        if self.quality is not None and not 0 <= self.quality <= 100:
+            raise ValueError(f'Quality should be in [0, 100], but {self.quality!r} found.')
+        if not _is_format_available(self.format):
+            logging.warning(f'Image format {self.format!r} is not supported by this PIL build, '
+                            f'webp will be used instead.')
+            self.format = 'webp'
+
+    @property
+    def extension(self) -> str:
+        return _FORMATS[self.format][1]
+
+    def is_compliant(self, image_file: Union[str, PathLike]) -> bool:
+        if not self.passthrough:
+            return False
+        accepted = {_FORMATS[format][0] for format in [self.format, *self.accept]}
+        _, ext = os.path.splitext(str(image_file))
+        try:
+            # only the header is read here, the pixels are never decoded
+            with Image.open(image_file) as image:
+                return image.format in accepted and \
+                    Image.registered_extensions().get(ext.lower()) == image.format and \
+                    image.mode in {'RGB', 'L'} and \
+                    image.width * image.height <= self.max_size ** 2
+        except (OSError, ValueError):
+            return False
+
+    def encode(self, image: Image.Image, dst_file: str) -> str:
+        image = resize(image, area_fit_size(image.size, self.max_size ** 2))
+
+        save_cfg = {'format': _FORMATS[self.format][0]}
+        if self.quality is not None:
+            save_cfg['quality'] = self.quality
+        if self.lossless and self.format in {'webp', 'avif'}:
+            save_cfg['lossless'] = True
+        if self.format == 'jpeg':
+            save_cfg['optimize'] = True
+        image.save(dst_file, **save_cfg)
+        return dst_file
+
+    def to_meta(self) -> dict:
+        return asdict(self)
+
+    @classmethod
+    def from_meta(cls, meta_info: dict) -> 'CodecProfile':
+        return cls(**(meta_info.get('codec') or {}))
@@ -0,0 +1,145 @@
+import logging
+import time
+from dataclasses import dataclass
+from queue import Queue, Full, Empty
+from threading import Thread, Event, Condition
+from typing import List, Optional, Callable, Sequence
+
+from .base import BaseDataSource
+
+
+@dataclass
+class SourceStats:
+    pulled: int = 0
+    emitted: int = 0
+    stall_time: float = 0.0
+    start_time: Optional[float] = None
+    end_time: Optional[float] = None
+
+    @property
+    def duration(self) -> float:
+        if self.start_time is None:
+            return 0.0
+        return (self.end_time or time.time()) - self.start_time
+
+    @property
+    def throughput(self) -> float:
+        return self.pulled / self.duration if self.duration > 0 else 0.0
+
+
+_SOURCE_END = object()
+
+
+class MixedDataSource(BaseDataSource):
+    def __init__(self, sources: Sequence[BaseDataSource], weights: Optional[Sequence[float]] = None,
+                 prefetch: int = 16, fn_contains_id: Optional[Callable[[str], bool]] = None):
+        if not sources:
+            raise ValueError('No sources assigned for mixing.')
+        weights = list(weights) if weights is not None else [1.0] * len(sources)
+        if len(weights) != len(sources):
+            raise ValueError(f'{len(sources)} weights expected, but {len(weights)} found.')
+        if any(weight <= 0 for weight in weights):
+            raise ValueError(f'Weights should be all positive, but {weights!r} found.')
+        self._sources = list(sources)
+        self._weights = [float(weight) for weight in weights]
+        self._prefetch = prefetch
+        self.stats: List[SourceStats] = [SourceStats() for _ in self._sources]
+        BaseDataSource.__init__(self, fn_contains_id=fn_contains_id)
+
+    def set_fn_contains_id(self, fn_contains_id: Optional[Callable[[str], bool]] = None,
+                           fn_contains_ids: Optional[Callable[[List[str]], List[bool]]] = None):
+        BaseDataSource.set_fn_contains_id(self, fn_contains_id, fn_contains_ids)
+        for source in self._sources:
+            source.set_fn_contains_id(fn_contains_id, fn_contains_ids)
+
+    def _init(self):
+        for source in self._sources:
+            source.__enter__()
+
+    def _close(self):
+        for source in self._sources:
+            source.close()
+
+    def _iter(self):
+        is_stopped = Event()
+        ready = Condition()
+        queues = [Queue(maxsize=self._prefetch) for _ in self._sources]
+        self.stats = [SourceStats() for _ in self._sources]
+
+        def _producer(index: int):
+            stats = self.stats[index]
+            stats.start_time = time.time()
+
+            def _put(item):
+                while not is_stopped.is_set():
+                    try:
+                        queues[index].put(item, block=True, timeout=1.0)
+                    except Full:
+                        continue
+                    else:
+                        with ready:
+                            ready.notify_all()
+                        break
+
+            try:
+                for item in self._sources[index]:
+                    if is_stopped.is_set():
+                        break
+                    stats.pulled += 1
+                    _put(item)
+            except Exception as err:
+                logging.exception(f'Error occurred when pulling from source {self._sources[index]!r} - {err!r}')
+            finally:
+                stats.end_time = time.time()
+                logging.info(f'Source {self._sources[index]!r} finished, {stats.pulled} pulled, '
+                             f'{stats.throughput:.2f} items/s, stalled for {stats.stall_time:.2f}s.')
+                _put(_SOURCE_END)
+
+        threads = [Thread(target=_producer, args=(i,), daemon=True) for i in range(len(self._sources))]
+        for t in threads:
+            t.start()
+
+        # smooth weighted round-robin, sources with nothing ready are skipped instead of waited
+        active = set(range(len(self._sources)))
+        credits = [0.0] * len(self._sources)
+        try:
+            while active:
+                total = sum(self._weights[i] for i in active)
+                for i in active:
+                    credits[i] = min(credits[i] + self._weights[i], total)
+                ordered = sorted(active, key=lambda x: (-credits[x], x))
+
+                stall_start, stalled = time.time(), False
+                while True:
+                    selected, item = None, None
+                    for i in ordered:
+                        try:
+                            item = queues[i].get_nowait()
+                        except Empty:
+                            continue
+                        else:
+                            selected = i
+                            break
+
+                    if selected is not None:
+                        break
+                    stalled = True
+                    with ready:
+                        ready.wait(timeout=0.1)
+
+                if stalled or selected != ordered[0]:
+                    self.stats[ordered[0]].stall_time += time.time() - stall_start
+                if item is _SOURCE_END:
+                    active.remove(selected)
+                    credits[selected] = 0.0
+                else:
+                    credits[selected] -= total
+                    self.stats[selected].emitted += 1
+                    yield item.id, item.image, item.annotation
+        finally:
+            is_stopped.set()
+            for t in threads:
+                t.join()
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__} sources: {len(self._sources)}, weights: {self._weights!r}>'
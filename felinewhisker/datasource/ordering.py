@@ -0,0 +1,97 @@
+import heapq
+import itertools
+import logging
+import time
+from dataclasses import dataclass
+from typing import Callable, Optional, List, Sequence
+
+from .base import BaseDataSource, ImageItem
+
+ScorerTyping = Callable[[List[ImageItem]], Sequence[float]]
+
+
+@dataclass
+class OrderingStats:
+    pulled: int = 0
+    scored: int = 0
+    emitted: int = 0
+    batches: int = 0
+    buffered: int = 0
+    scoring_time: float = 0.0
+    max_batch_time: float = 0.0
+
+    @property
+    def mean_batch_time(self) -> float:
+        return self.scoring_time / self.batches if self.batches else 0.0
+
+
+class OrderedDataSource(BaseDataSource):
+    def __init__(self, source: BaseDataSource, fn_score: ScorerTyping,
+                 buffer_size: int = 256, batch_size: int = 32,
+                 fn_contains_id: Optional[Callable[[str], bool]] = None):
+        if batch_size <= 0:
+            raise ValueError(f'Batch size should be positive, but {batch_size!r} found.')
+        if buffer_size < batch_size:
+            raise ValueError(f'Buffer size should be no less than batch size {batch_size!r}, '
+                             f'but {buffer_size!r} found.')
+        self._source = source
+        self._fn_score = fn_score
+        self._buffer_size = buffer_size
+        self._batch_size = batch_size
+        self.stats = OrderingStats()
+        BaseDataSource.__init__(self, fn_contains_id=fn_contains_id)
+
+    def set_fn_contains_id(self, fn_contains_id: Optional[Callable[[str], bool]] = None,
+                           fn_contains_ids: Optional[Callable[[List[str]], List[bool]]] = None):
+        BaseDataSource.set_fn_contains_id(self, fn_contains_id, fn_contains_ids)
+        self._source.set_fn_contains_id(fn_contains_id, fn_contains_ids)
+
+    def _init(self):
+        self._source.__enter__()
+
+    def _close(self):
+        self._source.close()
+
+    def _score(self, items: List[ImageItem]) -> List[float]:
+        start_time = time.perf_counter()
+        scores = [float(score) for score in self._fn_score(items)]
+        duration = time.perf_counter() - start_time
+        if len(scores) != len(items):
+            raise ValueError(f'{len(items)} scores expected from scorer {self._fn_score!r}, '
+                             f'but {len(scores)} returned.')
+
+        self.stats.scored += len(items)
+        self.stats.batches += 1
+        self.stats.scoring_time += duration
+        self.stats.max_batch_time = max(self.stats.max_batch_time, duration)
+        logging.debug(f'{len(items)} samples scored in {duration:.3f}s, '
+                      f'mean batch latency {self.stats.mean_batch_time:.3f}s.')
+        return scores
+
+    def _iter(self):
+        source_iter = iter(self._source)
+        heap, pending = [], []
+        sequence = itertools.count()
+        exhausted = False
+
+        while True:
+            while not exhausted and len(heap) + len(pending) < self._buffer_size:
+                try:
+                    pending.append(next(source_iter))
+                    self.stats.pulled += 1
+                except StopIteration:
+                    exhausted = True
+
+            # score in full batches, unless nothing else is ready to be emitted
+            while pending and (len(pending) >= self._batch_size or exhausted or not heap):
+                batch, pending = pending[:self._batch_size], pending[self._batch_size:]
+                for item, score in zip(batch, self._score(batch)):
+                    heapq.heappush(heap, (-score, next(sequence), item))
+
+            self.stats.buffered = len(heap) + len(pending)
+            if not heap:
+                break
+
+            _, _, item = heapq.heappop(heap)
+            self.stats.emitted += 1
+            yield item.id, item.image, item.annotation
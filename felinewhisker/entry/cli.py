@@ -1,10 +1,12 @@
 from .dispatch import felinewhiskercli
+from .export import _add_export_subcommand
 from .init import _add_init_subcommand
 from .squash import _add_squash_subcommand
 
 _DECORATORS = [
     _add_init_subcommand,
     _add_squash_subcommand,
+    _add_export_subcommand,
 ]
 
 cli = felinewhiskercli
@@ -0,0 +1,65 @@
+import logging
+from typing import Optional
+
+import click
+from hfutils.utils import get_requests_session, ColoredFormatter
+from huggingface_hub import configure_http_backend
+
+from .base import CONTEXT_SETTINGS
+from .squash import NoDatasetAssigned
+from ..repository import LocalRepository, HfOnlineRepository
+
+
+def _add_export_subcommand(cli: click.Group) -> click.Group:
+    @cli.command('export', help='Export the squashed samples of a dataset to streaming-friendly shards.\n\n'
+                                'Set environment $HF_TOKEN to use your own access token.',
+                 context_settings=CONTEXT_SETTINGS)
+    @click.option('-d', '--directory', 'directory', type=str, default=None,
+                  help='Local directory of the dataset.', show_default=False)
+    @click.option('-r', '--repository', 'repository', type=str, default=None,
+                  help='HuggingFace Repository of the dataset.', show_default=False)
+    @click.option('-o', '--output', 'output_dir', type=str, required=True,
+                  help='Output directory of the exported shards.', show_default=False)
+    @click.option('-f', '--format', 'format', type=click.Choice(['webdataset', 'parquet']), default='webdataset',
+                  help='Format of the exported shards.', show_default=True)
+    @click.option('-s', '--shard-size', 'shard_size', type=int, default=1000,
+                  help='Number of samples in each shard.', show_default=True)
+    @click.option('--shuffle', 'shuffle', is_flag=True, type=bool, default=False,
+                  help='Shuffle the samples when exporting.', show_default=True)
+    @click.option('--shuffle-buffer', 'shuffle_buffer', type=int, default=1000,
+                  help='Size of the shuffle buffer.', show_default=True)
+    @click.option('--seed', 'seed', type=int, default=None,
+                  help='Random seed of shuffling.', show_default=False)
+    @click.option('--prefetch', 'prefetch', type=int, default=2,
+                  help='Number of archives to fetch ahead.', show_default=True)
+    def export(directory: Optional[str], repository: Optional[str], output_dir: str, format: str,
+               shard_size: int, shuffle: bool, shuffle_buffer: int, seed: Optional[int], prefetch: int):
+        configure_http_backend(get_requests_session)
+
+        logger = logging.getLogger()
+        logger.setLevel(logging.INFO)
+        console_handler = logging.StreamHandler()
+        console_handler.setFormatter(ColoredFormatter())
+        logger.addHandler(console_handler)
+
+        if repository:
+            repo = HfOnlineRepository(repo_id=repository)
+        elif directory:
+            repo = LocalRepository(directory)
+        else:
+            raise NoDatasetAssigned(
+                'No dataset assigned. '
+                'You have to use either -d or -r option to assign a local or a HF-based dataset.'
+            )
+
+        repo.export(
+            dst_dir=output_dir,
+            format=format,
+            shard_size=shard_size,
+            shuffle=shuffle,
+            shuffle_buffer=shuffle_buffer,
+            seed=seed,
+            prefetch=prefetch,
+        )
+
+    return cli
@@ -4,7 +4,6 @@ from functools import partial
 from pathlib import Path
 
 import click
-from InquirerPy import inquirer
 from hbutils.collection import unique
 from hbutils.string import titleize
 from hfutils.utils import get_requests_session
@@ -37,6 +36,7 @@ def _add_init_subcommand(cli: click.Group) -> click.Group:
                               'Set environment $HF_TOKEN to use your own access token.',
                  context_settings=CONTEXT_SETTINGS)
     def init():
+        from InquirerPy import inquirer
         configure_http_backend(get_requests_session)
 
         while True:
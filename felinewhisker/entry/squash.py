@@ -6,7 +6,7 @@ from hfutils.utils import get_requests_session, ColoredFormatter
 from huggingface_hub import configure_http_backend
 
 from .base import CONTEXT_SETTINGS, ClickErrorException
-from ..repository import LocalRepository, HfOnlineRepository
+from ..repository import LocalRepository, HfOnlineRepository, PackagePolicy, watch_squash
 
 
 class NoDatasetAssigned(ClickErrorException):
@@ -21,7 +21,25 @@ def _add_squash_subcommand(cli: click.Group) -> click.Group:
                   help='Local directory of the dataset.', show_default=False)
     @click.option('-r', '--repository', 'repository', type=str, default=None,
                   help='HuggingFace Repository of the dataset.', show_default=False)
-    def squash(directory: Optional[str], repository: Optional[str]):
+    @click.option('--compact', 'compact', is_flag=True, type=bool, default=False,
+                  help='Rewrite archives with few live images into new consolidated archives.', show_default=True)
+    @click.option('--compact-threshold', 'compact_threshold', type=float, default=0.5,
+                  help='Archives with live fraction lower than this will be compacted.', show_default=True)
+    @click.option('--max-package-size', 'max_package_size', type=str, default=None,
+                  help='Max size of each compacted archive (e.g. 2GB).', show_default=False)
+    @click.option('--max-package-members', 'max_package_members', type=int, default=None,
+                  help='Max number of images in each compacted archive.', show_default=False)
+    @click.option('--watch', 'watch', is_flag=True, type=bool, default=False,
+                  help='Keep running and squash new contributions in small batches.', show_default=True)
+    @click.option('--interval', 'interval', type=float, default=60.0,
+                  help='Seconds between polls for new contributions in watch mode.', show_default=True)
+    @click.option('--batch-packages', 'batch_packages', type=int, default=16,
+                  help='Max number of contributions merged in each squash in watch mode.', show_default=True)
+    @click.option('--readme-interval', 'readme_interval', type=float, default=3600.0,
+                  help='Min seconds between readme regenerations in watch mode.', show_default=True)
+    def squash(directory: Optional[str], repository: Optional[str], compact: bool, compact_threshold: float,
+               max_package_size: Optional[str], max_package_members: Optional[int],
+               watch: bool, interval: float, batch_packages: int, readme_interval: float):
         configure_http_backend(get_requests_session)
 
         logger = logging.getLogger()
@@ -40,6 +58,29 @@ def _add_squash_subcommand(cli: click.Group) -> click.Group:
                 'You have to use either -d or -r option to assign a local or a HF-based dataset.'
             )
 
-        repo.squash()
+        package_policy = PackagePolicy(
+            max_size=max_package_size,
+            max_members=max_package_members,
+        )
+        if watch:
+            logging.info(f'Watching {repo!r} for new contributions, press Ctrl+C to stop.')
+            try:
+                watch_squash(
+                    repo=repo,
+                    interval=interval,
+                    max_packages=batch_packages,
+                    readme_interval=readme_interval,
+                    compact=compact,
+                    compact_threshold=compact_threshold,
+                    package_policy=package_policy,
+                )
+            except KeyboardInterrupt:
+                logging.info('Watching stopped.')
+        else:
+            repo.squash(
+                compact=compact,
+                compact_threshold=compact_threshold,
+                package_policy=package_policy,
+            )
 
     return cli
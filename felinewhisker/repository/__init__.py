@@ -1,3 +1,11 @@
-from .base import DatasetRepository, WriterSession, RepoAlreadyExistsError
-from .huggingface import HfOnlineRepository
+from .base import DatasetRepository, WriterSession, RepoAlreadyExistsError, SquashConflictError
 from .local import LocalRepository
+from .navigation import NavigationLog
+from .package import PackagePolicy
+from .watch import watch_squash
+from ..utils.lazy import lazy_attrs
+
+# huggingface_hub is only loaded when the online repository is used
+__getattr__, __dir__ = lazy_attrs(__name__, globals(), {
+    'HfOnlineRepository': '.huggingface',
+})
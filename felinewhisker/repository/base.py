@@ -1,16 +1,27 @@
+import io
+import itertools
+import logging
 import os.path
+import random
 import shutil
-import tarfile
 import time
+from concurrent.futures import ThreadPoolExecutor
 from threading import Lock
-from typing import Optional, Callable, List, Tuple
+from typing import Optional, Callable, List, Tuple, Dict, Iterator, Any
 
 import pandas as pd
 from PIL import Image
+from hbutils.collection import unique
 from hbutils.random import random_sha1_with_timestamp
 from hbutils.system import TemporaryDirectory
+from natsort import natsorted
 from tqdm import tqdm
 
+from .export import export_samples, shuffle_buffered
+from .history import read_history, history_bucket
+from .navigation import NavigationLog
+from .package import PackagePolicy, pack_tar_files
+from .reader import iter_archive_members
 from ..tasks import parse_annotation_checker, AnnotationChecker
 
 
@@ -18,24 +29,37 @@ class RepoAlreadyExistsError(Exception):
     pass
 
 
+class SquashConflictError(Exception):
+    pass
+
+
 class WriterSession:
     def __init__(self, author: Optional[str], checker: AnnotationChecker,
-                 fn_save: Callable[[str, str, str], None], fn_contains_id: Callable[[str], bool]):
+                 fn_save: Callable[[List[str], str, str], None], fn_contains_id: Callable[[str], bool],
+                 package_policy: Optional[PackagePolicy] = None, proxy_size: Optional[int] = None):
         self._author = author
         self._checker = checker
+        self._package_policy = package_policy or PackagePolicy()
         self.session_token = random_sha1_with_timestamp()
         if self._author:
             self.session_token = f'{self.session_token}__{self._author}'
         self._storage_tmpdir = TemporaryDirectory()
         self._records = {}
+        self._proxy_size = proxy_size
+        self._proxy_files = {}
         self._fn_save = fn_save
         self._fn_contains_id = fn_contains_id
         self._lock = Lock()
+        self.navigation = NavigationLog(os.path.join(self._storage_tmpdir.name, 'navigation.jsonl'))
 
     def is_id_duplicated(self, id_: str) -> bool:
         with self._lock:
             return id_ in self._records or self._fn_contains_id(id_)
 
+    def are_ids_duplicated(self, ids: List[str]) -> List[bool]:
+        with self._lock:
+            return [id_ in self._records or self._fn_contains_id(id_) for id_ in ids]
+
     def get_annotated_count(self) -> int:
         count = 0
         for item in self._records.values():
@@ -43,10 +67,29 @@ class WriterSession:
                 count += 1
         return count
 
+    @property
+    def storage_dir(self) -> str:
+        return self._storage_tmpdir.name
+
+    def _make_proxy(self, id_: str, image_file: str) -> Optional[str]:
+        with Image.open(image_file) as image:
+            if not self._proxy_size or max(image.width, image.height) <= self._proxy_size:
+                return None
+
+            image.draft('RGB', (self._proxy_size, self._proxy_size))
+            image = image.convert('RGB')
+            image.thumbnail((self._proxy_size, self._proxy_size), resample=Image.BILINEAR)
+            proxy_file = os.path.join(self._storage_tmpdir.name, 'proxy', f'{id_}.webp')
+            os.makedirs(os.path.dirname(proxy_file), exist_ok=True)
+            image.save(proxy_file, quality=85, method=0)
+            return proxy_file
+
     def add(self, id_: str, image_file: str, annotation):
+        if annotation is not None:
+            self._checker.check(annotation)
+        # proxy is made outside the lock, it is the most expensive part
+        proxy_file = self._make_proxy(id_, image_file)
         with self._lock:
-            if annotation is not None:
-                self._checker.check(annotation)
             _, ext = os.path.splitext(os.path.basename(image_file))
             filename = f'{id_}{ext}'
             width, height = Image.open(image_file).size
@@ -60,11 +103,20 @@ class WriterSession:
                 'updated_at': time.time(),
                 'author': self._author,
             }
+            if proxy_file:
+                self._proxy_files[id_] = proxy_file
 
     def get_image_path(self, id_: str):
         with self._lock:
             return os.path.join(self._storage_tmpdir.name, self._records[id_]['filename'])
 
+    def get_proxy_path(self, id_: str):
+        with self._lock:
+            if id_ in self._proxy_files:
+                return self._proxy_files[id_]
+            else:
+                return os.path.join(self._storage_tmpdir.name, self._records[id_]['filename'])
+
     def __getitem__(self, id_):
         with self._lock:
             return self._records[id_]['annotation']
@@ -76,11 +128,27 @@ class WriterSession:
             self._records[id_]['annotation'] = annotation
             self._records[id_]['updated_at'] = time.time()
 
+    def update(self, mapping: Dict[str, Any]):
+        for annotation in mapping.values():
+            if annotation is not None:
+                self._checker.check(annotation)
+        with self._lock:
+            for id_ in mapping.keys():
+                if id_ not in self._records:
+                    raise KeyError(id_)
+            updated_at = time.time()
+            for id_, annotation in mapping.items():
+                if self._records[id_]['annotation'] != annotation:
+                    self._records[id_]['annotation'] = annotation
+                    self._records[id_]['updated_at'] = updated_at
+
     def __delitem__(self, id_):
         with self._lock:
             filename = self._records[id_]['filename']
             del self._records[id_]
             os.remove(os.path.join(self._storage_tmpdir.name, filename))
+            if id_ in self._proxy_files:
+                os.remove(self._proxy_files.pop(id_))
 
     def __len__(self):
         with self._lock:
@@ -92,27 +160,36 @@ class WriterSession:
 
     def _save(self):
         with TemporaryDirectory() as td:
-            records = []
-            tar_file = os.path.join(td, 'data.tar')
-            with tarfile.open(tar_file, 'a:') as tar:
-                keys = sorted(self._records.keys())
-                for key in tqdm(keys, desc='Packing'):
-                    item = self._records[key]
-                    filename = item['filename']
-                    if item['annotation'] is not None:
-                        tar.add(os.path.join(self._storage_tmpdir.name, filename), filename)
-                        records.append(item)
+            records, files = [], []
+            for key in sorted(self._records.keys()):
+                item = self._records[key]
+                if item['annotation'] is not None:
+                    files.append((os.path.join(self._storage_tmpdir.name, item['filename']), item['filename']))
+                    records.append(item)
+
+            tar_files, archive_names = [], {}
+            for tar_file, filenames in pack_tar_files(
+                    files=files,
+                    dst_dir=os.path.join(td, 'packages'),
+                    name=self.session_token,
+                    policy=self._package_policy,
+            ):
+                tar_files.append(tar_file)
+                for filename in filenames:
+                    archive_names[filename] = os.path.basename(tar_file)
+            records = [{**item, 'archive_file': archive_names[item['filename']]} for item in records]
 
             data_file = os.path.join(td, 'data.parquet')
             df = pd.DataFrame(records)
             df.to_parquet(data_file, engine='pyarrow', index=False)
-            self._fn_save(tar_file, data_file, self.session_token)
+            self._fn_save(tar_files, data_file, self.session_token)
 
     def save(self):
         with self._lock:
             self._save()
 
     def _close(self):
+        self.navigation.close()
         self._storage_tmpdir.cleanup()
 
     def close(self):
@@ -139,24 +216,42 @@ class DatasetRepository:
         if self._exist():
             self._sync()
 
-    def _write(self, tar_file: str, data_file: str, token: str):
+    def _write(self, tar_files: List[str], data_file: str, token: str):
         raise NotImplementedError  # pragma: no cover
 
     def _read_meta(self):
         raise NotImplementedError  # pragma: no cover
 
-    def _squash(self):
+    def _squash(self, compact: bool = False, compact_threshold: float = 0.5,
+                package_policy: Optional[PackagePolicy] = None, max_packages: Optional[int] = None,
+                readme: bool = True):
         raise NotImplementedError  # pragma: no cover
 
-    def _get_table_file(self) -> Optional[str]:
+    def _resolve_revision(self) -> Optional[str]:
+        # the revision reads are pinned to, so the table and the archives are read from the same state
+        return None
+
+    def _get_table_file(self, revision: Optional[str] = None) -> Optional[str]:
         raise NotImplementedError  # pragma: no cover
 
     def _list_unarchived_table_files(self) -> List[str]:
         raise NotImplementedError  # pragma: no cover
 
+    def _list_unarchived_packages(self) -> List[str]:
+        raise NotImplementedError  # pragma: no cover
+
     def _download_image_file(self, archive_file: str, file_in_archive: str, dst_file: str):
         raise NotImplementedError  # pragma: no cover
 
+    def _get_archive_file(self, archive_file: str, revision: Optional[str] = None) -> str:
+        raise NotImplementedError  # pragma: no cover
+
+    def _list_archive_members(self) -> Dict[str, int]:
+        raise NotImplementedError  # pragma: no cover
+
+    def _list_history_files(self, bucket: str) -> List[str]:
+        raise NotImplementedError  # pragma: no cover
+
     def _exist(self) -> bool:
         raise NotImplementedError  # pragma: no cover
 
@@ -180,23 +275,110 @@ class DatasetRepository:
             ))
         return results
 
-    def squash(self):
+    def get_history(self, id_: str) -> pd.DataFrame:
+        return read_history(self._list_history_files(history_bucket(id_)), id_)
+
+    def iter_samples(self, columns: Optional[List[str]] = None, filters: Optional[list] = None,
+                     batch_size: int = 64, workers: int = 4) -> Iterator[List[Tuple[dict, Image.Image]]]:
+        revision = self._resolve_revision()
+        table_file = self._get_table_file(revision)
+        if not table_file:
+            return
+
+        read_columns = None if columns is None else list(unique([*columns, 'filename', 'archive_file']))
+        df = pd.read_parquet(table_file, columns=read_columns, filters=filters)
+        samples = iter_archive_members(
+            df=df,
+            fn_get_archive_file=lambda archive_file: self._get_archive_file(archive_file, revision),
+            prefetch=workers,
+        )
+
+        def _decode(image_bytes: bytes) -> Image.Image:
+            image = Image.open(io.BytesIO(image_bytes))
+            image.load()
+            return image
+
+        def _submit_batch(tp: ThreadPoolExecutor):
+            batch = list(itertools.islice(samples, batch_size))
+            if batch:
+                rows = [{key: row[key] for key in columns} if columns is not None else row for row, _ in batch]
+                return rows, [tp.submit(_decode, image_bytes) for _, image_bytes in batch]
+            else:
+                return None
+
+        with ThreadPoolExecutor(max_workers=max(workers, 1)) as tp:
+            # decode the next batch while the current one is being consumed
+            current = _submit_batch(tp)
+            while current is not None:
+                next_ = _submit_batch(tp)
+                rows, futures = current
+                yield [(row, future.result()) for row, future in zip(rows, futures)]
+                current = next_
+
+    def export(self, dst_dir: str, format: str = 'webdataset', shard_size: int = 1000,
+               shuffle: bool = False, shuffle_buffer: int = 1000, seed: Optional[int] = None,
+               prefetch: int = 2) -> List[str]:
+        revision = self._resolve_revision()
+        table_file = self._get_table_file(revision)
+        df = pd.read_parquet(table_file) if table_file else None
+        if df is None or len(df) == 0:
+            logging.warning('No archived samples in this dataset, please squash it before exporting.')
+            df = pd.DataFrame([], columns=['id', 'filename', 'archive_file'])
+
+        archive_files = natsorted(df['archive_file'].unique())
+        if shuffle:
+            random.Random(seed).shuffle(archive_files)
+        samples = iter_archive_members(
+            df=df,
+            fn_get_archive_file=lambda archive_file: self._get_archive_file(archive_file, revision),
+            prefetch=prefetch,
+            archive_files=archive_files,
+        )
+        if shuffle:
+            samples = shuffle_buffered(samples, buffer_size=shuffle_buffer, seed=seed)
+
+        return export_samples(
+            samples=samples,
+            dst_dir=dst_dir,
+            format=format,
+            shard_size=shard_size,
+            total=len(df),
+        )
+
+    def squash(self, compact: bool = False, compact_threshold: float = 0.5,
+               package_policy: Optional[PackagePolicy] = None, max_packages: Optional[int] = None,
+               readme: bool = True):
+        if max_packages is not None and max_packages < 1:
+            raise ValueError(f'Max packages should be positive, but {max_packages!r} found.')
         with self._lock:
             self._sync()
-            self._squash()
+            self._squash(
+                compact=compact,
+                compact_threshold=compact_threshold,
+                package_policy=package_policy,
+                max_packages=max_packages,
+                readme=readme,
+            )
             self._sync()
 
+    def list_unarchived_packages(self) -> List[str]:
+        with self._lock:
+            return self._list_unarchived_packages()
+
     def sync(self):
         with self._lock:
             self._sync()
 
-    def write(self, author: Optional[str] = None):
+    def write(self, author: Optional[str] = None, package_policy: Optional[PackagePolicy] = None,
+              proxy_size: Optional[int] = None):
         with self._lock:
             return WriterSession(
                 author=author,
                 checker=self._annotation_checker,
                 fn_save=self._write,
                 fn_contains_id=lambda id_: id_ in self._exist_ids,
+                package_policy=package_policy,
+                proxy_size=proxy_size,
             )
 
     def contains_id(self, id_: str):
@@ -0,0 +1,83 @@
+import logging
+import os
+import tarfile
+from typing import Dict, List, Callable, Tuple, Optional, Set, Iterable
+
+import pandas as pd
+from hbutils.random import random_sha1_with_timestamp
+from hbutils.string import plural_word
+from hbutils.system import TemporaryDirectory
+from hfutils.utils import hf_normpath
+from natsort import natsorted
+from tqdm import tqdm
+
+from .package import PackagePolicy, pack_tar_files, create_tar_indices
+
+
+def referenced_archives(dfs: Iterable[Optional[pd.DataFrame]]) -> Set[str]:
+    archive_files = set()
+    for df in dfs:
+        if df is not None and len(df) > 0:
+            archive_files.update(df['archive_file'])
+    return archive_files
+
+
+def select_archives_to_compact(df: pd.DataFrame, archive_members: Dict[str, int],
+                               threshold: float = 0.5) -> List[str]:
+    if len(df) > 0:
+        live_counts = df.groupby('archive_file')['filename'].nunique().to_dict()
+    else:
+        live_counts = {}
+
+    selected = []
+    for archive_file, total in archive_members.items():
+        live_count = live_counts.get(archive_file, 0)
+        if total == 0 or live_count / total < threshold:
+            logging.info(f'Archive {archive_file!r} selected for compaction, '
+                         f'{plural_word(live_count, "live member")} of {total}.')
+            selected.append(archive_file)
+    return natsorted(selected)
+
+
+def compact_archives(df: pd.DataFrame, archive_files: List[str], fn_get_archive_file: Callable[[str], str],
+                     workdir: str, package_policy: Optional[PackagePolicy] = None) \
+        -> Tuple[pd.DataFrame, List[str]]:
+    df = df.copy()
+    df_live = df[df['archive_file'].isin(archive_files)] if len(df) > 0 else df
+    if len(df_live) == 0:
+        return df, []
+
+    with TemporaryDirectory() as td:
+        files = []
+        for archive_file, df_archive in df_live.groupby('archive_file', sort=False):
+            live_filenames = set(df_archive['filename'])
+            with tarfile.open(fn_get_archive_file(archive_file), 'r|') as tar:
+                for tarinfo in tqdm(tar, desc=f'Extracting {archive_file!r}'):
+                    tarinfo: tarfile.TarInfo
+                    if tarinfo.isreg() and tarinfo.name in live_filenames:
+                        dst_file = os.path.join(td, tarinfo.name)
+                        with open(dst_file, 'wb') as f:
+                            f.write(tar.extractfile(tarinfo).read())
+                        files.append((dst_file, tarinfo.name))
+                        live_filenames.remove(tarinfo.name)
+            if live_filenames:
+                raise FileNotFoundError(f'Files {natsorted(live_filenames)!r} not found '
+                                        f'in archive {archive_file!r}.')
+
+        token = random_sha1_with_timestamp()
+        archive_names = {}
+        new_tar_files = []
+        for tar_file, filenames in pack_tar_files(
+                files=natsorted(files),
+                dst_dir=os.path.join(workdir, 'images', token[:8]),
+                name=token,
+                policy=package_policy,
+        ):
+            new_tar_files.append(tar_file)
+            for filename in filenames:
+                archive_names[filename] = hf_normpath(os.path.relpath(tar_file, workdir))
+        create_tar_indices(new_tar_files)
+
+    mask = df['archive_file'].isin(archive_files)
+    df.loc[mask, 'archive_file'] = df.loc[mask, 'filename'].map(archive_names)
+    return df, [hf_normpath(os.path.relpath(file, workdir)) for file in new_tar_files]
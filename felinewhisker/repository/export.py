@@ -0,0 +1,98 @@
+import io
+import json
+import os
+import random
+import re
+import tarfile
+from typing import Iterable, Iterator, Tuple, List, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from tqdm import tqdm
+
+_EXPORT_FORMATS = {'webdataset', 'parquet'}
+
+
+def shuffle_buffered(samples: Iterable[Tuple[dict, bytes]], buffer_size: int = 1000,
+                     seed: Optional[int] = None) -> Iterator[Tuple[dict, bytes]]:
+    rnd = random.Random(seed)
+    buffer = []
+    for sample in samples:
+        if len(buffer) < buffer_size:
+            buffer.append(sample)
+        else:
+            i = rnd.randrange(len(buffer))
+            yield buffer[i]
+            buffer[i] = sample
+
+    rnd.shuffle(buffer)
+    yield from buffer
+
+
+def _sample_key(row: dict) -> str:
+    # webdataset splits the key and the extension on the first dot, so the dots, separators and
+    # the escape char itself are percent-encoded, ids can be restored with urllib.parse.unquote
+    return re.sub(
+        r'[%.\s/\\]',
+        lambda m: ''.join(f'%{b:02X}' for b in m.group(0).encode('utf-8')),
+        str(row['id']),
+    )
+
+
+def _write_webdataset_shard(dst_file: str, samples: List[Tuple[dict, bytes]]):
+    with tarfile.open(dst_file, 'w') as tar:
+        for row, image_bytes in samples:
+            key = _sample_key(row)
+            _, ext = os.path.splitext(row['filename'])
+            meta_bytes = json.dumps(row, default=str, ensure_ascii=False, sort_keys=True).encode('utf-8')
+            for name, data in [(f'{key}{ext}', image_bytes), (f'{key}.json', meta_bytes)]:
+                tarinfo = tarfile.TarInfo(name)
+                tarinfo.size = len(data)
+                tarinfo.mtime = int(row.get('updated_at') or 0)
+                tar.addfile(tarinfo, io.BytesIO(data))
+
+
+def _write_parquet_shard(dst_file: str, samples: List[Tuple[dict, bytes]]):
+    df = pd.DataFrame([{**row, 'image': image_bytes} for row, image_bytes in samples])
+    pq.write_table(pa.Table.from_pandas(df, preserve_index=False), dst_file)
+
+
+def export_samples(samples: Iterable[Tuple[dict, bytes]], dst_dir: str, format: str = 'webdataset',
+                   shard_size: int = 1000, prefix: str = 'data', total: Optional[int] = None) -> List[str]:
+    if format == 'webdataset':
+        fn_write, ext = _write_webdataset_shard, '.tar'
+    elif format == 'parquet':
+        fn_write, ext = _write_parquet_shard, '.parquet'
+    else:
+        raise ValueError(f'Unknown export format - {format!r}, should be one of {sorted(_EXPORT_FORMATS)!r}.')
+    if shard_size <= 0:
+        raise ValueError(f'Shard size should be positive, but {shard_size!r} found.')
+
+    os.makedirs(dst_dir, exist_ok=True)
+    shard_files = []
+    current = []
+    count = 0
+
+    def _flush():
+        dst_file = os.path.join(dst_dir, f'{prefix}-{len(shard_files):06d}{ext}')
+        fn_write(dst_file, current)
+        shard_files.append(dst_file)
+        current.clear()
+
+    for sample in tqdm(samples, desc=f'Exporting to {dst_dir!r}', total=total):
+        current.append(sample)
+        count += 1
+        if len(current) >= shard_size:
+            _flush()
+    if current:
+        _flush()
+
+    with open(os.path.join(dst_dir, f'{prefix}.json'), 'w') as f:
+        json.dump({
+            'format': format,
+            'shards': [os.path.basename(file) for file in shard_files],
+            'samples': count,
+        }, f, indent=4, sort_keys=True)
+
+    return shard_files
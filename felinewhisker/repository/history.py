@@ -0,0 +1,73 @@
+import hashlib
+import os
+import time
+from typing import List, Callable, Optional, Dict, Iterable
+
+import pandas as pd
+
+HISTORY_BUCKETS = 16
+
+
+def history_bucket(id_: str) -> str:
+    return f'{int(hashlib.md5(id_.encode()).hexdigest()[:8], 16) % HISTORY_BUCKETS:02x}'
+
+
+def history_bucket_dir(bucket: str) -> str:
+    return f'history/bucket={bucket}'
+
+
+def history_file(bucket: str) -> str:
+    return f'{history_bucket_dir(bucket)}/history.parquet'
+
+
+def write_history(records: List[dict], workdir: str,
+                  fn_load_bucket: Callable[[str], Optional[pd.DataFrame]],
+                  dropped_archives: Iterable[str] = ()) -> Dict[str, str]:
+    groups = {}
+    if records:
+        df = pd.DataFrame(records)
+        df['superseded_at'] = time.time()
+        df['bucket'] = df['id'].map(history_bucket)
+        groups = {bucket: df_bucket.drop(columns=['bucket']) for bucket, df_bucket in df.groupby('bucket')}
+
+    dropped_archives = set(dropped_archives)
+    buckets = set(groups)
+    if dropped_archives:
+        # images in the compacted archives are not kept, so all the buckets may refer to them
+        buckets.update(f'{i:02x}' for i in range(HISTORY_BUCKETS))
+
+    files = {}
+    for bucket in sorted(buckets):
+        # one file for each bucket, the new records are merged into it instead of adding another file
+        dfs = [df for df in [fn_load_bucket(bucket), groups.get(bucket)] if df is not None and len(df) > 0]
+        if not dfs:
+            continue
+        df_bucket = pd.concat(dfs, ignore_index=True)
+        dropped = df_bucket['archive_file'].isin(dropped_archives)
+        if bucket not in groups and not dropped.any():
+            continue
+        df_bucket['archive_file'] = df_bucket['archive_file'].where(~dropped, None)
+
+        # sorted by id, so the row group statistics can skip most of the file when querying one id
+        df_bucket = df_bucket.sort_values(by=['id', 'updated_at'])
+        filename = history_file(bucket)
+        dst_file = os.path.join(workdir, filename)
+        os.makedirs(os.path.dirname(dst_file), exist_ok=True)
+        df_bucket.to_parquet(dst_file, engine='pyarrow', index=False, row_group_size=4096)
+        files[bucket] = filename
+    return files
+
+
+def load_history_bucket(files: List[str]) -> Optional[pd.DataFrame]:
+    dfs = [pd.read_parquet(file, engine='pyarrow') for file in files]
+    dfs = [df for df in dfs if len(df) > 0]
+    return pd.concat(dfs, ignore_index=True) if dfs else None
+
+
+def read_history(files: List[str], id_: str) -> pd.DataFrame:
+    dfs = [pd.read_parquet(file, engine='pyarrow', filters=[('id', '==', id_)]) for file in files]
+    dfs = [df for df in dfs if len(df) > 0]
+    if not dfs:
+        return pd.DataFrame([])
+    df = pd.concat(dfs, ignore_index=True)
+    return df.sort_values(by=['updated_at', 'superseded_at']).reset_index(drop=True)
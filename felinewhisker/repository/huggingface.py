@@ -1,8 +1,11 @@
 import json
 import logging
 import os
+import re
 import shutil
-from typing import Optional, List
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, List, Dict, Tuple
 
 import numpy as np
 import pandas as pd
@@ -10,46 +13,149 @@ from PIL import Image
 from hbutils.string import plural_word, humanize
 from hbutils.system import TemporaryDirectory
 from hfutils.cache import delete_detached_cache
-from hfutils.index import tar_get_index_info, hf_tar_file_download
+from hfutils.index import hf_tar_file_download, tar_file_download
 from hfutils.operate import upload_directory_as_directory, get_hf_fs, get_hf_client
-from hfutils.utils import hf_normpath, hf_fs_path, parse_hf_fs_path
-from huggingface_hub import CommitOperationAdd, CommitOperationDelete
+from hfutils.utils import hf_normpath, hf_fs_path
+from huggingface_hub import CommitOperationAdd, CommitOperationDelete, CommitOperation, HfApi, HfFileSystem
+from huggingface_hub.errors import HfHubHTTPError
+from huggingface_hub.hf_api import RepoFile
 from natsort import natsorted
 
-from .base import DatasetRepository, RepoAlreadyExistsError
+from .base import DatasetRepository, RepoAlreadyExistsError, SquashConflictError
+from .compact import select_archives_to_compact, compact_archives, referenced_archives
+from .history import write_history, history_bucket_dir, load_history_bucket
+from .package import create_tar_indices, PackagePolicy
+from .qc import update_votes, write_qc_files
 from ..tasks import make_readme, init_project
 
 
+def _is_commit_conflict(err: HfHubHTTPError) -> bool:
+    # the parent commit is no longer the head of the branch
+    return err.response is not None and err.response.status_code in {409, 412}
+
+
+def _batch_additions(operations: List[CommitOperation], max_size: int, max_files: int) \
+        -> List[List[CommitOperationAdd]]:
+    batches, batch, batch_size = [], [], 0
+    for operation in operations:
+        if not isinstance(operation, CommitOperationAdd):
+            continue
+        size = os.path.getsize(operation.path_or_fileobj)
+        if batch and (batch_size + size > max_size or len(batch) >= max_files):
+            batches.append(batch)
+            batch, batch_size = [], 0
+        batch.append(operation)
+        batch_size += size
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def _glob_to_regex(pattern: str) -> re.Pattern:
+    regex = re.escape(pattern).replace(r'\*\*/', '(?:.*/)?').replace(r'\*', '[^/]*')
+    return re.compile(f'^{regex}$')
+
+
 class HfOnlineRepository(DatasetRepository):
+    # head of the branch is rechecked after this, so a burst of reads is answered with one request
+    _SHA_TTL = 5.0
+    _SQUASH_RETRIES = 5
+    _UPLOAD_BATCH_SIZE = 1 << 30
+    _UPLOAD_BATCH_FILES = 256
+    _UPLOAD_RETRIES = 3
+
     def __init__(self, repo_id: str, revision: str = 'main'):
         self._repo_id = repo_id
         self._revision = revision
+        self._hf_client: Optional[HfApi] = None
+        self._hf_fs: Optional[HfFileSystem] = None
+        self._sha: Optional[Tuple[str, float]] = None
+        self._tree: Optional[Tuple[str, Dict[str, str]]] = None
+        self._synced_sha: Optional[str] = None
         DatasetRepository.__init__(self)
 
+    @property
+    def hf_client(self) -> HfApi:
+        if self._hf_client is None:
+            self._hf_client = get_hf_client(hf_token=os.environ.get('HF_TOKEN'))
+        return self._hf_client
+
+    @property
+    def hf_fs(self) -> HfFileSystem:
+        if self._hf_fs is None:
+            self._hf_fs = get_hf_fs(hf_token=os.environ.get('HF_TOKEN'))
+        return self._hf_fs
+
+    def _resolve_sha(self) -> str:
+        if self._sha is None or time.time() - self._sha[1] > self._SHA_TTL:
+            sha = self.hf_client.repo_info(
+                repo_id=self._repo_id,
+                repo_type='dataset',
+                revision=self._revision,
+            ).sha
+            self._sha = (sha, time.time())
+        return self._sha[0]
+
+    def _invalidate_sha(self):
+        self._sha = None
+
+    def _list_files(self, revision: str) -> Dict[str, str]:
+        # the tree of a commit never changes, so one listing answers all the lookups on it
+        if self._tree is None or self._tree[0] != revision:
+            files = {
+                item.path: item.blob_id for item in self.hf_client.list_repo_tree(
+                    repo_id=self._repo_id,
+                    repo_type='dataset',
+                    revision=revision,
+                    recursive=True,
+                )
+                if isinstance(item, RepoFile)
+            }
+            self._tree = (revision, files)
+        return self._tree[1]
+
+    def _file_exists(self, filename: str, revision: str) -> bool:
+        return filename in self._list_files(revision)
+
+    def _glob(self, pattern: str, revision: str) -> List[str]:
+        regex = _glob_to_regex(pattern)
+        return natsorted([file for file in self._list_files(revision) if regex.fullmatch(file)])
+
+    def _download(self, filename: str, revision: str) -> str:
+        return self.hf_client.hf_hub_download(
+            repo_id=self._repo_id,
+            repo_type='dataset',
+            revision=revision,
+            filename=filename,
+        )
+
     def _exist(self) -> bool:
-        hf_fs = get_hf_fs()
-        return hf_fs.exists(hf_fs_path(
+        return self.hf_fs.exists(hf_fs_path(
             repo_id=self._repo_id,
             repo_type='dataset',
             filename='meta.json',
             revision=self._revision,
         ))
 
-    def _write(self, tar_file: str, data_file: str, token: str):
+    def _write(self, tar_files: List[str], data_file: str, token: str):
         date_str = token[:8]
         with TemporaryDirectory() as td:
-            dst_tar_file = os.path.join(td, 'images', date_str, f'{token}.tar')
-            dst_idx_file = os.path.join(td, 'images', date_str, f'{token}.json')
-            os.makedirs(os.path.dirname(dst_tar_file), exist_ok=True)
-            shutil.copyfile(tar_file, dst_tar_file)
-            with open(dst_idx_file, 'w') as f:
-                json.dump(tar_get_index_info(dst_tar_file, with_hash=True), f)
+            archive_files = {}
+            for tar_file in tar_files:
+                dst_tar_file = os.path.join(td, 'images', date_str, os.path.basename(tar_file))
+                os.makedirs(os.path.dirname(dst_tar_file), exist_ok=True)
+                shutil.copyfile(tar_file, dst_tar_file)
+                archive_files[os.path.basename(tar_file)] = dst_tar_file
+            create_tar_indices(list(archive_files.values()))
 
             dst_data_file = os.path.join(td, 'unarchived', f'{token}.parquet')
             os.makedirs(os.path.dirname(dst_data_file), exist_ok=True)
             df = pd.read_parquet(data_file).replace(np.nan, None)
             records = [
-                {**item, 'archive_file': hf_normpath(os.path.relpath(dst_tar_file, td))}
+                {
+                    **item,
+                    'archive_file': hf_normpath(os.path.relpath(archive_files[item['archive_file']], td)),
+                }
                 for item in df.to_dict('records')
             ]
             df = pd.DataFrame(records)
@@ -59,7 +165,10 @@ class HfOnlineRepository(DatasetRepository):
                 named_authors = set(filter(bool, df['author'].tolist()))
             else:
                 named_authors = []
-            pack_name = os.path.basename(dst_tar_file)
+            if len(archive_files) == 1:
+                pack_name, = archive_files.keys()
+            else:
+                pack_name = f'{token} ({plural_word(len(archive_files), "archive")})'
             if named_authors:
                 commit_message = f'Add package with {plural_word(len(df), "sample")} contributed ' \
                                  f'by {", ".join(map(lambda x: f"@{x}", named_authors))} - {pack_name}'
@@ -73,181 +182,308 @@ class HfOnlineRepository(DatasetRepository):
                 path_in_repo='.',
                 message=commit_message,
             )
+        self._invalidate_sha()
 
     def _read_meta(self):
-        delete_detached_cache(repo_id=self._repo_id, repo_type='dataset')
-        hf_fs = get_hf_fs(hf_token=os.environ.get('HF_TOKEN'))
-        hf_client = get_hf_client(hf_token=os.environ['HF_TOKEN'])
-
-        meta_info = json.loads(hf_fs.read_text(hf_fs_path(
-            repo_id=self._repo_id,
-            repo_type='dataset',
-            revision=self._revision,
-            filename='meta.json',
-        )))
-        if hf_fs.exists(hf_fs_path(
-                repo_id=self._repo_id,
-                repo_type='dataset',
-                revision=self._revision,
-                filename='data.parquet'
-        )):
-            df = pd.read_parquet(hf_client.hf_hub_download(
-                repo_id=self._repo_id,
-                repo_type='dataset',
-                revision=self._revision,
-                filename='data.parquet'
-            ))
-            exist_ids = set(df['id'])
+        revision = self._resolve_sha()
+        if revision == self._synced_sha:
+            # nothing changed since last sync
+            return self.meta_info, self._exist_ids
+
+        with open(self._download('meta.json', revision), 'r') as f:
+            meta_info = json.load(f)
+        if self._file_exists('data.parquet', revision):
+            exist_ids = set(pd.read_parquet(self._download('data.parquet', revision))['id'])
         else:
             exist_ids = set()
 
+        self._synced_sha = revision
         return meta_info, exist_ids
 
-    def _get_table_file(self) -> Optional[str]:
-        hf_fs = get_hf_fs(hf_token=os.environ.get('HF_TOKEN'))
-        hf_client = get_hf_client(hf_token=os.environ['HF_TOKEN'])
+    def _resolve_revision(self) -> Optional[str]:
+        return self._resolve_sha()
 
-        if hf_fs.exists(hf_fs_path(
-                repo_id=self._repo_id,
-                repo_type='dataset',
-                revision=self._revision,
-                filename='data.parquet',
-        )):
-            return hf_client.hf_hub_download(
-                repo_id=self._repo_id,
-                repo_type='dataset',
-                revision=self._revision,
-                filename='data.parquet',
-            )
+    def _get_table_file(self, revision: Optional[str] = None) -> Optional[str]:
+        revision = revision or self._resolve_sha()
+        if self._file_exists('data.parquet', revision):
+            return self._download('data.parquet', revision)
         else:
             return None
 
     def _list_unarchived_table_files(self) -> List[str]:
-        hf_fs = get_hf_fs(hf_token=os.environ.get('HF_TOKEN'))
-        hf_client = get_hf_client(hf_token=os.environ['HF_TOKEN'])
-
-        files = []
-        for filepath in natsorted(hf_fs.glob(hf_fs_path(
-                repo_id=self._repo_id,
-                repo_type='dataset',
-                revision=self._revision,
-                filename='unarchived/*.parquet',
-        ))):
-            filename = parse_hf_fs_path(filepath).filename
-            files.append(hf_client.hf_hub_download(
-                repo_id=self._repo_id,
-                repo_type='dataset',
-                revision=self._revision,
-                filename=filename,
-            ))
+        revision = self._resolve_sha()
+        return [self._download(filename, revision) for filename in self._glob('unarchived/*.parquet', revision)]
 
-        return files
+    def _list_unarchived_packages(self) -> List[str]:
+        return self._glob('unarchived/*.parquet', self._resolve_sha())
 
-    def _download_image_file(self, archive_file: str, file_in_archive: str, dst_file: str):
+    def _download_image_file(self, archive_file: str, file_in_archive: str, dst_file: str,
+                             revision: Optional[str] = None):
         hf_tar_file_download(
             repo_id=self._repo_id,
             repo_type='dataset',
-            revision=self._revision,
+            revision=revision or self._revision,
             archive_in_repo=archive_file,
             file_in_archive=file_in_archive,
             local_file=dst_file,
         )
 
-    def _squash(self):
+    def _get_archive_file(self, archive_file: str, revision: Optional[str] = None) -> str:
+        return self._download(archive_file, revision or self._revision)
+
+    def _list_history_files(self, bucket: str) -> List[str]:
+        revision = self._resolve_sha()
+        return [
+            self._download(filename, revision)
+            for filename in self._glob(f'{history_bucket_dir(bucket)}/*.parquet', revision)
+        ]
+
+    def _list_archive_members(self, revision: Optional[str] = None) -> Dict[str, int]:
+        revision = revision or self._resolve_sha()
+
+        def _get_member_count(idx_filename: str) -> int:
+            with open(self._download(idx_filename, revision), 'r') as f:
+                return len(json.load(f)['files'])
+
+        idx_filenames = self._glob('images/**/*.json', revision)
+        with ThreadPoolExecutor(max_workers=12) as tp:
+            counts = list(tp.map(_get_member_count, idx_filenames))
+        return {
+            f'{os.path.splitext(idx_filename)[0]}.tar': count
+            for idx_filename, count in zip(idx_filenames, counts)
+        }
+
+    def _squash(self, compact: bool = False, compact_threshold: float = 0.5,
+                package_policy: Optional[PackagePolicy] = None, max_packages: Optional[int] = None,
+                readme: bool = True):
         delete_detached_cache(repo_id=self._repo_id, repo_type='dataset')
-        hf_fs = get_hf_fs(hf_token=os.environ.get('HF_TOKEN'))
-        hf_client = get_hf_client(hf_token=os.environ.get('HF_TOKEN'))
-
-        if hf_fs.exists(hf_fs_path(
-                repo_id=self._repo_id,
-                repo_type='dataset',
-                revision=self._revision,
-                filename='data.parquet',
-        )):
-            df = pd.read_parquet(hf_client.hf_hub_download(
-                repo_id=self._repo_id,
-                repo_type='dataset',
-                revision=self._revision,
-                filename='data.parquet',
-            ))
-            records = {item['id']: item for item in df.to_dict('records')}
-        else:
-            records = {}
-
-        files_to_drop = []
-        new_authors = set()
-        for filepath in natsorted(hf_fs.glob(hf_fs_path(
-                repo_id=self._repo_id,
-                repo_type='dataset',
-                revision=self._revision,
-                filename='unarchived/*.parquet',
-        ))):
-            filename = parse_hf_fs_path(filepath).filename
-            for item in pd.read_parquet(hf_client.hf_hub_download(
-                    repo_id=self._repo_id,
-                    repo_type='dataset',
-                    revision=self._revision,
-                    filename=filename,
-            )).to_dict('records'):
-                records[item['id']] = item
-                if item['author']:
-                    new_authors.add(item['author'])
-            files_to_drop.append(filename)
+        attempts = 0
+        while True:
+            # all the reads are pinned to one commit, so they are consistent and served from cache when possible
+            revision = self._resolve_sha()
+            if self._file_exists('data.parquet', revision):
+                df_data = pd.read_parquet(self._download('data.parquet', revision))
+                records = {item['id']: item for item in df_data.to_dict('records')}
+            else:
+                df_data = None
+                records = {}
+            if self._file_exists('qc/votes.parquet', revision):
+                df_votes = pd.read_parquet(self._download('qc/votes.parquet', revision))
+            else:
+                df_votes = None
+            base_files = {
+                filename: self._list_files(revision)[filename]
+                for filename in ['data.parquet', 'qc/votes.parquet'] if self._file_exists(filename, revision)
+            }
+
+            files_to_drop, df_packages, superseded = [], [], []
+            new_authors = set()
+
+            def _merge_packages(filenames: List[str]):
+                for filename in filenames:
+                    df_package = pd.read_parquet(self._download(filename, revision))
+                    for item in df_package.to_dict('records'):
+                        if item['id'] in records:
+                            superseded.append(records[item['id']])
+                        records[item['id']] = item
+                        if item['author']:
+                            new_authors.add(item['author'])
+                    df_packages.append(df_package)
+                    files_to_drop.append(filename)
+
+            # package names start with timestamps, so the oldest ones are merged first
+            pending = self._glob('unarchived/*.parquet', revision)
+            _merge_packages(pending[:max_packages])
+            unmerged = pending[len(files_to_drop):]
+            if not records:
+                logging.warning('No samples in total, squash operation cancelled.')
+                return
 
+            with TemporaryDirectory() as td:
+                archives_to_drop, new_archive_files = [], []
+                if compact:
+                    df = pd.DataFrame(list(records.values()))
+                    # only archives of the squashed samples are candidates, tars of the packages
+                    # left for the next squash have no live rows in df yet
+                    candidates = referenced_archives([df_data, *df_packages]) - referenced_archives(
+                        pd.read_parquet(self._download(filename, revision)) for filename in unmerged)
+                    archive_members = {file: count for file, count in self._list_archive_members(revision).items()
+                                       if file in candidates}
+                    archives_to_drop = select_archives_to_compact(df, archive_members, threshold=compact_threshold)
+                    df, new_archive_files = compact_archives(
+                        df=df,
+                        archive_files=archives_to_drop,
+                        fn_get_archive_file=lambda archive_file: self._get_archive_file(archive_file, revision),
+                        workdir=td,
+                        package_policy=package_policy,
+                    )
+                    records = {item['id']: item for item in df.to_dict('records')}
+
+                while True:
+                    df = pd.DataFrame(list(records.values()))
+                    df = df.sort_values(by=['updated_at', 'id'], ascending=[False, True])
+                    operations, commit_message = self._make_squash_commit(
+                        workdir=td,
+                        revision=revision,
+                        df=df,
+                        df_data=df_data,
+                        df_votes=df_votes,
+                        df_packages=df_packages,
+                        superseded=superseded,
+                        files_to_drop=files_to_drop,
+                        archives_to_drop=archives_to_drop,
+                        new_archive_files=new_archive_files,
+                        new_authors=new_authors,
+                        readme=readme,
+                    )
+
+                    self._preupload(operations)
+                    try:
+                        self.hf_client.create_commit(
+                            repo_id=self._repo_id,
+                            repo_type='dataset',
+                            revision=self._revision,
+                            operations=operations,
+                            commit_message=commit_message,
+                            parent_commit=revision,
+                        )
+                    except HfHubHTTPError as err:
+                        if not _is_commit_conflict(err):
+                            raise
+                    else:
+                        self._invalidate_sha()
+                        return
+
+                    attempts += 1
+                    if attempts >= self._SQUASH_RETRIES:
+                        raise SquashConflictError(f'Repository {self._repo_id!r} kept changing during squash, '
+                                                  f'gave up after {plural_word(attempts, "attempt")}.')
+                    self._invalidate_sha()
+                    revision = self._resolve_sha()
+                    if any(self._list_files(revision).get(filename) != blob_id
+                           for filename, blob_id in base_files.items()) or \
+                            any(not self._file_exists(filename, revision) for filename in files_to_drop):
+                        # squashed by others meanwhile, the merged state is stale
+                        logging.warning(f'Repository {self._repo_id!r} squashed by others meanwhile, '
+                                        f'squash restarted.')
+                        break
+
+                    # only packages pushed meanwhile, merge them into the squashed state
+                    new_files = [filename for filename in self._glob('unarchived/*.parquet', revision)
+                                 if filename not in files_to_drop]
+                    if max_packages is not None:
+                        new_files = new_files[:max(max_packages - len(files_to_drop), 0)]
+                    logging.info(f'Commit conflicted, {plural_word(len(new_files), "new package")} '
+                                 f'merged before retrying.')
+                    _merge_packages(new_files)
+
+    def _preupload(self, operations: List[CommitOperation]):
+        # large files are uploaded in bounded batches first, so the final commit only carries pointers.
+        # uploaded files are never uploaded again, a failed batch is resumed from where it stopped.
+        batches = _batch_additions(operations, max_size=self._UPLOAD_BATCH_SIZE, max_files=self._UPLOAD_BATCH_FILES)
+        for i, batch in enumerate(batches):
+            for attempt in range(1, self._UPLOAD_RETRIES + 1):
+                try:
+                    logging.info(f'Uploading batch #{i + 1}/{len(batches)}, '
+                                 f'with {plural_word(len(batch), "file")} ...')
+                    self.hf_client.preupload_lfs_files(
+                        repo_id=self._repo_id,
+                        repo_type='dataset',
+                        revision=self._revision,
+                        additions=batch,
+                    )
+                    break
+                except HfHubHTTPError as err:
+                    if attempt >= self._UPLOAD_RETRIES:
+                        raise
+                    logging.warning(f'Uploading batch #{i + 1}/{len(batches)} failed, retrying - {err!r}')
+                    time.sleep(2.0 ** attempt)
+
+    def _make_squash_commit(self, workdir: str, revision: str, df: pd.DataFrame,
+                            df_data: Optional[pd.DataFrame], df_votes: Optional[pd.DataFrame],
+                            df_packages: List[pd.DataFrame],
+                            superseded: List[dict], files_to_drop: List[str],
+                            archives_to_drop: List[str], new_archive_files: List[str], new_authors: set,
+                            readme: bool = True) \
+            -> Tuple[List[CommitOperation], str]:
         def _load_image_by_id(id_: str):
             selected_item = df[df['id'] == id_].to_dict('records')[0]
             with TemporaryDirectory() as ttd:
                 tmp_image_file = os.path.join(
                     ttd, f'image{os.path.splitext(selected_item["filename"])[1]}')
-                self._download_image_file(
-                    archive_file=selected_item['archive_file'],
-                    file_in_archive=selected_item['filename'],
-                    dst_file=tmp_image_file,
-                )
+                if selected_item['archive_file'] in new_archive_files:
+                    # compacted archives are not uploaded yet
+                    tar_file_download(
+                        archive_file=os.path.join(workdir, selected_item['archive_file']),
+                        file_in_archive=selected_item['filename'],
+                        local_file=tmp_image_file,
+                    )
+                else:
+                    self._download_image_file(
+                        archive_file=selected_item['archive_file'],
+                        file_in_archive=selected_item['filename'],
+                        dst_file=tmp_image_file,
+                        revision=revision,
+                    )
 
                 image = Image.open(tmp_image_file)
                 image.load()
                 return image
 
-        with TemporaryDirectory() as td:
-            df = pd.DataFrame(list(records.values()))
-            if len(df) == 0:
-                logging.warning('No samples in total, squash operation cancelled.')
-                return
-            df = df.sort_values(by=['updated_at', 'id'], ascending=[False, True])
-            df.to_parquet(os.path.join(td, 'data.parquet'), engine='pyarrow', index=False)
+        df.to_parquet(os.path.join(workdir, 'data.parquet'), engine='pyarrow', index=False)
+        df_votes = update_votes(df_votes=df_votes, df_data=df_data, df_packages=df_packages)
+        if len(df_votes) > 0:
+            write_qc_files(df_votes, os.path.join(workdir, 'qc'))
+        history_files = write_history(
+            superseded,
+            workdir=workdir,
+            fn_load_bucket=lambda bucket: load_history_bucket([
+                self._download(filename, revision)
+                for filename in self._glob(f'{history_bucket_dir(bucket)}/*.parquet', revision)
+            ]),
+            dropped_archives=archives_to_drop,
+        )
 
+        if readme:
             make_readme(
-                workdir=td,
+                workdir=workdir,
                 task_meta_info=self.meta_info,
                 df_samples=df,
                 fn_load_image=_load_image_by_id,
             )
 
-            operations = []
-            for root, _, files in os.walk(td):
-                for file in files:
-                    src_file = os.path.abspath(os.path.join(root, file))
-                    operations.append(CommitOperationAdd(
-                        path_in_repo=hf_normpath(os.path.relpath(src_file, td)),
-                        path_or_fileobj=src_file,
-                    ))
-            for file in files_to_drop:
-                operations.append(CommitOperationDelete(path_in_repo=file))
-
-            commit_message = f'Squash {plural_word(len(files_to_drop), "package")}, ' \
-                             f'now this dataset contains {plural_word(len(df), "sample")}'
-            if new_authors:
-                commit_message = f'{commit_message}, ' \
-                                 f'contributed by {", ".join([f"@{name}" for name in sorted(new_authors)])}'
-
-            hf_client.create_commit(
-                repo_id=self._repo_id,
-                repo_type='dataset',
-                revision=self._revision,
-                operations=operations,
-                commit_message=commit_message,
-            )
+        operations = []
+        for root, _, files in os.walk(workdir):
+            for file in files:
+                src_file = os.path.abspath(os.path.join(root, file))
+                operations.append(CommitOperationAdd(
+                    path_in_repo=hf_normpath(os.path.relpath(src_file, workdir)),
+                    path_or_fileobj=src_file,
+                ))
+        for file in files_to_drop:
+            operations.append(CommitOperationDelete(path_in_repo=file))
+        for bucket, history_file in history_files.items():
+            # files of the older layout are merged into the bucket file
+            for file in self._glob(f'{history_bucket_dir(bucket)}/*.parquet', revision):
+                if file != history_file:
+                    operations.append(CommitOperationDelete(path_in_repo=file))
+        for archive_file in archives_to_drop:
+            operations.append(CommitOperationDelete(path_in_repo=archive_file))
+            operations.append(CommitOperationDelete(path_in_repo=f'{os.path.splitext(archive_file)[0]}.json'))
+
+        commit_message = f'Squash {plural_word(len(files_to_drop), "package")}, ' \
+                         f'now this dataset contains {plural_word(len(df), "sample")}'
+        if archives_to_drop:
+            commit_message = f'{commit_message}, ' \
+                             f'{plural_word(len(archives_to_drop), "archive")} compacted ' \
+                             f'into {plural_word(len(new_archive_files), "archive")}'
+        if superseded:
+            commit_message = f'{commit_message}, ' \
+                             f'{plural_word(len(superseded), "superseded record")} kept in history'
+        if new_authors:
+            commit_message = f'{commit_message}, ' \
+                             f'contributed by {", ".join([f"@{name}" for name in sorted(new_authors)])}'
+        return operations, commit_message
 
     def __repr__(self):
         return f'<{self.__class__.__name__} repo_id: {self._repo_id!r}, revision: {self._revision!r}>'
@@ -3,16 +3,21 @@ import json
 import logging
 import os.path
 import shutil
-from typing import Optional, List
+import tarfile
+from typing import Optional, List, Dict
 
 import numpy as np
 import pandas as pd
 from PIL import Image
 from hbutils.system import TemporaryDirectory
-from hfutils.index import tar_get_index_info, tar_file_download
 from hfutils.utils import hf_normpath
+from natsort import natsorted
 
 from .base import DatasetRepository, RepoAlreadyExistsError
+from .compact import select_archives_to_compact, compact_archives, referenced_archives
+from .history import write_history, history_bucket_dir, load_history_bucket
+from .package import create_tar_indices, PackagePolicy
+from .qc import update_votes, write_qc_files
 from ..tasks import make_readme, init_project
 from ..utils import clear_directory
 
@@ -27,20 +32,24 @@ class LocalRepository(DatasetRepository):
     def _exist(self) -> bool:
         return os.path.exists(self._meta_info_file)
 
-    def _write(self, tar_file: str, data_file: str, token: str):
+    def _write(self, tar_files: List[str], data_file: str, token: str):
         date_str = token[:8]
-        dst_tar_file = os.path.join(self._repo_dir, 'images', date_str, f'{token}.tar')
-        dst_idx_file = os.path.join(self._repo_dir, 'images', date_str, f'{token}.json')
-        os.makedirs(os.path.dirname(dst_tar_file), exist_ok=True)
-        shutil.copyfile(tar_file, dst_tar_file)
-        with open(dst_idx_file, 'w') as f:
-            json.dump(tar_get_index_info(dst_tar_file, with_hash=True), f)
+        archive_files = {}
+        for tar_file in tar_files:
+            dst_tar_file = os.path.join(self._repo_dir, 'images', date_str, os.path.basename(tar_file))
+            os.makedirs(os.path.dirname(dst_tar_file), exist_ok=True)
+            shutil.copyfile(tar_file, dst_tar_file)
+            archive_files[os.path.basename(tar_file)] = dst_tar_file
+        create_tar_indices(list(archive_files.values()))
 
         dst_data_file = os.path.join(self._repo_dir, 'unarchived', f'{token}.parquet')
         os.makedirs(os.path.dirname(dst_data_file), exist_ok=True)
         df = pd.read_parquet(data_file).replace(np.nan, None)
         records = [
-            {**item, 'archive_file': hf_normpath(os.path.relpath(dst_tar_file, self._repo_dir))}
+            {
+                **item,
+                'archive_file': hf_normpath(os.path.relpath(archive_files[item['archive_file']], self._repo_dir)),
+            }
             for item in df.to_dict('records')
         ]
         df = pd.DataFrame(records)
@@ -55,7 +64,7 @@ class LocalRepository(DatasetRepository):
             exist_ids = set()
         return meta_info, exist_ids
 
-    def _get_table_file(self) -> Optional[str]:
+    def _get_table_file(self, revision: Optional[str] = None) -> Optional[str]:
         if os.path.exists(self._data_file):
             return self._data_file
         else:
@@ -64,33 +73,115 @@ class LocalRepository(DatasetRepository):
     def _list_unarchived_table_files(self) -> List[str]:
         return glob.glob(os.path.join(self._repo_dir, 'unarchived', '*.parquet'))
 
+    def _list_unarchived_packages(self) -> List[str]:
+        return natsorted([
+            hf_normpath(os.path.relpath(file, self._repo_dir))
+            for file in glob.glob(os.path.join(self._repo_dir, 'unarchived', '*.parquet'))
+        ])
+
     def _download_image_file(self, archive_file: str, file_in_archive: str, dst_file: str):
+        from hfutils.index import tar_file_download
         tar_file_download(
             archive_file=os.path.join(self._repo_dir, archive_file),
             file_in_archive=file_in_archive,
             local_file=dst_file,
         )
 
-    def _squash(self):
+    def _get_archive_file(self, archive_file: str, revision: Optional[str] = None) -> str:
+        return os.path.join(self._repo_dir, archive_file)
+
+    def _list_archive_members(self) -> Dict[str, int]:
+        archive_members = {}
+        for tar_file in glob.glob(os.path.join(self._repo_dir, 'images', '**', '*.tar'), recursive=True):
+            archive_file = hf_normpath(os.path.relpath(tar_file, self._repo_dir))
+            idx_file = os.path.splitext(tar_file)[0] + '.json'
+            if os.path.exists(idx_file):
+                with open(idx_file, 'r') as f:
+                    archive_members[archive_file] = len(json.load(f)['files'])
+            else:
+                with tarfile.open(tar_file, 'r|') as tar:
+                    archive_members[archive_file] = len([tarinfo for tarinfo in tar if tarinfo.isreg()])
+        return archive_members
+
+    def _list_history_files(self, bucket: str) -> List[str]:
+        return natsorted(glob.glob(os.path.join(self._repo_dir, history_bucket_dir(bucket), '*.parquet')))
+
+    def _squash(self, compact: bool = False, compact_threshold: float = 0.5,
+                package_policy: Optional[PackagePolicy] = None, max_packages: Optional[int] = None,
+                readme: bool = True):
         data_file = os.path.join(self._repo_dir, 'data.parquet')
         if os.path.exists(data_file):
-            df = pd.read_parquet(data_file)
-            records = {item['id']: item for item in df.to_dict('records')}
+            df_data = pd.read_parquet(data_file)
+            records = {item['id']: item for item in df_data.to_dict('records')}
         else:
+            df_data = None
             records = {}
 
-        files_to_drop = []
-        for file in glob.glob(os.path.join(self._repo_dir, 'unarchived', '*.parquet')):
-            for item in pd.read_parquet(file).to_dict('records'):
+        files_to_drop, df_packages, superseded = [], [], []
+        # package names start with timestamps, so the oldest ones are merged first
+        pending = self._list_unarchived_packages()
+        merging = pending[:max_packages]
+        unmerged = pending[len(merging):]
+        for filename in merging:
+            file = os.path.join(self._repo_dir, filename)
+            df_package = pd.read_parquet(file)
+            for item in df_package.to_dict('records'):
+                if item['id'] in records:
+                    superseded.append(records[item['id']])
                 records[item['id']] = item
+            df_packages.append(df_package)
             files_to_drop.append(file)
         df = pd.DataFrame(list(records.values()))
         if len(df) == 0:
             logging.warning('No samples in total, squash operation cancelled.')
+            return
         df = df.sort_values(by=['updated_at', 'id'], ascending=[False, True])
+
+        archives_to_drop = []
+        if compact:
+            # only archives of the squashed samples are candidates, tars of the packages still being written
+            # or left for the next squash have no live rows in df yet
+            candidates = referenced_archives([df_data, *df_packages]) - referenced_archives(
+                pd.read_parquet(os.path.join(self._repo_dir, filename)) for filename in unmerged)
+            archive_members = {file: count for file, count in self._list_archive_members().items()
+                               if file in candidates}
+            archives_to_drop = select_archives_to_compact(df, archive_members, threshold=compact_threshold)
+            df, _ = compact_archives(
+                df=df,
+                archive_files=archives_to_drop,
+                fn_get_archive_file=self._get_archive_file,
+                workdir=self._repo_dir,
+                package_policy=package_policy,
+            )
+
         df.to_parquet(data_file, engine='pyarrow', index=False)
+        votes_file = os.path.join(self._repo_dir, 'qc', 'votes.parquet')
+        df_votes = update_votes(
+            df_votes=pd.read_parquet(votes_file) if os.path.exists(votes_file) else None,
+            df_data=df_data,
+            df_packages=df_packages,
+        )
+        if len(df_votes) > 0:
+            write_qc_files(df_votes, os.path.join(self._repo_dir, 'qc'))
+        history_files = write_history(
+            superseded,
+            workdir=self._repo_dir,
+            fn_load_bucket=lambda bucket: load_history_bucket(self._list_history_files(bucket)),
+            dropped_archives=archives_to_drop,
+        )
+        for bucket, history_file in history_files.items():
+            # files of the older layout are merged into the bucket file
+            for file in self._list_history_files(bucket):
+                if hf_normpath(os.path.relpath(file, self._repo_dir)) != history_file:
+                    os.remove(file)
         for file in files_to_drop:
             os.remove(file)
+        for archive_file in archives_to_drop:
+            tar_file = os.path.join(self._repo_dir, archive_file)
+            idx_file = os.path.splitext(tar_file)[0] + '.json'
+            os.remove(tar_file)
+            if os.path.exists(idx_file):
+                os.remove(idx_file)
 
         def _load_image_by_id(id_: str):
             selected_item = df[df['id'] == id_].to_dict('records')[0]
@@ -107,12 +198,13 @@ class LocalRepository(DatasetRepository):
                 image.load()
                 return image
 
-        make_readme(
-            workdir=self._repo_dir,
-            task_meta_info=self.meta_info,
-            df_samples=df,
-            fn_load_image=_load_image_by_id,
-        )
+        if readme:
+            make_readme(
+                workdir=self._repo_dir,
+                task_meta_info=self.meta_info,
+                df_samples=df,
+                fn_load_image=_load_image_by_id,
+            )
 
     def __repr__(self):
         return f'<{self.__class__.__name__} dir: {self._repo_dir!r}>'
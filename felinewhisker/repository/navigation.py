@@ -0,0 +1,81 @@
+import json
+import os
+from threading import Lock
+from typing import List, Optional, Union
+
+
+class NavigationLog:
+    def __init__(self, log_file: str):
+        self._log_file = log_file
+        self._ids: List[str] = []
+        self._position = -1
+        self._max_length: Optional[int] = None
+        self._lock = Lock()
+        if os.path.exists(self._log_file):
+            self._replay()
+        self._f = None
+
+    def _replay(self):
+        with open(self._log_file, 'r') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                item = json.loads(line)
+                if 'id' in item:
+                    self._ids.append(item['id'])
+                if 'position' in item:
+                    self._position = item['position']
+                if 'max_length' in item:
+                    self._max_length = item['max_length']
+
+    def _log(self, item: dict):
+        # append-only, so each navigation costs one short line, no matter how long the session is
+        if self._f is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self._log_file)), exist_ok=True)
+            self._f = open(self._log_file, 'a', buffering=1)
+        self._f.write(json.dumps(item) + '\n')
+
+    @property
+    def position(self) -> int:
+        with self._lock:
+            return self._position
+
+    @property
+    def max_length(self) -> Optional[int]:
+        with self._lock:
+            return self._max_length
+
+    def append(self, id_: str) -> int:
+        with self._lock:
+            self._ids.append(id_)
+            self._position = len(self._ids) - 1
+            self._log({'id': id_, 'position': self._position})
+            return self._position
+
+    def seek(self, position: int):
+        with self._lock:
+            if not 0 <= position < len(self._ids):
+                raise IndexError(f'Position {position!r} out of range, {len(self._ids)} samples navigated.')
+            if position != self._position:
+                self._position = position
+                self._log({'position': position})
+
+    def finish(self):
+        with self._lock:
+            if self._max_length != len(self._ids):
+                self._max_length = len(self._ids)
+                self._log({'max_length': self._max_length})
+
+    def __getitem__(self, item: Union[int, slice]):
+        with self._lock:
+            return self._ids[item]
+
+    def __len__(self):
+        with self._lock:
+            return len(self._ids)
+
+    def close(self):
+        with self._lock:
+            if self._f is not None:
+                self._f.close()
+                self._f = None
@@ -0,0 +1,93 @@
+import json
+import os
+import tarfile
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Optional, Union, List, Tuple
+
+from hbutils.scale import size_to_bytes
+from tqdm import tqdm
+
+
+def _make_tarinfo(src_file: str, arcname: str) -> tarfile.TarInfo:
+    tarinfo = tarfile.TarInfo(arcname)
+    tarinfo.size = os.path.getsize(src_file)
+    # integer mtime, a float one makes tarfile write an extra pax header for each member
+    tarinfo.mtime = int(os.path.getmtime(src_file))
+    tarinfo.mode = 0o644
+    return tarinfo
+
+
+def _tar_member_size(tarinfo: tarfile.TarInfo) -> int:
+    # the header blocks (with pax ones for long names) plus the data blocks, as tarfile writes them
+    header_size = len(tarinfo.tobuf(tarfile.DEFAULT_FORMAT, tarfile.ENCODING, 'surrogateescape'))
+    return header_size + (tarinfo.size + tarfile.BLOCKSIZE - 1) // tarfile.BLOCKSIZE * tarfile.BLOCKSIZE
+
+
+def _tar_archive_size(members_size: int) -> int:
+    # two zero blocks of end-of-archive marker, then padded to a whole record
+    size = members_size + tarfile.BLOCKSIZE * 2
+    return (size + tarfile.RECORDSIZE - 1) // tarfile.RECORDSIZE * tarfile.RECORDSIZE
+
+
+@dataclass
+class PackagePolicy:
+    max_size: Optional[Union[int, str]] = None
+    max_members: Optional[int] = None
+
+    def __post_init__(self):
+        if self.max_size is not None:
+            self.max_size = size_to_bytes(self.max_size)
+            if self.max_size <= 0:
+                raise ValueError(f'Max size of package should be positive, but {self.max_size!r} found.')
+        if self.max_members is not None and self.max_members <= 0:
+            raise ValueError(f'Max members of package should be positive, but {self.max_members!r} found.')
+
+    def split(self, files: List[Tuple[str, str]]) -> List[List[Tuple[str, str]]]:
+        shards, current, current_size = [], [], 0
+        for src_file, arcname in files:
+            member_size = _tar_member_size(_make_tarinfo(src_file, arcname))
+            if current and (
+                    (self.max_members is not None and len(current) >= self.max_members) or
+                    (self.max_size is not None and _tar_archive_size(current_size + member_size) > self.max_size)
+            ):
+                shards.append(current)
+                current, current_size = [], 0
+            current.append((src_file, arcname))
+            current_size += member_size
+
+        if current or not shards:
+            shards.append(current)
+        return shards
+
+
+def pack_tar_files(files: List[Tuple[str, str]], dst_dir: str, name: str,
+                   policy: Optional[PackagePolicy] = None) -> List[Tuple[str, List[str]]]:
+    policy = policy or PackagePolicy()
+    shards = policy.split(files)
+    os.makedirs(dst_dir, exist_ok=True)
+
+    results = []
+    for i, shard in enumerate(shards):
+        tar_name = f'{name}.tar' if len(shards) == 1 else f'{name}-{i}.tar'
+        tar_file = os.path.join(dst_dir, tar_name)
+        with tarfile.open(tar_file, 'a:') as tar:
+            for src_file, arcname in tqdm(shard, desc=f'Packing {tar_name}'):
+                with open(src_file, 'rb') as f:
+                    tar.addfile(_make_tarinfo(src_file, arcname), f)
+        results.append((tar_file, [arcname for _, arcname in shard]))
+
+    return results
+
+
+def _create_tar_index(tar_file: str):
+    from hfutils.index import tar_get_index_info
+    idx_file = os.path.splitext(tar_file)[0] + '.json'
+    with open(idx_file, 'w') as f:
+        json.dump(tar_get_index_info(tar_file, with_hash=True), f)
+
+
+def create_tar_indices(tar_files: List[str], max_workers: int = 4):
+    with ThreadPoolExecutor(max_workers=max(min(max_workers, len(tar_files)), 1)) as tp:
+        for _ in tp.map(_create_tar_index, tar_files):
+            pass
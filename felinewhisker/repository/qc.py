@@ -0,0 +1,95 @@
+import json
+import os
+from typing import Optional, List
+
+import pandas as pd
+
+_VOTE_COLUMNS = ['id', 'author', 'annotation', 'updated_at']
+
+
+def _annotation_keys(annotations: pd.Series) -> pd.Series:
+    if pd.api.types.infer_dtype(annotations, skipna=True) == 'string':
+        return annotations
+    else:
+        return annotations.map(lambda x: json.dumps(x, sort_keys=True, default=str))
+
+
+def update_votes(df_votes: Optional[pd.DataFrame], df_data: Optional[pd.DataFrame],
+                 df_packages: List[pd.DataFrame]) -> pd.DataFrame:
+    df_packages = [df for df in df_packages if len(df) > 0]
+    frames = [df[_VOTE_COLUMNS] for df in [df_votes] if df is not None and len(df) > 0]
+    if df_packages:
+        df_new = pd.concat([df[_VOTE_COLUMNS] for df in df_packages], ignore_index=True)
+        if df_data is not None and len(df_data) > 0:
+            # the squashed annotations of the re-annotated samples are votes as well
+            frames.append(df_data.loc[df_data['id'].isin(df_new['id']), _VOTE_COLUMNS])
+        frames.append(df_new)
+    if not frames:
+        return pd.DataFrame(columns=_VOTE_COLUMNS)
+
+    df = pd.concat(frames, ignore_index=True)
+    df = df[df['author'].notnull() & df['annotation'].notnull()]
+    df = df.sort_values(by='updated_at', kind='stable').drop_duplicates(subset=['id', 'author'], keep='last')
+    # only the samples annotated by more than one author are kept for qc
+    df = df[df.groupby('id')['author'].transform('size') >= 2]
+    return df.sort_values(by=['id', 'author']).reset_index(drop=True)
+
+
+def compute_agreement(df_votes: pd.DataFrame) -> dict:
+    if len(df_votes) == 0:
+        return {'samples': 0, 'votes': 0, 'labels': {}, 'authors': {}}
+
+    df = pd.DataFrame({
+        'id': df_votes['id'].values,
+        'author': df_votes['author'].values,
+        'label': _annotation_keys(df_votes['annotation']).values,
+    })
+    df['n'] = df.groupby('id')['id'].transform('size')
+    df['c'] = df.groupby(['id', 'label'])['id'].transform('size')
+
+    # pairwise agreement of each sample, as in fleiss' kappa with variable number of raters
+    sample_agreement = ((df['c'] - 1) / (df['n'] - 1)).groupby(df['id']).mean()
+    label_shares = df['label'].value_counts(normalize=True)
+    p_bar = float(sample_agreement.mean())
+    p_e = float((label_shares ** 2).sum())
+    kappa = (p_bar - p_e) / (1.0 - p_e) if p_e < 1.0 else 1.0
+    unanimous = (df.groupby('id')['c'].min() == df.groupby('id')['n'].first())
+
+    # specific agreement of label, the probability that another vote agrees when one vote is this label
+    df_label = pd.DataFrame({
+        'votes': df.groupby('label').size(),
+        'agreed': (df['c'] - 1).groupby(df['label']).sum(),
+        'others': (df['n'] - 1).groupby(df['label']).sum(),
+    })
+    df_label['agreement'] = df_label['agreed'] / df_label['others']
+
+    # agreement of author with the other authors of the same samples
+    df_author = pd.DataFrame({
+        'votes': df.groupby('author').size(),
+        'agreed': (df['c'] - 1).groupby(df['author']).sum(),
+        'others': (df['n'] - 1).groupby(df['author']).sum(),
+    })
+    df_author['agreement'] = df_author['agreed'] / df_author['others']
+
+    return {
+        'samples': int(df['id'].nunique()),
+        'votes': int(len(df)),
+        'pairwise_agreement': p_bar,
+        'unanimous_ratio': float(unanimous.mean()),
+        'kappa': float(kappa),
+        'labels': {
+            str(label): {'votes': int(row['votes']), 'agreement': float(row['agreement'])}
+            for label, row in df_label.iterrows()
+        },
+        'authors': {
+            str(author): {'votes': int(row['votes']), 'agreement': float(row['agreement'])}
+            for author, row in df_author.iterrows()
+        },
+    }
+
+
+def write_qc_files(df_votes: pd.DataFrame, qc_dir: str):
+    os.makedirs(qc_dir, exist_ok=True)
+    df_votes.to_parquet(os.path.join(qc_dir, 'votes.parquet'), engine='pyarrow', index=False)
+    with open(os.path.join(qc_dir, 'agreement.json'), 'w') as f:
+        json.dump(compute_agreement(df_votes), f, indent=4, sort_keys=True)
@@ -0,0 +1,47 @@
+import tarfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterator, Tuple, Optional, List
+
+import pandas as pd
+from natsort import natsorted
+
+
+def iter_archive_members(df: pd.DataFrame, fn_get_archive_file: Callable[[str], str],
+                         prefetch: int = 2, archive_files: Optional[List[str]] = None) \
+        -> Iterator[Tuple[dict, bytes]]:
+    if len(df) == 0:
+        return
+
+    archive_groups = {
+        archive_file: df_archive.to_dict('records')
+        for archive_file, df_archive in df.groupby('archive_file', sort=False)
+    }
+    if archive_files is None:
+        archive_files = natsorted(archive_groups.keys())
+
+    with ThreadPoolExecutor(max_workers=max(prefetch, 1)) as tp:
+        futures = deque()
+        archive_iter = iter(archive_files)
+
+        def _submit_next():
+            for archive_file in archive_iter:
+                futures.append((archive_file, tp.submit(fn_get_archive_file, archive_file)))
+                break
+
+        for _ in range(max(prefetch, 1)):
+            _submit_next()
+
+        while futures:
+            archive_file, future = futures.popleft()
+            _submit_next()
+            rows = {item['filename']: item for item in archive_groups[archive_file]}
+            with tarfile.open(future.result(), 'r|') as tar:
+                for tarinfo in tar:
+                    tarinfo: tarfile.TarInfo
+                    if tarinfo.isreg() and tarinfo.name in rows:
+                        yield rows.pop(tarinfo.name), tar.extractfile(tarinfo).read()
+
+            if rows:
+                raise FileNotFoundError(f'Files {natsorted(rows.keys())!r} not found '
+                                        f'in archive {archive_file!r}.')
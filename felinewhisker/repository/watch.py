@@ -0,0 +1,48 @@
+import logging
+import time
+from threading import Event
+from typing import Optional
+
+from hbutils.string import plural_word
+
+from .base import DatasetRepository
+from .package import PackagePolicy
+
+
+def watch_squash(repo: DatasetRepository, interval: float = 60.0, max_packages: int = 16,
+                 readme_interval: float = 3600.0, compact: bool = False, compact_threshold: float = 0.5,
+                 package_policy: Optional[PackagePolicy] = None, stop_event: Optional[Event] = None):
+    if max_packages < 1:
+        raise ValueError(f'Max packages should be positive, but {max_packages!r} found.')
+    stop_event = stop_event or Event()
+    last_readme_at = time.time()
+    readme_stale = False
+    while not stop_event.is_set():
+        try:
+            pending = len(repo.list_unarchived_packages())
+            readme_due = time.time() - last_readme_at >= readme_interval
+            if pending > 0 or (readme_stale and readme_due):
+                # readme is only rendered with the last batch of the backlog
+                with_readme = readme_due and pending <= max_packages
+                logging.info(f'Squashing {plural_word(min(pending, max_packages), "package")} '
+                             f'of {pending} pending{", with readme" if with_readme else ""} ...')
+                repo.squash(
+                    compact=compact,
+                    compact_threshold=compact_threshold,
+                    package_policy=package_policy,
+                    max_packages=max_packages,
+                    readme=with_readme,
+                )
+                if with_readme:
+                    last_readme_at = time.time()
+                    readme_stale = False
+                else:
+                    readme_stale = True
+                if pending > max_packages:
+                    # drain the backlog without waiting
+                    continue
+        except Exception as err:
+            # keep watching, the failed batch will be retried in next round
+            logging.exception(f'Error occurred when squashing {repo!r} - {err!r}')
+
+        stop_event.wait(interval)
@@ -1,4 +1,4 @@
 from .base import AnnotationChecker
 from .classification import ClassificationAnnotationChecker
-from .dispatch import parse_annotation_checker, make_readme, init_project, create_annotator_ui, init_cli, \
-    list_task_types
+from .dispatch import parse_annotation_checker, make_readme, init_project, create_annotator_ui, \
+    create_grid_annotator_ui, init_cli, list_task_types
@@ -1,9 +1,11 @@
-from typing import Optional, Callable, Type
+from typing import Optional, Callable, Type, TYPE_CHECKING
 
-import gradio as gr
 import pandas as pd
 from PIL import Image
 
+if TYPE_CHECKING:
+    import gradio as gr
+
 
 class AnnotationChecker:
     __task__: Optional[str] = None
@@ -28,7 +30,11 @@ class TaskTypeRegistration:
         return cls.__cls_annotation_checker__.parse_from_meta(meta_info)
 
     @classmethod
-    def create_annotator_ui(cls, repo, block: gr.Blocks, gr_output_state: gr.State, **kwargs) -> gr.State:
+    def create_annotator_ui(cls, repo, block: 'gr.Blocks', gr_output_state: 'gr.JSON', **kwargs) -> 'gr.State':
+        raise NotImplementedError  # pragma: no cover
+
+    @classmethod
+    def create_grid_annotator_ui(cls, repo, block: 'gr.Blocks', gr_output_state: 'gr.State', **kwargs) -> 'gr.State':
         raise NotImplementedError  # pragma: no cover
 
     @classmethod
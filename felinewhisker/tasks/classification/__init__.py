@@ -1,4 +1,10 @@
 from .annotation import ClassificationAnnotationChecker
 from .dispatch import ClassificationRegistration
 from .project import create_readme_for_classification, init_project_for_classification
-from .ui import create_annotator_ui_for_classification
+from ...utils.lazy import lazy_attrs
+
+# gradio-based members are loaded on first use
+__getattr__, __dir__ = lazy_attrs(__name__, globals(), {
+    'create_annotator_ui_for_classification': '.ui',
+    'create_grid_annotator_ui_for_classification': '.ui',
+})
@@ -1,14 +1,14 @@
 import re
+from typing import TYPE_CHECKING
 
-import gradio as gr
 import pandas as pd
-from InquirerPy import inquirer
 
 from .annotation import ClassificationAnnotationChecker
 from .project import create_readme_for_classification, init_project_for_classification
-from .ui import create_annotator_ui_for_classification
 from ..base import TaskTypeRegistration, ImageLoaderTyping
-from ...utils import MultiStringEmptyValidator
+
+if TYPE_CHECKING:
+    import gradio as gr
 
 
 class ClassificationRegistration(TaskTypeRegistration):
@@ -16,7 +16,9 @@ class ClassificationRegistration(TaskTypeRegistration):
     __cls_annotation_checker__ = ClassificationAnnotationChecker
 
     @classmethod
-    def create_annotator_ui(cls, repo, block: gr.Blocks, gr_output_state: gr.State, **kwargs) -> gr.State:
+    def create_annotator_ui(cls, repo, block: 'gr.Blocks', gr_output_state: 'gr.JSON', **kwargs) -> 'gr.State':
+        # gradio is only loaded when building the app
+        from .ui import create_annotator_ui_for_classification
         return create_annotator_ui_for_classification(
             repo=repo,
             block=block,
@@ -24,6 +26,17 @@ class ClassificationRegistration(TaskTypeRegistration):
             **kwargs
         )
 
+    @classmethod
+    def create_grid_annotator_ui(cls, repo, block: 'gr.Blocks', gr_output_state: 'gr.State',
+                                 **kwargs) -> 'gr.State':
+        from .ui import create_grid_annotator_ui_for_classification
+        return create_grid_annotator_ui_for_classification(
+            repo=repo,
+            block=block,
+            gr_output_state=gr_output_state,
+            **kwargs
+        )
+
     @classmethod
     def init_project(cls, workdir: str, task_name: str, readme_metadata: dict, **kwargs):
         return init_project_for_classification(
@@ -45,6 +58,9 @@ class ClassificationRegistration(TaskTypeRegistration):
 
     @classmethod
     def init_cli(cls) -> dict:
+        from InquirerPy import inquirer
+        from ...utils import MultiStringEmptyValidator
+
         labels_text = inquirer.text(
             message='Labels for classification? (Split with comma)',
             validate=MultiStringEmptyValidator(
@@ -2,7 +2,7 @@ import json
 import os
 import random
 from concurrent.futures import ThreadPoolExecutor
-from typing import List, Callable
+from typing import List, Callable, Optional
 
 import pandas as pd
 import yaml
@@ -10,6 +10,7 @@ from PIL import Image
 from hbutils.string import plural_word
 from hfutils.utils import number_to_tag, hf_normpath
 
+from ...datasource.codec import CodecProfile
 from ...utils import padding_align
 
 
@@ -70,15 +71,19 @@ def create_readme_for_classification(workdir: str, task_meta_info: dict, df_samp
         print(f'', file=f)
 
 
-def init_project_for_classification(workdir: str, task_name: str, readme_metadata: dict, labels: List[str]):
+def init_project_for_classification(workdir: str, task_name: str, readme_metadata: dict, labels: List[str],
+                                    codec: Optional[dict] = None):
+    meta_info = {
+        'name': task_name,
+        'labels': labels,
+        'readme_metadata': readme_metadata,
+        'task': 'classification',
+    }
+    if codec is not None:
+        meta_info['codec'] = CodecProfile(**codec).to_meta()
     meta_file = os.path.join(workdir, 'meta.json')
     with open(meta_file, 'w') as f:
-        json.dump({
-            'name': task_name,
-            'labels': labels,
-            'readme_metadata': readme_metadata,
-            'task': 'classification',
-        }, f, indent=4, sort_keys=True, ensure_ascii=False)
+        json.dump(meta_info, f, indent=4, sort_keys=True, ensure_ascii=False)
 
     md_file = os.path.join(workdir, 'README.md')
     with open(md_file, 'w') as f:
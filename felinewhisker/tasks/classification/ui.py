@@ -1,6 +1,8 @@
+from typing import Optional
+
 import gradio as gr
 
-from ...utils import emoji_image_file
+from ...utils import emoji_image_file, prefetch_emojis
 
 _DEFAULT_HOTKEY_MAPS = [
     *(str(i) for i in range(1, 10)),
@@ -8,25 +10,84 @@ _DEFAULT_HOTKEY_MAPS = [
 ]
 _DEFAULT = object()
 
+# changes are buffered in the browser by the annotation tab, and written in batches
+_BUFFER_JS_CODE = '(change) => { if (window.felinewhiskerBuffer) { window.felinewhiskerBuffer(change); } }'
+
 _HOTKEY_EMOJIS = {
     *(str(i) for i in range(1, 10)),
     *(chr(ord('a') + i) for i in range(26))
 }
 
 
-def create_annotator_ui_for_classification(repo, block: gr.Blocks, gr_output_state: gr.State, hotkey_maps=_DEFAULT):
+def _prefetch_label_emojis(hotkey_maps):
+    # missing icons are downloaded in parallel, instead of one by one when building the buttons
+    prefetch_emojis([
+        *(f':keycap_{hotkey.upper()}:' for hotkey in hotkey_maps if hotkey in _HOTKEY_EMOJIS),
+        ':no_entry:',
+    ])
+
+
+def _make_hotkeys_js(hotkeys, unannotate_id: str, select_all_id: Optional[str] = None) -> str:
+    # the buttons are only clicked when visible, so the hotkeys of the inactive tab are ignored
+    js_elses = " else ".join([
+        f"if (event.key === {str(key)!r}) {{ clickVisible({btn_id!r}); }}"
+        for key, btn_id in hotkeys
+    ])
+    js_select_all = (
+        f"if (event.ctrlKey && event.key === 'a') {{ "
+        f"if (clickVisible({select_all_id!r})) {{ event.preventDefault(); }} "
+        f"}} else "
+        if select_all_id else ""
+    )
+    return f"""
+            function () {{
+                function clickVisible(elemId) {{
+                    const element = document.getElementById(elemId);
+                    if (element && element.offsetParent !== null) {{
+                        element.click();
+                        return true;
+                    }}
+                    return false;
+                }}
+
+                document.addEventListener('keydown', function(event) {{
+                    {js_select_all}if (event.key === 'Escape') {{
+                        clickVisible({unannotate_id!r});
+                    }} else if (!event.ctrlKey && !event.metaKey && !event.altKey) {{
+                        {js_elses}
+                    }}
+                }});
+            }}
+            """
+
+
+def create_annotator_ui_for_classification(repo, block: gr.Blocks, gr_output_state: gr.JSON, hotkey_maps=_DEFAULT):
     from ...repository import DatasetRepository
     repo: DatasetRepository
 
     labels = repo.meta_info['labels']
     hotkey_maps = _DEFAULT_HOTKEY_MAPS if hotkey_maps is _DEFAULT else hotkey_maps
+    _prefetch_label_emojis(hotkey_maps[:len(labels)])
 
     with gr.Row(elem_id='annotation_workspace'):
         gr_position_id = gr.State(value=-1)
         gr_sample_id = gr.State(value=None)
 
+        gr_full_image = gr.State(value=None)
+
         with gr.Column():
-            gr_sample = gr.Image(type='pil', label='', elem_classes='limit-height')
+            gr_sample = gr.Image(type='filepath', label='', elem_classes='limit-height')
+            gr_full_button = gr.Button(
+                value='Full Resolution',
+                elem_id='btn_full_resolution',
+                size='sm',
+                interactive=False,
+            )
+            gr_full_button.click(
+                fn=lambda full_image: (full_image, gr.update(interactive=False)),
+                inputs=[gr_full_image],
+                outputs=[gr_sample, gr_full_button],
+            )
 
         with gr.Column(elem_classes='limit-height'):
             with gr.Row():
@@ -48,18 +109,6 @@ def create_annotator_ui_for_classification(repo, block: gr.Blocks, gr_output_sta
                         ),
                     ) for i, (label, btn_id) in enumerate(zip(labels, btn_label_ids))]
 
-                    def _annotation_transition(annotation, triggered_state):
-                        new_state = triggered_state if (annotation != triggered_state) else None
-                        return new_state
-
-                    for i, label in enumerate(labels):
-                        gr_button = btns[i]
-                        gr_button.click(
-                            fn=_annotation_transition,
-                            inputs=[gr_annotation, gr.State(value=label)],
-                            outputs=[gr_annotation],
-                        )
-
             with gr.Row():
                 gr_unannotate_button = gr.Button(
                     value='Unannotate',
@@ -67,71 +116,218 @@ def create_annotator_ui_for_classification(repo, block: gr.Blocks, gr_output_sta
                     icon=emoji_image_file(':no_entry:'),
                     interactive=False,
                 )
-                gr_unannotate_button.click(
-                    fn=_annotation_transition,
-                    inputs=[gr_annotation, gr.State(value=None)],
-                    outputs=[gr_annotation],
-                )
+                gr_annotation_text = gr.HTML(elem_classes='tip-text right')
 
-                def _annotation_changed(current_position_id, state):
-                    new_btns = [
-                        gr.update(
-                            elem_classes='btn-label btn-selected' if state and label == state else 'btn-label',
-                            interactive=True,
-                        ) for i, (label, btn_id) in enumerate(zip(labels, btn_label_ids))
-                    ]
-                    unannotate_button = gr.update(interactive=True if state else False)
-                    if state:
-                        state_html = f'<p>Current Sample: #{current_position_id}</p>' \
-                                     f'<p>Annotated: <b>{state}</b></p>'
-                    else:
-                        state_html = f'<p>Current Sample: #{current_position_id}</p>' \
-                                     f'<p>Unannotated</p>'
-                    return state_html, unannotate_button, *new_btns
+            def _annotation_html(position_id, annotation):
+                if annotation:
+                    return f'<p>Current Sample: #{position_id}</p>' \
+                           f'<p>Annotated: <b>{annotation}</b></p>'
+                else:
+                    return f'<p>Current Sample: #{position_id}</p>' \
+                           f'<p>Unannotated</p>'
 
-                gr_annotation_text = gr.HTML(elem_classes='tip-text right')
-                gr_annotation.change(
-                    fn=_annotation_changed,
-                    inputs=[gr_position_id, gr_annotation],
-                    outputs=[gr_annotation_text, gr_unannotate_button, *btns],
-                ).then(
-                    fn=lambda _id, _annotation: (_id, _annotation),
-                    inputs=[gr_sample_id, gr_annotation],
-                    outputs=[gr_output_state],
-                )
+            def _button_updates(old_annotation, new_annotation):
+                # only the buttons whose selection changed are updated
+                updates = {}
+                for label, gr_button in zip(labels, btns):
+                    if label == old_annotation or label == new_annotation:
+                        updates[gr_button] = gr.update(
+                            elem_classes='btn-label btn-selected' if label == new_annotation else 'btn-label',
+                        )
+                return updates
 
-            js_elses = " else ".join([
-                f"if (event.key === {str(hotkey_maps[i])!r}) {{ document.getElementById({btn_id!r}).click(); }}"
-                for i, (label, btn_id) in enumerate(zip(labels, btn_label_ids))
-            ])
-            js_hotkeys = f"""
-                    function () {{
-                        document.addEventListener('keydown', function(event) {{
-                            if (event.key === 'Escape') {{
-                                document.getElementById('btn_unannoate_label').click();
-                            }} else {{
-                                {js_elses}
-                            }}
-                        }});
-                    }}
-                    """
+            def _fn_annotate(position_id, sample_id, annotation, triggered_state):
+                new_annotation = triggered_state if (annotation != triggered_state) else None
+                if sample_id is None or new_annotation == annotation:
+                    return {gr_output_state: None}
+
+                # only the change of the current sample is sent, older ones are already buffered
+                return {
+                    gr_annotation: new_annotation,
+                    gr_output_state: {sample_id: new_annotation},
+                    gr_annotation_text: _annotation_html(position_id, new_annotation),
+                    gr_unannotate_button: gr.update(interactive=bool(new_annotation)),
+                    **_button_updates(annotation, new_annotation),
+                }
+
+            for label, gr_button in zip(labels, btns):
+                gr_button.click(
+                    fn=_fn_annotate,
+                    inputs=[gr_position_id, gr_sample_id, gr_annotation, gr.State(value=label)],
+                    outputs=[gr_annotation, gr_output_state, gr_annotation_text,
+                             gr_unannotate_button, *btns],
+                ).then(fn=None, inputs=[gr_output_state], js=_BUFFER_JS_CODE)
+            gr_unannotate_button.click(
+                fn=_fn_annotate,
+                inputs=[gr_position_id, gr_sample_id, gr_annotation, gr.State(value=None)],
+                outputs=[gr_annotation, gr_output_state, gr_annotation_text,
+                         gr_unannotate_button, *btns],
+            ).then(fn=None, inputs=[gr_output_state], js=_BUFFER_JS_CODE)
 
-            block.load(None, js=js_hotkeys)
+            block.load(None, js=_make_hotkeys_js(
+                hotkeys=[(hotkey_maps[i], btn_id) for i, btn_id in enumerate(btn_label_ids)],
+                unannotate_id='btn_unannoate_label',
+            ))
 
         gr_input_state = gr.State(value=None)
 
-        def _fn_input_state_change(state):
-            position_id, sample_id, image, annotation = state
-            return position_id, sample_id, image, annotation
+        def _fn_input_state_change(state, old_position_id, old_annotation):
+            position_id, sample_id, image, annotation, full_image = state
+            if old_position_id < 0:
+                # buttons are enabled when the first sample is loaded
+                button_updates = {
+                    gr_button: gr.update(
+                        elem_classes='btn-label btn-selected' if label == annotation else 'btn-label',
+                        interactive=True,
+                    ) for label, gr_button in zip(labels, btns)
+                }
+            else:
+                button_updates = _button_updates(old_annotation, annotation)
+
+            return {
+                gr_position_id: position_id,
+                gr_sample_id: sample_id,
+                gr_sample: image,
+                gr_annotation: annotation,
+                gr_full_image: full_image,
+                gr_full_button: gr.update(interactive=image != full_image),
+                gr_annotation_text: _annotation_html(position_id, annotation),
+                gr_unannotate_button: gr.update(interactive=bool(annotation)),
+                **button_updates,
+            }
+
+        gr_input_state.change(
+            fn=_fn_input_state_change,
+            inputs=[gr_input_state, gr_position_id, gr_annotation],
+            outputs=[gr_position_id, gr_sample_id, gr_sample, gr_annotation,
+                     gr_full_image, gr_full_button, gr_annotation_text, gr_unannotate_button, *btns],
+        )
+
+    return gr_input_state
+
+
+def create_grid_annotator_ui_for_classification(repo, block: gr.Blocks, gr_output_state: gr.State,
+                                                hotkey_maps=_DEFAULT, columns: int = 4):
+    from ...repository import DatasetRepository
+    repo: DatasetRepository
+
+    labels = repo.meta_info['labels']
+    hotkey_maps = _DEFAULT_HOTKEY_MAPS if hotkey_maps is _DEFAULT else hotkey_maps
+    _prefetch_label_emojis(hotkey_maps[:len(labels)])
+
+    with gr.Row(elem_id='grid_workspace'):
+        gr_items = gr.State(value=[])
+
+        with gr.Column(scale=3):
+            gr_gallery = gr.Gallery(
+                label='',
+                columns=columns,
+                allow_preview=False,
+                object_fit='contain',
+                elem_classes='limit-height',
+            )
+
+        with gr.Column(scale=1, elem_classes='limit-height'):
+            gr_selected = gr.CheckboxGroup(choices=[], label='Selected Samples')
+            with gr.Row():
+                gr_select_all = gr.Button(value='Select All (Ctrl+A)', elem_id='btn_grid_select_all', size='sm')
+                gr_select_none = gr.Button(value='Clear', elem_id='btn_grid_select_none', size='sm')
+
+            btn_label_ids = [f'btn_grid_label_{label}' for label in labels]
+            btns = [gr.Button(
+                value=(
+                    f'({hotkey_maps[i].upper()}) {label}'
+                    if hotkey_maps[i] not in _HOTKEY_EMOJIS else label
+                ),
+                elem_id=btn_id,
+                elem_classes='btn-label',
+                icon=(
+                    emoji_image_file(f':keycap_{hotkey_maps[i].upper()}:')
+                    if hotkey_maps[i] in _HOTKEY_EMOJIS else None
+                ),
+            ) for i, (label, btn_id) in enumerate(zip(labels, btn_label_ids))]
+            gr_unannotate_button = gr.Button(
+                value='Unannotate',
+                elem_id='btn_grid_unannotate_label',
+                icon=emoji_image_file(':no_entry:'),
+            )
+            gr_grid_text = gr.HTML(elem_classes='tip-text right')
+
+        def _gallery_value(items):
+            return [
+                (image, f'#{i} {annotation}' if annotation is not None else f'#{i} (unannotated)')
+                for i, (_, image, annotation) in enumerate(items)
+            ]
 
+        def _grid_text(items):
+            annotated = sum(1 for _, _, annotation in items if annotation is not None)
+            return f'<p>Annotated: <b>{annotated}</b> / {len(items)}</p>'
+
+        def _fn_input_state_change(items):
+            items = items or []
+            choices = [(f'#{i} {sample_id}', sample_id) for i, (sample_id, _, _) in enumerate(items)]
+            return items, _gallery_value(items), gr.update(choices=choices, value=[]), _grid_text(items)
+
+        gr_input_state = gr.State(value=None)
         gr_input_state.change(
             fn=_fn_input_state_change,
             inputs=[gr_input_state],
-            outputs=[gr_position_id, gr_sample_id, gr_sample, gr_annotation]
-        ).then(
-            fn=_annotation_changed,
-            inputs=[gr_position_id, gr_annotation],
-            outputs=[gr_annotation_text, gr_unannotate_button, *btns],
+            outputs=[gr_items, gr_gallery, gr_selected, gr_grid_text],
+        )
+
+        def _fn_gallery_select(items, selected, evt: gr.SelectData):
+            sample_id = items[evt.index][0]
+            if sample_id in selected:
+                return [id_ for id_ in selected if id_ != sample_id]
+            else:
+                selected_ids = {*selected, sample_id}
+                return [id_ for id_, _, _ in items if id_ in selected_ids]
+
+        gr_gallery.select(
+            fn=_fn_gallery_select,
+            inputs=[gr_items, gr_selected],
+            outputs=[gr_selected],
+        )
+        gr_select_all.click(
+            fn=lambda items: [id_ for id_, _, _ in items],
+            inputs=[gr_items],
+            outputs=[gr_selected],
         )
+        gr_select_none.click(
+            fn=lambda: [],
+            outputs=[gr_selected],
+        )
+
+        def _fn_assign(items, selected, label):
+            if not selected:
+                gr.Warning('No samples selected.')
+                return items, gr.update(), gr.update(), gr.update(), gr.update()
+
+            # all the selected samples are committed with only one change of output state
+            selected_ids = set(selected)
+            mapping = {id_: label for id_, _, _ in items if id_ in selected_ids}
+            items = [
+                (id_, image, label if id_ in selected_ids else annotation)
+                for id_, image, annotation in items
+            ]
+            return items, _gallery_value(items), [], _grid_text(items), mapping
+
+        for label, gr_button in zip(labels, btns):
+            gr_button.click(
+                fn=_fn_assign,
+                inputs=[gr_items, gr_selected, gr.State(value=label)],
+                outputs=[gr_items, gr_gallery, gr_selected, gr_grid_text, gr_output_state],
+            )
+        gr_unannotate_button.click(
+            fn=_fn_assign,
+            inputs=[gr_items, gr_selected, gr.State(value=None)],
+            outputs=[gr_items, gr_gallery, gr_selected, gr_grid_text, gr_output_state],
+        )
+
+        block.load(None, js=_make_hotkeys_js(
+            hotkeys=[(hotkey_maps[i], btn_id) for i, btn_id in enumerate(btn_label_ids)],
+            unannotate_id='btn_grid_unannotate_label',
+            select_all_id='btn_grid_select_all',
+        ))
 
     return gr_input_state
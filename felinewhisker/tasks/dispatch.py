@@ -1,12 +1,14 @@
-from typing import Dict, Callable, Type, List
+from typing import Dict, Callable, Type, List, TYPE_CHECKING
 
-import gradio as gr
 import pandas as pd
 from PIL import Image
 
 from .base import AnnotationChecker, TaskTypeRegistration
 from .classification import ClassificationRegistration
 
+if TYPE_CHECKING:
+    import gradio as gr
+
 _KNOWN_TASK_TYPES: Dict[str, Type[TaskTypeRegistration]] = {}
 
 
@@ -43,7 +45,7 @@ def init_project(task_type: str, workdir: str, task_name: str, readme_metadata:
     )
 
 
-def create_annotator_ui(repo, block: gr.Blocks, gr_output_state: gr.State, **kwargs) -> gr.State:
+def create_annotator_ui(repo, block: 'gr.Blocks', gr_output_state: 'gr.JSON', **kwargs) -> 'gr.State':
     from ..repository import DatasetRepository
     repo: DatasetRepository
 
@@ -55,6 +57,18 @@ def create_annotator_ui(repo, block: gr.Blocks, gr_output_state: gr.State, **kwa
     )
 
 
+def create_grid_annotator_ui(repo, block: 'gr.Blocks', gr_output_state: 'gr.State', **kwargs) -> 'gr.State':
+    from ..repository import DatasetRepository
+    repo: DatasetRepository
+
+    return _KNOWN_TASK_TYPES[repo.meta_info['task']].create_grid_annotator_ui(
+        repo=repo,
+        block=block,
+        gr_output_state=gr_output_state,
+        **kwargs
+    )
+
+
 def init_cli(task_type: str):
     return _KNOWN_TASK_TYPES[task_type].init_cli()
 
@@ -2,19 +2,28 @@ import datetime
 import html
 import inspect
 import json
-import os.path
 import pathlib
-from typing import Iterable, Callable, Optional, Any
+from typing import Callable, Optional, Any, List
 
 import gradio as gr
 from hbutils.string import plural_word
 
-from ..datasource import ImageItem
-from ..repository import DatasetRepository, WriterSession
+from .sessions import SessionPool, AnnotatorSession
+from ..repository import DatasetRepository
 from ..tasks import create_annotator_ui
 from ..utils import emoji_image_file
 
 _HOTKEY_JS_CODE = (pathlib.Path(__file__).parent / 'hotkeys.js').read_text()
+_PRELOAD_JS_CODE = '(urls) => { if (window.felinewhiskerPreload) { window.felinewhiskerPreload(urls); } }'
+_TAKE_CHANGES_JS_CODE = '(_) => (window.felinewhiskerTakeChanges ? window.felinewhiskerTakeChanges() : {})'
+
+
+def get_file_url(file: str) -> str:
+    # relative to the page, so it resolves to the same url as the one used by the image components
+    if int(gr.__version__.split('.')[0]) >= 5:
+        return f'gradio_api/file={file}'
+    else:
+        return f'file={file}'
 
 
 def get_fn_signature(func: Callable) -> str:
@@ -32,50 +41,12 @@ def get_fn_signature(func: Callable) -> str:
 
 
 def create_annotation_tab(
-        repo: DatasetRepository, demo: gr.Blocks,
-        datasource: Iterable[ImageItem], write_session: WriterSession, state_file: str,
-        fn_annotate_assist: Optional[Callable[[str], Any]] = None, **kwargs
+        repo: DatasetRepository, demo: gr.Blocks, session_pool: SessionPool,
+        fn_annotate_assist: Optional[Callable[[str], Any]] = None, preload_count: int = 3, **kwargs
 ):
-    data_iterator = iter(datasource)
-
-    gr_state_output = gr.State(value=None)
+    # changes of the annotator are buffered in the browser, not written one by one
+    gr_state_output = gr.JSON(value=None, visible=False)
     gr_position_id = gr.State(value=-1)
-    gr_max_length = gr.State(value=None)
-    gr_id_list = gr.State(value=[])
-
-    def _fn_state_save(position_id, max_length, id_list):
-        with open(state_file, 'w') as f:
-            json.dump({
-                'position_id': position_id,
-                'max_length': max_length,
-                'id_list': id_list,
-            }, f, indent=4, sort_keys=True)
-
-    gr_position_id.change(
-        fn=_fn_state_save,
-        inputs=[gr_position_id, gr_max_length, gr_id_list],
-    )
-    gr_max_length.change(
-        fn=_fn_state_save,
-        inputs=[gr_position_id, gr_max_length, gr_id_list],
-    )
-    gr_id_list.change(
-        fn=_fn_state_save,
-        inputs=[gr_position_id, gr_max_length, gr_id_list],
-    )
-
-    def _fn_load_state():
-        if os.path.exists(state_file):
-            with open(state_file, 'r') as f:
-                state = json.load(f)
-                return state['position_id'], state['max_length'], state['id_list']
-        else:
-            return -1, None, []
-
-    demo.load(
-        fn=_fn_load_state,
-        outputs=[gr_position_id, gr_max_length, gr_id_list],
-    )
 
     with gr.Row():
         gr_state_input = create_annotator_ui(
@@ -103,13 +74,15 @@ def create_annotation_tab(
             icon=emoji_image_file(':floppy_disk:'),
             interactive=False,
         )
+        gr_flush = gr.Button(
+            value='Flush',
+            elem_id='flush-button',
+            elem_classes='hidden-trigger',
+        )
 
     with gr.Row(elem_classes='bottom-state'):
         with gr.Column(scale=2):
-            gr.HTML(
-                f"<p>Session: <u>{html.escape(write_session.session_token)}</u></p>",
-                elem_classes='bottom-state-session'
-            )
+            gr_session_state = gr.HTML(elem_classes='bottom-state-session')
         with gr.Column(scale=1):
             if fn_annotate_assist:
                 gr.HTML(
@@ -119,61 +92,100 @@ def create_annotation_tab(
         with gr.Column(scale=1):
             gr_save_state = gr.HTML(elem_classes='bottom-state-save-time')
 
-    def _fn_prev(idx, ids):
+    # the navigated ids and the cursor are kept in the writer session, only the position is sent
+    def _fn_load_session(request: gr.Request):
+        session = session_pool.get(request)
+        return session.write_session.navigation.position, \
+            f"<p>Session: <u>{html.escape(session.write_session.session_token)}</u></p>"
+
+    demo.load(
+        fn=_fn_load_session,
+        outputs=[gr_position_id, gr_session_state],
+    )
+
+    gr_preload_urls = gr.Textbox(value='[]', visible=False)
+    gr_preload_urls.change(
+        fn=None,
+        inputs=[gr_preload_urls],
+        js=_PRELOAD_JS_CODE,
+    )
+
+    def _ch_flush(mapping, request: gr.Request):
+        if mapping:
+            session_pool.get(request).commit(mapping)
+
+    # the buffered changes are taken by js, and sent in place of the output value
+    gr_flush.click(
+        fn=_ch_flush,
+        inputs=[gr_state_output],
+        js=_TAKE_CHANGES_JS_CODE,
+    )
+
+    def _fn_prev(idx, request: gr.Request):
         if idx <= 0:
             raise gr.Error('This is the first image, no previous sample.')
         idx -= 1
-        return idx, ids
+        session_pool.get(request).write_session.navigation.seek(idx)
+        return idx
 
+    # the buffered changes are written before navigating, so the loaded annotation is up to date
     gr_prev.click(
+        fn=_ch_flush,
+        inputs=[gr_state_output],
+        js=_TAKE_CHANGES_JS_CODE,
+    ).then(
         fn=_fn_prev,
-        inputs=[gr_position_id, gr_id_list],
-        outputs=[gr_position_id, gr_id_list],
+        inputs=[gr_position_id],
+        outputs=[gr_position_id],
     )
 
-    def _fn_next(idx, ids, max_length):
-        origin_idx = idx
+    def _fn_next(idx, request: gr.Request):
+        session = session_pool.get(request)
+        navigation = session.write_session.navigation
         idx += 1
-        if idx >= len(ids):
-            try:
+        if idx < len(navigation):
+            navigation.seek(idx)
+        else:
+            if not session.stager.is_ready():
                 gr.Info(f'Loading image #{idx} ...')
-                item: ImageItem = next(data_iterator)
-            except StopIteration:
+            sample_id = session.next_sample()
+            if sample_id is None:
                 gr.Warning('No more images in the data source, '
                            'you have met the end.')
-                idx = origin_idx
-                max_length = len(ids)
+                navigation.finish()
+                idx -= 1
             else:
-                sample_id = item.id
-                with item.make_file(force_reencode=True) as image_file:
-                    write_session.add(
-                        id_=item.id,
-                        image_file=image_file,
-                        annotation=item.annotation,
-                    )
-                ids.append(sample_id)
+                idx = navigation.append(sample_id)
 
-        return idx, ids, max_length
+        return idx
 
     gr_next.click(
-        fn=_fn_next,
-        inputs=[gr_position_id, gr_id_list, gr_max_length],
-        outputs=[gr_position_id, gr_id_list, gr_max_length],
-    )
-
-    def _ch_change(state):
-        id_, annotation = state
-        write_session[id_] = annotation
-
-    gr_state_output.change(
-        fn=_ch_change,
+        fn=_ch_flush,
         inputs=[gr_state_output],
+        js=_TAKE_CHANGES_JS_CODE,
+    ).then(
+        fn=_fn_next,
+        inputs=[gr_position_id],
+        outputs=[gr_position_id],
     )
 
-    def _fn_index_change(idx, ids, max_length):
-        sample_id = ids[idx]
+    def _preload_ids(session: AnnotatorSession, idx) -> List[str]:
+        navigation = session.write_session.navigation
+        next_ids = navigation[idx + 1:idx + 1 + preload_count]
+        if len(next_ids) < preload_count:
+            next_ids.extend(session.stager.peek()[:preload_count - len(next_ids)])
+        if idx > 0:
+            next_ids.append(navigation[idx - 1])
+        return next_ids
+
+    def _fn_index_change(idx, request: gr.Request):
+        session = session_pool.get(request)
+        write_session = session.write_session
+        sample_id = write_session.navigation[idx]
+        max_length = write_session.navigation.max_length
         annotation = write_session[sample_id]
         image_file = write_session.get_image_path(sample_id)
+        session.touch(sample_id)
 
         if fn_annotate_assist and annotation is None:
             gr.Info(f'Annotating sample #{idx} by assistant ...')
@@ -184,18 +196,21 @@ def create_annotation_tab(
             else:
                 gr.Warning(f'No recommendation for sample #{idx}.')
 
-        return (idx, sample_id, image_file, annotation), \
+        preload_files = [write_session.get_proxy_path(id_) for id_ in _preload_ids(session, idx)]
+        return (idx, sample_id, write_session.get_proxy_path(sample_id), annotation, image_file), \
             gr.update(interactive=idx > 0), \
             gr.update(interactive=max_length is None or idx < max_length - 1), \
-            gr.update(interactive=True)
+            gr.update(interactive=True), \
+            json.dumps([get_file_url(file) for file in preload_files])
 
     gr_position_id.change(
         fn=_fn_index_change,
-        inputs=[gr_position_id, gr_id_list, gr_max_length],
-        outputs=[gr_state_input, gr_prev, gr_next, gr_save],
+        inputs=[gr_position_id],
+        outputs=[gr_state_input, gr_prev, gr_next, gr_save, gr_preload_urls],
     )
 
-    def _fn_save():
+    def _fn_save(request: gr.Request):
+        write_session = session_pool.get(request).write_session
         yield gr.update(interactive=False, value='Saving'), gr.update()
         save_count = write_session.get_annotated_count()
         gr.Info(f'Saving {plural_word(save_count, "annotated sample")} ...')
@@ -205,6 +220,10 @@ def create_annotation_tab(
         gr.Info(f'{plural_word(save_count, "sample")} saved!')
 
     gr_save.click(
+        fn=_ch_flush,
+        inputs=[gr_state_output],
+        js=_TAKE_CHANGES_JS_CODE,
+    ).then(
         fn=_fn_save,
         outputs=[gr_save, gr_save_state],
     )
@@ -1,44 +1,105 @@
 import logging
-import os
 import pathlib
 from contextlib import contextmanager
-from typing import Optional, ContextManager, Callable, Any
+from typing import Optional, ContextManager, Callable, Any, Union, List
 
 import gradio as gr
 from hbutils.string import titleize
-from hbutils.system import TemporaryDirectory
 from hfutils.operate import get_hf_client
 from huggingface_hub.errors import LocalTokenNotFoundError
 
 from .annotate import create_annotation_tab
+from .grid import create_grid_annotation_tab
+from .sessions import SessionPool, AnnotatorSession, SingleSessionPool, MultiUserSessionPool
 from .squash import create_squash_tab
-from ..datasource import BaseDataSource
-from ..repository import DatasetRepository
+from .staging import SampleStager
+from .workqueue import WorkQueue
+from ..datasource import BaseDataSource, MixedDataSource, CodecProfile
+from ..repository import DatasetRepository, PackagePolicy
 
 _GLOBAL_CSS_CODE = (pathlib.Path(__file__).parent / 'global.css').read_text()
 
 
+@contextmanager
+def _create_session_pool(repo: DatasetRepository, source: BaseDataSource, author: Optional[str],
+                         package_policy: Optional[PackagePolicy], staging_ahead: int,
+                         multi_user: bool, lease_timeout: float, qc_fraction: float,
+                         qc_annotators: int, proxy_size: Optional[int]) -> ContextManager[SessionPool]:
+    if multi_user:
+        # one fetch pipeline for all the annotators, samples are leased to them one by one,
+        # except the qc samples, which are leased to several annotators for agreement statistics
+        work_queue = WorkQueue(
+            datasource=source,
+            lease_timeout=lease_timeout,
+            prefetch=staging_ahead * 2,
+            qc_fraction=qc_fraction,
+            qc_annotators=qc_annotators,
+        )
+        source.set_fn_contains_id(
+            lambda id_: repo.contains_id(id_) or work_queue.contains_id(id_),
+            lambda ids: [repo.contains_id(id_) or known for id_, known in zip(ids, work_queue.contains_ids(ids))],
+        )
+        session_pool = MultiUserSessionPool(
+            repo=repo,
+            work_queue=work_queue,
+            package_policy=package_policy,
+            staging_ahead=staging_ahead,
+            proxy_size=proxy_size,
+        )
+        try:
+            yield session_pool
+        finally:
+            session_pool.close()
+
+    else:
+        with repo.write(author=author, package_policy=package_policy, proxy_size=proxy_size) as write_session:
+            source.set_fn_contains_id(write_session.is_id_duplicated, write_session.are_ids_duplicated)
+            # the next samples are staged in background, so they are ready when navigated to
+            stager = SampleStager(source, write_session, ahead=staging_ahead,
+                                  codec=CodecProfile.from_meta(repo.meta_info))
+            session_pool = SingleSessionPool(AnnotatorSession(write_session, stager, author))
+            try:
+                yield session_pool
+            finally:
+                session_pool.close()
+
+
 @contextmanager
 def create_annotator_app(
-        repo: DatasetRepository, datasource: BaseDataSource, author: Optional[str] = None,
+        repo: DatasetRepository, datasource: Union[BaseDataSource, List[BaseDataSource]],
+        author: Optional[str] = None,
         fn_annotate_assist: Optional[Callable[[str], Any]] = None,
-        annotation_options: Optional[dict] = None
+        annotation_options: Optional[dict] = None, package_policy: Optional[PackagePolicy] = None,
+        preload_count: int = 3, grid_page_size: Optional[int] = 16,
+        multi_user: bool = False, lease_timeout: float = 600.0,
+        qc_fraction: float = 0.0, qc_annotators: int = 2, proxy_size: Optional[int] = 1024,
 ) -> ContextManager[gr.Blocks]:
-    hf_client = get_hf_client()
+    if isinstance(datasource, (list, tuple)):
+        datasource = MixedDataSource(datasource)
 
-    if not author:
+    if multi_user:
+        # authors are the logged-in users, launch the app with auth
+        author = None
+    elif not author:
         try:
-            info = hf_client.whoami()
+            info = get_hf_client().whoami()
             author = info['name']
         except LocalTokenNotFoundError:
             logging.warning('Huggingface auth failed, no author name used, this session will run as guest.')
             author = None
 
-    with TemporaryDirectory(prefix='felinewhisker_') as td_state, \
-            repo.write(author=author) as write_session, datasource as source:
-        state_file = os.path.join(td_state, 'state.json')
-        source.set_fn_contains_id(write_session.is_id_duplicated)
-
+    with datasource as source, _create_session_pool(
+            repo=repo,
+            source=source,
+            author=author,
+            package_policy=package_policy,
+            staging_ahead=preload_count,
+            multi_user=multi_user,
+            lease_timeout=lease_timeout,
+            qc_fraction=qc_fraction,
+            qc_annotators=qc_annotators,
+            proxy_size=proxy_size,
+    ) as session_pool:
         with gr.Blocks(css=_GLOBAL_CSS_CODE) as demo:
             with gr.Row(elem_id='annotation_title'):
                 with gr.Column():
@@ -49,7 +110,17 @@ def create_annotator_app(
                     )
                     _ = gr_title
 
-                    if author:
+                    if multi_user:
+                        gr_subtitle = gr.HTML()
+
+                        def _fn_hello(request: gr.Request):
+                            return f'<p class="subtitle">Hello, <u>@{request.username}</u>!</p>'
+
+                        demo.load(
+                            fn=_fn_hello,
+                            outputs=[gr_subtitle],
+                        )
+                    elif author:
                         gr_subtitle = gr.HTML(
                             f'<p class="subtitle">'
                             f'Hello, <u>@{author}</u>!'
@@ -63,19 +134,39 @@ def create_annotator_app(
                         )
                     _ = gr_subtitle
 
+            def _fn_set_staging_ahead(ahead: int):
+                def _fn(request: gr.Request):
+                    session_pool.get(request).stager.set_ahead(ahead)
+
+                return _fn
+
             with gr.Row():
                 with gr.Tabs():
-                    with gr.Tab('Annotation'):
+                    with gr.Tab('Annotation') as gr_annotation_tab:
                         create_annotation_tab(
                             repo=repo,
                             demo=demo,
-                            datasource=source,
-                            write_session=write_session,
-                            state_file=state_file,
+                            session_pool=session_pool,
                             fn_annotate_assist=fn_annotate_assist,
+                            preload_count=preload_count,
                             **(annotation_options or {}),
                         )
 
+                    if grid_page_size:
+                        with gr.Tab('Grid') as gr_grid_tab:
+                            create_grid_annotation_tab(
+                                repo=repo,
+                                demo=demo,
+                                session_pool=session_pool,
+                                page_size=grid_page_size,
+                                fn_annotate_assist=fn_annotate_assist,
+                                **(annotation_options or {}),
+                            )
+
+                        # a whole page is only staged ahead while the grid is visible
+                        gr_grid_tab.select(fn=_fn_set_staging_ahead(max(preload_count, grid_page_size)))
+                        gr_annotation_tab.select(fn=_fn_set_staging_ahead(preload_count))
+
                     with gr.Tab('Squash'):
                         create_squash_tab(
                             repo=repo,
@@ -0,0 +1,126 @@
+from typing import Callable, Optional, Any
+
+import gradio as gr
+from hbutils.string import plural_word
+
+from .sessions import SessionPool
+from ..repository import DatasetRepository
+from ..tasks import create_grid_annotator_ui
+from ..utils import emoji_image_file
+
+
+def create_grid_annotation_tab(
+        repo: DatasetRepository, demo: gr.Blocks,
+        session_pool: SessionPool, page_size: int = 16,
+        fn_annotate_assist: Optional[Callable[[str], Any]] = None, **kwargs
+):
+    gr_state_output = gr.State(value=None)
+    gr_page_id = gr.State(value=-1)
+    gr_pages = gr.State(value=[])
+    gr_exhausted = gr.State(value=False)
+
+    with gr.Row():
+        gr_state_input = create_grid_annotator_ui(
+            repo=repo,
+            block=demo,
+            gr_output_state=gr_state_output,
+            **kwargs
+        )
+
+    with gr.Row():
+        gr_prev = gr.Button(
+            value='Prev Page',
+            elem_id='grid-left-button',
+            icon=emoji_image_file(':left_arrow:'),
+            interactive=False,
+        )
+        gr_next = gr.Button(
+            value='Next Page',
+            elem_id='grid-right-button',
+            icon=emoji_image_file(':right_arrow:'),
+        )
+
+    with gr.Row(elem_classes='bottom-state'):
+        gr_page_state = gr.HTML(elem_classes='bottom-state-session')
+
+    def _fn_prev(page_id):
+        if page_id <= 0:
+            raise gr.Error('This is the first page, no previous page.')
+        return page_id - 1
+
+    gr_prev.click(
+        fn=_fn_prev,
+        inputs=[gr_page_id],
+        outputs=[gr_page_id],
+    )
+
+    def _fn_next(page_id, pages, exhausted, request: gr.Request):
+        session = session_pool.get(request)
+        page_id += 1
+        if page_id >= len(pages):
+            if not exhausted:
+                gr.Info(f'Loading page #{page_id} ...')
+                ids = []
+                while len(ids) < page_size:
+                    sample_id = session.next_sample()
+                    if sample_id is None:
+                        exhausted = True
+                        break
+                    ids.append(sample_id)
+                if ids:
+                    pages.append(ids)
+
+            if page_id >= len(pages):
+                gr.Warning('No more images in the data source, '
+                           'you have met the end.')
+                page_id = len(pages) - 1
+
+        return page_id, pages, exhausted
+
+    gr_next.click(
+        fn=_fn_next,
+        inputs=[gr_page_id, gr_pages, gr_exhausted],
+        outputs=[gr_page_id, gr_pages, gr_exhausted],
+    )
+
+    def _ch_change(mapping, request: gr.Request):
+        if mapping:
+            session_pool.get(request).commit(mapping)
+
+    # each change only holds the samples of one assignment, so none of them can be skipped
+    gr_state_output.change(
+        fn=_ch_change,
+        inputs=[gr_state_output],
+        trigger_mode='multiple',
+    )
+
+    def _fn_page_change(page_id, pages, exhausted, request: gr.Request):
+        session = session_pool.get(request)
+        write_session = session.write_session
+        ids = pages[page_id]
+        for id_ in ids:
+            session.touch(id_)
+        annotations = {id_: write_session[id_] for id_ in ids}
+        if fn_annotate_assist:
+            assisted = {}
+            for id_ in ids:
+                if annotations[id_] is None:
+                    annotation = fn_annotate_assist(write_session.get_image_path(id_))
+                    if annotation is not None:
+                        assisted[id_] = annotation
+            if assisted:
+                write_session.update(assisted)
+                annotations.update(assisted)
+                gr.Info(f'{plural_word(len(assisted), "sample")} auto-annotated by assistant.')
+
+        items = [(id_, write_session.get_proxy_path(id_), annotations[id_]) for id_ in ids]
+        return items, \
+            gr.update(interactive=page_id > 0), \
+            gr.update(interactive=not exhausted or page_id < len(pages) - 1), \
+            f'<p>Page: <u>#{page_id}</u>, {plural_word(len(ids), "sample")}</p>'
+
+    gr_page_id.change(
+        fn=_fn_page_change,
+        inputs=[gr_page_id, gr_pages, gr_exhausted],
+        outputs=[gr_state_input, gr_prev, gr_next, gr_page_state],
+    )
@@ -1,9 +1,20 @@
 function addHotKeyListeners() {
+    // the annotation tab and grid tab share the same hotkeys, only the visible one is clicked
+    function clickVisible(selectors) {
+        for (const selector of selectors) {
+            const element = document.querySelector(selector);
+            if (element && element.offsetParent !== null) {
+                element.click();
+                return;
+            }
+        }
+    }
+
     document.addEventListener('keydown', function (event) {
         if (event.key === 'ArrowLeft') {  // left
-            document.querySelector('#left-button').click();
+            clickVisible(['#left-button', '#grid-left-button']);
         } else if (event.key === 'ArrowRight') { // right
-            document.querySelector('#right-button').click();
+            clickVisible(['#right-button', '#grid-right-button']);
         } else if (event.ctrlKey && event.key === 's') {  // ctrl+s
             event.preventDefault();
             document.querySelector('#save-button').click();
@@ -26,4 +37,64 @@ function addHotKeyListeners() {
     document.addEventListener('click', resetAutoSaveTimer, false);
 
     resetAutoSaveTimer();
+
+    // keep the preloaded images referenced, so they will not be collected before being cached
+    const preloadedImages = new Map();
+    const maxPreloadedImages = 32;
+
+    window.felinewhiskerPreload = function (text) {
+        let urls;
+        try {
+            urls = JSON.parse(text || '[]');
+        } catch (e) {
+            return;
+        }
+        urls.forEach(function (url) {
+            if (preloadedImages.has(url)) {
+                return;
+            }
+            const image = new Image();
+            image.decoding = 'async';
+            image.src = url;
+            preloadedImages.set(url, image);
+            if (preloadedImages.size > maxPreloadedImages) {
+                preloadedImages.delete(preloadedImages.keys().next().value);
+            }
+        });
+    };
+
+    // annotation changes are merged by sample id, and written in one batch when idle for a while
+    let pendingChanges = {};
+    let flushTimeout;
+    const flushDelay = 1500;
+
+    function flushChanges() {
+        clearTimeout(flushTimeout);
+        const element = document.querySelector('#flush-button');
+        if (element && Object.keys(pendingChanges).length > 0) {
+            element.click();
+        }
+    }
+
+    window.felinewhiskerBuffer = function (change) {
+        if (!change) {
+            return;
+        }
+        Object.assign(pendingChanges, change);
+        clearTimeout(flushTimeout);
+        flushTimeout = setTimeout(flushChanges, flushDelay);
+    };
+
+    window.felinewhiskerTakeChanges = function () {
+        clearTimeout(flushTimeout);
+        const changes = pendingChanges;
+        pendingChanges = {};
+        return changes;
+    };
+
+    document.addEventListener('visibilitychange', function () {
+        if (document.visibilityState === 'hidden') {
+            flushChanges();
+        }
+    });
 }
\ No newline at end of file
@@ -0,0 +1,127 @@
+import logging
+from threading import Lock
+from typing import Optional, Dict, Any, List
+
+import gradio as gr
+
+from .staging import SampleStager
+from .workqueue import WorkQueue
+from ..datasource import CodecProfile
+from ..repository import DatasetRepository, WriterSession, PackagePolicy
+
+
+class AnnotatorSession:
+    def __init__(self, write_session: WriterSession, stager: SampleStager, author: Optional[str] = None):
+        self.write_session = write_session
+        self.stager = stager
+        self.author = author
+
+    def next_sample(self) -> Optional[str]:
+        return self.stager.pop()
+
+    def touch(self, id_: str):
+        pass
+
+    def commit(self, mapping: Dict[str, Any]) -> Dict[str, Any]:
+        self.write_session.update(mapping)
+        return mapping
+
+
+class LeasedAnnotatorSession(AnnotatorSession):
+    def __init__(self, write_session: WriterSession, stager: SampleStager, author: str, work_queue: WorkQueue):
+        AnnotatorSession.__init__(self, write_session, stager, author)
+        self.work_queue = work_queue
+
+    def next_sample(self) -> Optional[str]:
+        while True:
+            sample_id = self.stager.pop()
+            if sample_id is None or self.work_queue.renew(self.author, sample_id):
+                return sample_id
+
+            # lease expired while staged, it may be already assigned to others
+            logging.info(f'Lease of staged sample {sample_id!r} lost by {self.author!r}, skipped.')
+            del self.write_session[sample_id]
+
+    def touch(self, id_: str):
+        self.work_queue.renew(self.author, id_)
+
+    def commit(self, mapping: Dict[str, Any]) -> Dict[str, Any]:
+        accepted, rejected = {}, []
+        for id_, annotation in mapping.items():
+            if annotation is None or self.work_queue.complete(self.author, id_):
+                accepted[id_] = annotation
+            else:
+                rejected.append(id_)
+        if rejected:
+            gr.Warning(f'Leases of samples {rejected!r} expired and reassigned, annotations ignored.')
+        self.write_session.update(accepted)
+        return accepted
+
+
+class SessionPool:
+    def get(self, request: Optional[gr.Request] = None) -> AnnotatorSession:
+        raise NotImplementedError  # pragma: no cover
+
+    def sessions(self) -> List[AnnotatorSession]:
+        raise NotImplementedError  # pragma: no cover
+
+    def close(self):
+        raise NotImplementedError  # pragma: no cover
+
+
+class SingleSessionPool(SessionPool):
+    def __init__(self, session: AnnotatorSession):
+        self._session = session
+        gr.set_static_paths(paths=[session.write_session.storage_dir])
+
+    def get(self, request: Optional[gr.Request] = None) -> AnnotatorSession:
+        return self._session
+
+    def sessions(self) -> List[AnnotatorSession]:
+        return [self._session]
+
+    def close(self):
+        self._session.stager.close()
+
+
+class MultiUserSessionPool(SessionPool):
+    def __init__(self, repo: DatasetRepository, work_queue: WorkQueue,
+                 package_policy: Optional[PackagePolicy] = None, staging_ahead: int = 3,
+                 proxy_size: Optional[int] = 1024):
+        self._repo = repo
+        self._work_queue = work_queue
+        self._package_policy = package_policy
+        self._staging_ahead = staging_ahead
+        self._proxy_size = proxy_size
+        self._sessions: Dict[str, LeasedAnnotatorSession] = {}
+        self._lock = Lock()
+
+    def get(self, request: Optional[gr.Request] = None) -> AnnotatorSession:
+        username = request.username if request is not None else None
+        if not username:
+            raise gr.Error('Login required for multi-annotator mode.')
+
+        with self._lock:
+            if username not in self._sessions:
+                write_session = self._repo.write(author=username, package_policy=self._package_policy,
+                                                 proxy_size=self._proxy_size)
+                gr.set_static_paths(paths=[write_session.storage_dir])
+                stager = SampleStager(self._work_queue.iter_for(username), write_session, ahead=self._staging_ahead,
+                                      codec=CodecProfile.from_meta(self._repo.meta_info))
+                self._sessions[username] = LeasedAnnotatorSession(write_session, stager, username, self._work_queue)
+                logging.info(f'Session {write_session.session_token!r} created for {username!r}.')
+            return self._sessions[username]
+
+    def sessions(self) -> List[AnnotatorSession]:
+        with self._lock:
+            return list(self._sessions.values())
+
+    def close(self):
+        self._work_queue.close()
+        with self._lock:
+            for session in self._sessions.values():
+                session.stager.close()
+                try:
+                    session.write_session.save()
+                finally:
+                    session.write_session.close()
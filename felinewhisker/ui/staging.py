@@ -0,0 +1,92 @@
+import logging
+from collections import deque
+from threading import Thread, Condition
+from typing import Iterable, Optional, List
+
+from ..datasource import ImageItem, CodecProfile
+from ..repository import WriterSession
+
+
+class SampleStager:
+    def __init__(self, datasource: Iterable[ImageItem], write_session: WriterSession, ahead: int = 3,
+                 codec: Optional[CodecProfile] = None):
+        self._iterator = iter(datasource)
+        self._write_session = write_session
+        self._codec = codec or CodecProfile()
+        self._ahead = max(ahead, 1)
+        self._staged = deque()
+        self._condition = Condition()
+        self._exhausted = False
+        self._closed = False
+        self._error: Optional[BaseException] = None
+        self._thread: Optional[Thread] = None
+
+    def _run(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._closed or len(self._staged) < self._ahead)
+                if self._closed:
+                    return
+
+            try:
+                item: ImageItem = next(self._iterator)
+                # the codec decides whether a file can be stored as it is
+                with item.make_file(codec=self._codec) as image_file:
+                    self._write_session.add(
+                        id_=item.id,
+                        image_file=image_file,
+                        annotation=item.annotation,
+                    )
+            except StopIteration:
+                with self._condition:
+                    self._exhausted = True
+                    self._condition.notify_all()
+                return
+            except BaseException as err:
+                logging.exception(f'Error occurred when staging samples - {err!r}')
+                with self._condition:
+                    self._error = err
+                    self._condition.notify_all()
+                return
+            else:
+                with self._condition:
+                    self._staged.append(item.id)
+                    self._condition.notify_all()
+
+    def _ensure_started(self):
+        with self._condition:
+            if self._thread is None:
+                self._thread = Thread(target=self._run, daemon=True)
+                self._thread.start()
+
+    def pop(self) -> Optional[str]:
+        self._ensure_started()
+        with self._condition:
+            self._condition.wait_for(lambda: self._staged or self._exhausted or self._error or self._closed)
+            if self._staged:
+                sample_id = self._staged.popleft()
+                self._condition.notify_all()
+                return sample_id
+            elif self._error is not None:
+                raise self._error
+            else:
+                return None
+
+    def peek(self) -> List[str]:
+        self._ensure_started()
+        with self._condition:
+            return list(self._staged)
+
+    def set_ahead(self, ahead: int):
+        with self._condition:
+            self._ahead = max(ahead, 1)
+            self._condition.notify_all()
+
+    def is_ready(self) -> bool:
+        with self._condition:
+            return bool(self._staged)
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
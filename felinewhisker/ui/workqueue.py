@@ -0,0 +1,175 @@
+import hashlib
+import logging
+import time
+from collections import deque, OrderedDict
+from dataclasses import dataclass, field
+from threading import Thread, Condition
+from typing import Iterable, Optional, Dict, Iterator, List, Set, Tuple
+
+from ..datasource import ImageItem
+
+
+@dataclass
+class Lease:
+    owner: str
+    item: ImageItem
+    expires_at: float
+
+
+@dataclass
+class _WorkEntry:
+    item: ImageItem
+    remaining: int
+    owners: Set[str] = field(default_factory=set)
+    completed: int = 0
+
+
+def is_qc_sample(id_: str, qc_fraction: float) -> bool:
+    # stable over restarts and processes, so the same samples are always routed for qc
+    return int(hashlib.sha1(id_.encode()).hexdigest()[:8], 16) / 0x100000000 < qc_fraction
+
+
+class WorkQueue:
+    def __init__(self, datasource: Iterable[ImageItem], lease_timeout: float = 600.0, prefetch: int = 16,
+                 qc_fraction: float = 0.0, qc_annotators: int = 2, completed_history: int = 65536):
+        if not 0.0 <= qc_fraction <= 1.0:
+            raise ValueError(f'QC fraction should be in [0, 1], but {qc_fraction!r} found.')
+        if qc_annotators < 1:
+            raise ValueError(f'QC annotators should be positive, but {qc_annotators!r} found.')
+        self._datasource = datasource
+        self._lease_timeout = lease_timeout
+        self._prefetch = max(prefetch, 1)
+        self._qc_fraction = qc_fraction
+        self._qc_annotators = qc_annotators
+        self._ready = deque()
+        self._leases: Dict[Tuple[str, str], Lease] = {}
+        # finished entries are evicted with their payloads, only the ids are kept for deduplication
+        self._completed: Dict[Tuple[str, str], None] = OrderedDict()
+        self._completed_history = max(completed_history, 1)
+        self._done_ids: Set[str] = set()
+        self._entries: Dict[str, _WorkEntry] = {}
+        self._condition = Condition()
+        self._exhausted = False
+        self._closed = False
+        self._thread: Optional[Thread] = None
+
+    def _pending_count(self) -> int:
+        # qc samples already taken by some annotators are waiting for the others, they are not prefetched ones
+        return sum(1 for entry in self._ready if not entry.owners)
+
+    def _produce(self):
+        # only one fetch pipeline for all the annotators
+        try:
+            for item in self._datasource:
+                with self._condition:
+                    self._condition.wait_for(lambda: self._closed or self._pending_count() < self._prefetch)
+                    if self._closed:
+                        return
+                    if item.id in self._entries or item.id in self._done_ids:
+                        continue
+                    remaining = self._qc_annotators if is_qc_sample(item.id, self._qc_fraction) else 1
+                    entry = _WorkEntry(item, remaining)
+                    self._entries[item.id] = entry
+                    self._ready.append(entry)
+                    self._condition.notify_all()
+        except Exception as err:
+            logging.exception(f'Error occurred when fetching samples for work queue - {err!r}')
+        finally:
+            with self._condition:
+                self._exhausted = True
+                self._condition.notify_all()
+
+    def _ensure_started(self):
+        with self._condition:
+            if self._thread is None:
+                self._thread = Thread(target=self._produce, daemon=True)
+                self._thread.start()
+
+    def _reclaim_expired(self):
+        now = time.time()
+        expired = [key for key, lease in self._leases.items() if lease.expires_at < now]
+        for id_, owner in expired:
+            del self._leases[(id_, owner)]
+            logging.info(f'Lease of sample {id_!r} by {owner!r} expired, it will be reassigned.')
+            entry = self._entries[id_]
+            entry.owners.discard(owner)
+            entry.remaining += 1
+            if entry.remaining == 1:
+                self._ready.appendleft(entry)
+
+    def _take(self, owner: str) -> Optional[_WorkEntry]:
+        for entry in self._ready:
+            if owner not in entry.owners:
+                entry.remaining -= 1
+                entry.owners.add(owner)
+                if entry.remaining <= 0:
+                    self._ready.remove(entry)
+                return entry
+        return None
+
+    def acquire(self, owner: str) -> Optional[ImageItem]:
+        self._ensure_started()
+        with self._condition:
+            while True:
+                self._reclaim_expired()
+                entry = self._take(owner)
+                if entry is not None:
+                    self._leases[(entry.item.id, owner)] = Lease(owner, entry.item, time.time() + self._lease_timeout)
+                    self._condition.notify_all()
+                    return entry.item
+                elif self._exhausted or self._closed:
+                    return None
+                else:
+                    self._condition.wait(timeout=1.0)
+
+    def is_leased_by(self, owner: str, id_: str) -> bool:
+        with self._condition:
+            return (id_, owner) in self._completed or (id_, owner) in self._leases
+
+    def renew(self, owner: str, id_: str) -> bool:
+        with self._condition:
+            if (id_, owner) in self._completed:
+                return True
+            lease = self._leases.get((id_, owner))
+            if lease is None:
+                return False
+            lease.expires_at = time.time() + self._lease_timeout
+            return True
+
+    def complete(self, owner: str, id_: str) -> bool:
+        with self._condition:
+            if (id_, owner) in self._completed:
+                return True
+            if (id_, owner) not in self._leases:
+                return False
+            del self._leases[(id_, owner)]
+            self._completed[(id_, owner)] = None
+            while len(self._completed) > self._completed_history:
+                self._completed.popitem(last=False)
+
+            entry = self._entries[id_]
+            entry.completed += 1
+            if entry.remaining <= 0 and entry.completed >= len(entry.owners):
+                del self._entries[id_]
+                self._done_ids.add(id_)
+            return True
+
+    def iter_for(self, owner: str) -> Iterator[ImageItem]:
+        while True:
+            item = self.acquire(owner)
+            if item is None:
+                break
+            yield item
+
+    def contains_id(self, id_: str) -> bool:
+        with self._condition:
+            return id_ in self._entries or id_ in self._done_ids
+
+    def contains_ids(self, ids: List[str]) -> List[bool]:
+        with self._condition:
+            return [id_ in self._entries or id_ in self._done_ids for id_ in ids]
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
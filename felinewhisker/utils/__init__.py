@@ -1,6 +1,15 @@
 from .align import padding_align
 from .dict import dict_merge
 from .directory import clear_directory
-from .emojis import emoji_image_file
-from .tui_prompts import hf_licence
-from .tui_validators import StringNonEmptyValidator, HuggingFaceRepoValidator, MultiStringEmptyValidator
+from .resize import load_image_fit, area_fit_size, box_fit_size
+from .lazy import lazy_attrs
+
+# terminal prompts and emoji rendering are only loaded on first use
+__getattr__, __dir__ = lazy_attrs(__name__, globals(), {
+    'emoji_image_file': '.emojis',
+    'prefetch_emojis': '.emojis',
+    'hf_licence': '.tui_prompts',
+    'StringNonEmptyValidator': '.tui_validators',
+    'HuggingFaceRepoValidator': '.tui_validators',
+    'MultiStringEmptyValidator': '.tui_validators',
+})
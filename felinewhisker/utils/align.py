@@ -1,14 +1,17 @@
-from typing import Tuple
+from typing import Tuple, TYPE_CHECKING
 
 from PIL import Image
-from imgutils.data import load_image, ImageTyping
 
+from .resize import load_image_fit, box_fit_size
 
-def padding_align(image: ImageTyping, size: Tuple[int, int], color: str = 'white') -> Image.Image:
+if TYPE_CHECKING:
+    from imgutils.data import ImageTyping
+
+
+def padding_align(image: 'ImageTyping', size: Tuple[int, int], color: str = 'white') -> Image.Image:
     width, height = size
-    image = load_image(image, force_background=None, mode='RGBA')
-    r = min(width / image.width, height / image.height)
-    resized = image.resize((int(image.width * r), int(image.height * r)))
+    resized = load_image_fit(image, lambda image_size: box_fit_size(image_size, size),
+                             mode='RGBA', force_background=None)
 
     new_image = Image.new('RGBA', (width, height), color)
     left, top = int((new_image.width - resized.width) // 2), int((new_image.height - resized.height) // 2)
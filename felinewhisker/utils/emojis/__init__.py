@@ -1 +1 @@
-from .dispatch import emoji_image_file
+from .dispatch import emoji_image_file, prefetch_emojis
@@ -1,33 +1,101 @@
 import logging
+import os
 import pathlib
 import re
-from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor, Future, TimeoutError, wait
+from threading import Lock
+from typing import Optional, Dict, Tuple, Iterable
 from urllib.parse import quote_plus
 
-from emoji import emojize
-from hfutils.utils import download_file
-from pilmoji.source import EmojiCDNSource
+from hbutils.system import TemporaryDirectory
 
 _EMOJIS_DIR = pathlib.Path(__file__).parent
+_BUNDLED_STYLE = 'twitter'
+_DOWNLOAD_TIMEOUT = 10.0
 
+_pool: Optional[ThreadPoolExecutor] = None
+_pending: Dict[Tuple[str, str], Future] = {}
+_lock = Lock()
 
-@lru_cache()
-def emoji_image_file(emoji: str, style: str = 'twitter') -> str:
-    short_tag = re.sub(r'[\W_]+', '_', emoji).strip('_').strip()
-    expected_file_path = _EMOJIS_DIR / f'{short_tag}.png'
 
-    if not expected_file_path.exists():
-        class _CustomSource(EmojiCDNSource):
-            STYLE = style
+def _cache_dir() -> pathlib.Path:
+    return pathlib.Path(
+        os.environ.get('FELINEWHISKER_EMOJI_CACHE') or
+        os.path.join(os.path.expanduser('~'), '.cache', 'felinewhisker', 'emojis')
+    )
 
-            def get_url(self, emoji: str, /) -> str:
-                return self.BASE_EMOJI_CDN_URL + quote_plus(emoji) + '?style=' + quote_plus(self.STYLE)
 
-        url = _CustomSource().get_url(emojize(emoji))
-        logging.info(f'Downloading {url!r} to {str(expected_file_path)!r} ...')
-        download_file(
-            url=url,
-            filename=str(expected_file_path),
-        )
+def _short_tag(emoji: str) -> str:
+    return re.sub(r'[\W_]+', '_', emoji).strip('_').strip()
 
-    return str(expected_file_path)
+
+def _local_emoji_file(emoji: str, style: str) -> Optional[str]:
+    short_tag = _short_tag(emoji)
+    # the bundled pack comes first, then the ones downloaded before
+    candidates = [_cache_dir() / style / f'{short_tag}.png']
+    if style == _BUNDLED_STYLE:
+        candidates.insert(0, _EMOJIS_DIR / f'{short_tag}.png')
+    for file in candidates:
+        if file.exists():
+            return str(file)
+    return None
+
+
+def _download_emoji(emoji: str, style: str) -> Optional[str]:
+    from emoji import emojize
+    from hfutils.utils import download_file
+    from pilmoji.source import EmojiCDNSource
+
+    class _CustomSource(EmojiCDNSource):
+        STYLE = style
+
+        def get_url(self, emoji: str, /) -> str:
+            return self.BASE_EMOJI_CDN_URL + quote_plus(emoji) + '?style=' + quote_plus(self.STYLE)
+
+    url = _CustomSource().get_url(emojize(emoji))
+    dst_file = _cache_dir() / style / f'{_short_tag(emoji)}.png'
+    logging.info(f'Downloading {url!r} to {str(dst_file)!r} ...')
+    try:
+        with TemporaryDirectory() as td:
+            # moved into cache only when completed, so a broken download is never used
+            tmp_file = os.path.join(td, dst_file.name)
+            download_file(url=url, filename=tmp_file, silent=True, timeout=_DOWNLOAD_TIMEOUT)
+            os.makedirs(dst_file.parent, exist_ok=True)
+            os.replace(tmp_file, dst_file)
+    except Exception as err:
+        logging.warning(f'Failed to download emoji {emoji!r} - {err!r}')
+        return None
+    return str(dst_file)
+
+
+def _submit(emoji: str, style: str) -> Future:
+    global _pool
+    with _lock:
+        key = (emoji, style)
+        future = _pending.get(key)
+        # failed ones are retried on the next request
+        if future is None or (future.done() and future.result() is None):
+            if _pool is None:
+                _pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix='emoji')
+            future = _pool.submit(_download_emoji, emoji, style)
+            _pending[key] = future
+        return future
+
+
+def prefetch_emojis(emojis: Iterable[str], style: str = _BUNDLED_STYLE, timeout: Optional[float] = 3.0):
+    futures = [_submit(emoji, style) for emoji in emojis if _local_emoji_file(emoji, style) is None]
+    if futures and timeout:
+        wait(futures, timeout=timeout)
+
+
+def emoji_image_file(emoji: str, style: str = _BUNDLED_STYLE, timeout: float = 3.0) -> Optional[str]:
+    local_file = _local_emoji_file(emoji, style)
+    if local_file is not None:
+        return local_file
+
+    try:
+        return _submit(emoji, style).result(timeout=timeout)
+    except TimeoutError:
+        # never block the ui construction, the icon will be available after the download completes
+        logging.warning(f'Emoji {emoji!r} is not ready, skipped.')
+        return None
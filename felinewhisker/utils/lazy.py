@@ -0,0 +1,18 @@
+import importlib
+from typing import Dict, Callable, Tuple, List, Any
+
+
+def lazy_attrs(module_name: str, module_globals: Dict[str, Any], attrs: Dict[str, str]) \
+        -> Tuple[Callable[[str], Any], Callable[[], List[str]]]:
+    def __getattr__(name: str):
+        if name in attrs:
+            value = getattr(importlib.import_module(attrs[name], module_name), name)
+            # cached in the module, so this hook is not called for it again
+            module_globals[name] = value
+            return value
+        raise AttributeError(f'module {module_name!r} has no attribute {name!r}')
+
+    def __dir__() -> List[str]:
+        return sorted({*module_globals, *attrs})
+
+    return __getattr__, __dir__
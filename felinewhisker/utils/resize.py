@@ -0,0 +1,74 @@
+import os
+from functools import lru_cache
+from typing import Tuple, Callable, Optional, TYPE_CHECKING
+
+import numpy as np
+from PIL import Image
+
+if TYPE_CHECKING:
+    # imgutils.data loads huggingface_hub, so it is only imported when images are loaded
+    from imgutils.data import ImageTyping
+
+_SizeTyping = Tuple[int, int]
+
+
+@lru_cache()
+def _get_cv2():
+    # opencv is optional, its resize is much faster on large downscales
+    try:
+        import cv2
+    except ImportError:
+        return None
+    else:
+        return cv2
+
+
+def area_fit_size(size: _SizeTyping, max_area: int) -> _SizeTyping:
+    width, height = size
+    r = ((width * height) / max_area) ** 0.5
+    if r <= 1.0:
+        return width, height
+    return max(int(round(width / r)), 1), max(int(round(height / r)), 1)
+
+
+def box_fit_size(size: _SizeTyping, box: _SizeTyping) -> _SizeTyping:
+    width, height = size
+    r = min(box[0] / width, box[1] / height)
+    return max(int(width * r), 1), max(int(height * r), 1)
+
+
+def resize(image: Image.Image, size: _SizeTyping, resample: int = Image.BICUBIC,
+           backend: Optional[str] = None) -> Image.Image:
+    if image.size == tuple(size):
+        return image
+
+    backend = backend or os.environ.get('FELINEWHISKER_RESIZE_BACKEND') or 'auto'
+    if backend not in {'auto', 'pil', 'cv2'}:
+        raise ValueError(f'Unknown resize backend {backend!r}.')
+    is_downscale = size[0] <= image.width and size[1] <= image.height
+    # alpha channel is not premultiplied by opencv, so only opaque images use it
+    if backend != 'pil' and is_downscale and image.mode in {'RGB', 'L'} and _get_cv2() is not None:
+        cv2 = _get_cv2()
+        return Image.fromarray(cv2.resize(np.asarray(image), tuple(size), interpolation=cv2.INTER_AREA))
+    elif backend == 'cv2':
+        raise RuntimeError(f'OpenCV backend is not available for {image.mode!r} image and size {size!r}.')
+    else:
+        # reduce() by integer factor first, the filter only runs on the last few times of scaling
+        return image.resize(tuple(size), resample=resample, reducing_gap=3.0)
+
+
+def load_image_fit(image: 'ImageTyping', fn_size: Callable[[_SizeTyping], _SizeTyping], mode: str = 'RGB',
+                   force_background: Optional[str] = 'white', backend: Optional[str] = None) -> Image.Image:
+    if isinstance(image, (str, os.PathLike)):
+        # opened here, so closed here once the pixels are loaded
+        with Image.open(image) as opened:
+            fitted = load_image_fit(opened, fn_size, mode, force_background, backend)
+            return fitted.copy() if fitted is opened else fitted
+
+    from imgutils.data import load_image
+    size = fn_size(image.size)
+    if size != image.size and getattr(image, 'tile', None):
+        # not decoded yet, jpeg can be decoded directly in a reduced scale, not smaller than the target size
+        image.draft('RGB' if mode == 'RGB' else None, size)
+    image = load_image(image, mode=mode, force_background=force_background)
+    return resize(image, size, backend=backend)
@@ -0,0 +1,131 @@
+import io
+import os
+import shutil
+import tarfile
+import time
+import tracemalloc
+from typing import Callable, List
+
+import numpy as np
+import pandas as pd
+import pytest
+from PIL import Image
+
+from felinewhisker.repository import LocalRepository
+from felinewhisker.repository.package import create_tar_indices
+
+BENCH_IMAGES = int(os.environ.get('FELINEWHISKER_BENCH_IMAGES', '16'))
+BENCH_PACKAGES = int(os.environ.get('FELINEWHISKER_BENCH_PACKAGES', '4'))
+BENCH_ROWS = int(os.environ.get('FELINEWHISKER_BENCH_ROWS', '1000'))
+BENCH_ROUNDS = int(os.environ.get('FELINEWHISKER_BENCH_ROUNDS', '3'))
+_ARCHIVE_MEMBERS = 256
+
+
+def write_package(repo: LocalRepository, image_files: List[str], prefix: str) -> str:
+    with repo.write(author='bench') as session:
+        for i, file in enumerate(image_files):
+            session.add(f'{prefix}_{i}', file, 'cat' if i % 2 == 0 else 'dog')
+    return session.session_token
+
+
+def copy_repo(template_dir: str, dst_dir: str) -> LocalRepository:
+    if os.path.exists(dst_dir):
+        shutil.rmtree(dst_dir)
+    shutil.copytree(template_dir, dst_dir)
+    return LocalRepository(dst_dir)
+
+
+def measure(benchmark, fn: Callable, setup: Callable[[], tuple], rounds: int = BENCH_ROUNDS):
+    benchmark.extra_info.update({
+        'images': BENCH_IMAGES,
+        'packages': BENCH_PACKAGES,
+        'rows': BENCH_ROWS,
+    })
+    result = benchmark.pedantic(lambda *args: fn(*args), setup=lambda: (setup(), {}), rounds=rounds)
+
+    # traced in a separate run, tracemalloc slows down the timed ones
+    args = setup()
+    tracemalloc.start()
+    try:
+        fn(*args)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    benchmark.extra_info['peak_memory'] = peak
+    return result
+
+
+@pytest.fixture(scope='session')
+def bench_dir(tmp_path_factory):
+    return str(tmp_path_factory.mktemp('bench'))
+
+
+@pytest.fixture(scope='session')
+def bench_images(bench_dir) -> List[str]:
+    images_dir = os.path.join(bench_dir, 'images')
+    os.makedirs(images_dir, exist_ok=True)
+    rnd = np.random.RandomState(0)
+    files = []
+    for i in range(BENCH_IMAGES):
+        file = os.path.join(images_dir, f'{i}.webp')
+        array = rnd.randint(0, 256, (48, 64, 3), dtype=np.uint8)
+        Image.fromarray(array).resize((512, 384), resample=Image.BILINEAR).save(file)
+        files.append(file)
+    return files
+
+
+@pytest.fixture(scope='session')
+def squashed_repo_dir(bench_dir, bench_images) -> str:
+    # squashed table of BENCH_ROWS rows, archives are packed directly, writing them with sessions is too slow
+    repo_dir = os.path.join(bench_dir, 'squashed')
+    LocalRepository.init(
+        task_type='classification',
+        local_dir=repo_dir,
+        task_name='Benchmark Task',
+        labels=['cat', 'dog'],
+    )
+
+    image_bytes = []
+    for file in bench_images:
+        with open(file, 'rb') as f:
+            image_bytes.append(f.read())
+    width, height = Image.open(bench_images[0]).size
+
+    records, archive_files = [], []
+    for start in range(0, BENCH_ROWS, _ARCHIVE_MEMBERS):
+        archive_file = f'images/base/base-{start // _ARCHIVE_MEMBERS}.tar'
+        os.makedirs(os.path.join(repo_dir, os.path.dirname(archive_file)), exist_ok=True)
+        with tarfile.open(os.path.join(repo_dir, archive_file), 'w') as tar:
+            for i in range(start, min(start + _ARCHIVE_MEMBERS, BENCH_ROWS)):
+                data = image_bytes[i % len(image_bytes)]
+                tarinfo = tarfile.TarInfo(f'row_{i}.webp')
+                tarinfo.size = len(data)
+                tar.addfile(tarinfo, io.BytesIO(data))
+                records.append({
+                    'id': f'row_{i}',
+                    'filename': f'row_{i}.webp',
+                    'width': width,
+                    'height': height,
+                    'annotation': 'cat' if i % 2 == 0 else 'dog',
+                    'updated_at': time.time() - BENCH_ROWS + i,
+                    'author': 'bench',
+                    'archive_file': archive_file,
+                })
+        archive_files.append(os.path.join(repo_dir, archive_file))
+    create_tar_indices(archive_files)
+    pd.DataFrame(records).to_parquet(os.path.join(repo_dir, 'data.parquet'), engine='pyarrow', index=False)
+    return repo_dir
+
+
+@pytest.fixture(scope='session')
+def pending_repo_dir(bench_dir, squashed_repo_dir, bench_images) -> str:
+    # squashed table with BENCH_PACKAGES unarchived packages waiting, half of the samples overwrite existing rows
+    repo = copy_repo(squashed_repo_dir, os.path.join(bench_dir, 'pending'))
+    for i in range(BENCH_PACKAGES):
+        write_package(repo, bench_images, prefix='row' if i % 2 == 0 else f'pkg{i}')
+    return repo._repo_dir
+
+
+@pytest.fixture()
+def round_dir(tmp_path) -> str:
+    return str(tmp_path / 'round')
@@ -0,0 +1,69 @@
+import pandas as pd
+import pytest
+
+from .conftest import BENCH_PACKAGES, BENCH_ROWS, BENCH_IMAGES, copy_repo, measure, write_package
+
+
+@pytest.mark.benchmark
+class TestRepositoryBenchmark:
+    def test_write(self, benchmark, squashed_repo_dir, bench_images, round_dir):
+        def _setup():
+            return copy_repo(squashed_repo_dir, round_dir),
+
+        measure(benchmark, lambda repo: write_package(repo, bench_images, prefix='new'), _setup)
+
+    def test_session_save(self, benchmark, squashed_repo_dir, bench_images, round_dir):
+        def _setup():
+            repo = copy_repo(squashed_repo_dir, round_dir)
+            session = repo.write(author='bench')
+            for i, file in enumerate(bench_images):
+                session.add(f'new_{i}', file, 'cat')
+            return session,
+
+        def _save(session):
+            session.save()
+            session.close()
+
+        measure(benchmark, _save, _setup)
+
+    def test_squash(self, benchmark, pending_repo_dir, round_dir):
+        def _setup():
+            return copy_repo(pending_repo_dir, round_dir),
+
+        def _squash(repo):
+            repo.squash()
+            return repo
+
+        repo = measure(benchmark, _squash, _setup)
+        assert repo.list_unarchived_packages() == []
+
+    def test_squash_batch(self, benchmark, pending_repo_dir, round_dir):
+        def _setup():
+            return copy_repo(pending_repo_dir, round_dir),
+
+        def _squash(repo):
+            repo.squash(max_packages=1, readme=False)
+            return repo
+
+        repo = measure(benchmark, _squash, _setup)
+        assert len(repo.list_unarchived_packages()) == BENCH_PACKAGES - 1
+
+    def test_read_table(self, benchmark, squashed_repo_dir):
+        repo = copy_repo(squashed_repo_dir, squashed_repo_dir + '_read')
+        df = measure(benchmark, lambda: repo.read_table(), lambda: ())
+        assert isinstance(df, pd.DataFrame)
+        assert len(df) == BENCH_ROWS
+
+    def test_read_unarchived_tables(self, benchmark, pending_repo_dir):
+        repo = copy_repo(pending_repo_dir, pending_repo_dir + '_read')
+        tables = measure(benchmark, lambda: repo.read_unarchived_tables(), lambda: ())
+        assert len(tables) == BENCH_PACKAGES
+        assert all(len(df) == BENCH_IMAGES for _, df in tables)
+
+    def test_iter_samples(self, benchmark, squashed_repo_dir):
+        repo = copy_repo(squashed_repo_dir, squashed_repo_dir + '_iter')
+
+        def _iter():
+            return sum(len(batch) for batch in repo.iter_samples(columns=['id'], batch_size=64, workers=4))
+
+        assert measure(benchmark, _iter, lambda: ()) == BENCH_ROWS
@@ -0,0 +1,45 @@
+import random
+import time
+
+import pytest
+from cheesechaser.datapool import ResourceNotFoundError
+from cheesechaser.pipe import Pipe
+
+from felinewhisker.datasource import CheeseChaserDataSource
+
+
+class _SleepyPipe(Pipe):
+    def retrieve(self, resource_id, resource_metainfo, silent: bool = False):
+        time.sleep(random.random() * 0.02)
+        if resource_id % 7 == 6:
+            raise ResourceNotFoundError(f'Resource {resource_id!r} not found.')
+        return f'data_{resource_id}'
+
+
+@pytest.mark.unittest
+class TestDatasourceCheeseChaser:
+    @pytest.mark.parametrize(['pipes'], [(1,), (3,)])
+    def test_iter_ordered(self, pipes):
+        source = CheeseChaserDataSource(
+            _SleepyPipe(None), range(50), source_id='sleepy',
+            pipes=pipes, max_workers=4, reorder_buffer=100,
+        )
+        items = list(source)
+        assert [item.id for item in items] == [f'cheesechaser__sleepy__{i}' for i in range(50) if i % 7 != 6]
+        assert [item.image for item in items] == [f'data_{i}' for i in range(50) if i % 7 != 6]
+        assert sum(stats.retrieved for stats in source.stats) == 43
+        assert sum(stats.failed for stats in source.stats) == 7
+
+    def test_iter_unordered(self):
+        source = CheeseChaserDataSource(_SleepyPipe(None), range(30), pipes=2, max_workers=4)
+        source.set_fn_contains_id(fn_contains_ids=lambda ids: [id_.endswith('__0') for id_ in ids])
+        assert sorted(item.id for item in source) == \
+               sorted(f'cheesechaser__{i}' for i in range(1, 30) if i % 7 != 6)
+
+    def test_iter_early_stop(self):
+        source = CheeseChaserDataSource(_SleepyPipe(None), range(10000), pipes=2, max_workers=4)
+        with source:
+            for i, _ in enumerate(source):
+                if i >= 5:
+                    break
+        assert sum(stats.retrieved for stats in source.stats) < 10000
@@ -0,0 +1,117 @@
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from felinewhisker.datasource import CodecProfile, ImageItem
+from felinewhisker.repository import LocalRepository
+
+
+@pytest.fixture
+def temp_dir():
+    dir = tempfile.mkdtemp()
+    yield dir
+    shutil.rmtree(dir)
+
+
+def _make_image(temp_dir, name, size=(64, 48), mode='RGB', **kwargs):
+    file = os.path.join(temp_dir, name)
+    Image.new(mode, size, 'red').save(file, **kwargs)
+    return file
+
+
+@pytest.mark.unittest
+class TestDatasourceCodec:
+    def test_passthrough(self, temp_dir):
+        file = _make_image(temp_dir, 'a.webp')
+        with ImageItem('a', file, None).make_file(codec=CodecProfile()) as image_file:
+            assert image_file == os.path.abspath(file)
+
+    def test_accept(self, temp_dir):
+        file = _make_image(temp_dir, 'a.jpg')
+        with ImageItem('a', file, None).make_file(codec=CodecProfile()) as image_file:
+            assert image_file.endswith('a.webp')
+            assert Image.open(image_file).format == 'WEBP'
+        codec = CodecProfile(accept=['jpeg'])
+        with ImageItem('a', file, None).make_file(codec=codec) as image_file:
+            assert image_file == os.path.abspath(file)
+
+    @pytest.mark.parametrize('name, kwargs, size', [
+        ('large.webp', dict(size=(3000, 2000)), (1254, 836)),
+        ('rgba.png', dict(mode='RGBA'), (64, 48)),
+        ('wrong_ext.png', dict(format='WEBP'), (64, 48)),
+    ])
+    def test_not_compliant(self, temp_dir, name, kwargs, size):
+        file = _make_image(temp_dir, name, **kwargs)
+        codec = CodecProfile(max_size=1024, accept=['png'])
+        assert not codec.is_compliant(file)
+        with ImageItem('a', file, None).make_file(codec=codec) as image_file:
+            image = Image.open(image_file)
+            assert image.format == 'WEBP'
+            assert image.mode == 'RGB'
+            assert image.size == size
+
+    def test_no_passthrough(self, temp_dir):
+        file = _make_image(temp_dir, 'a.webp')
+        with ImageItem('a', file, None).make_file(
+                codec=CodecProfile(passthrough=False)) as image_file:
+            assert image_file != os.path.abspath(file)
+
+    def test_force_reencode(self, temp_dir):
+        file = _make_image(temp_dir, 'a.webp')
+        assert CodecProfile().is_compliant(file)
+        with ImageItem('a', file, None).make_file(force_reencode=True, codec=CodecProfile()) as image_file:
+            assert image_file != os.path.abspath(file)
+            assert Image.open(image_file).format == 'WEBP'
+        with ImageItem('a', file, None).make_file(force_reencode=True) as image_file:
+            assert image_file != os.path.abspath(file)
+        with ImageItem('a', file, None).make_file() as image_file:
+            assert image_file == os.path.abspath(file)
+
+    def test_formats(self, temp_dir):
+        image = Image.fromarray(np.random.RandomState(0).randint(0, 256, (32, 32, 3), dtype=np.uint8))
+        with ImageItem('a', image, None).make_file(codec=CodecProfile(format='webp', lossless=True)) as file:
+            assert (np.asarray(Image.open(file).convert('RGB')) == np.asarray(image)).all()
+        with ImageItem('a', image, None).make_file(codec=CodecProfile(format='jpeg', quality=80)) as file:
+            assert file.endswith('a.jpg')
+            assert Image.open(file).format == 'JPEG'
+
+    @pytest.mark.parametrize('format, ext, pil_format', [
+        ('jpg', 'jpg', 'JPEG'),
+        ('JPEG', 'jpg', 'JPEG'),
+        ('bmp', 'bmp', 'BMP'),
+        ('gif', 'gif', 'GIF'),
+    ])
+    def test_make_file_format(self, format, ext, pil_format):
+        image = Image.new('RGB', (32, 32), 'red')
+        with ImageItem('a', image, None).make_file(format=format) as file:
+            assert file.endswith(f'a.{ext}')
+            assert Image.open(file).format == pil_format
+        assert CodecProfile(format='jpg', accept=['JPG']) == CodecProfile(format='jpeg', accept=['jpeg'])
+
+    def test_invalid(self):
+        with pytest.raises(ValueError):
+            CodecProfile(format='bmp')
+        with pytest.raises(ValueError):
+            CodecProfile(accept=['gif'])
+        with pytest.raises(ValueError):
+            CodecProfile(quality=101)
+        with pytest.raises(ValueError):
+            CodecProfile(max_size=0)
+
+    def test_meta(self, temp_dir):
+        assert CodecProfile.from_meta({}) == CodecProfile()
+        repo = LocalRepository.init(
+            task_type='classification',
+            local_dir=temp_dir,
+            task_name='Test Task',
+            labels=['cat', 'dog'],
+            codec={'format': 'jpeg', 'quality': 90, 'accept': ['webp']},
+        )
+        with open(os.path.join(temp_dir, 'meta.json')) as f:
+            assert json.load(f)['codec']['format'] == 'jpeg'
+        assert CodecProfile.from_meta(repo.meta_info) == CodecProfile(format='jpeg', quality=90, accept=['webp'])
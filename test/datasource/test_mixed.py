@@ -0,0 +1,53 @@
+import time
+
+import pytest
+
+from felinewhisker.datasource import BaseDataSource, MixedDataSource
+
+
+class _NamedDataSource(BaseDataSource):
+    def __init__(self, name, count, delay=0.0):
+        BaseDataSource.__init__(self)
+        self._name = name
+        self._count = count
+        self._delay = delay
+
+    def _iter(self):
+        for i in range(self._count):
+            if self._delay:
+                time.sleep(self._delay)
+            yield f'{self._name}_{i}', f'{self._name}_{i}.png', None
+
+
+@pytest.mark.unittest
+class TestDatasourceMixed:
+    def test_mix_all(self):
+        source = MixedDataSource([_NamedDataSource('a', 20), _NamedDataSource('b', 10)], weights=[2, 1])
+        with source:
+            ids = [item.id for item in source]
+        assert sorted(ids) == sorted([*(f'a_{i}' for i in range(20)), *(f'b_{i}' for i in range(10))])
+        assert [id_ for id_ in ids if id_.startswith('a_')] == [f'a_{i}' for i in range(20)]
+        assert [stats.emitted for stats in source.stats] == [20, 10]
+        assert [stats.pulled for stats in source.stats] == [20, 10]
+
+    def test_mix_slow_source(self):
+        source = MixedDataSource([_NamedDataSource('slow', 5, delay=0.5), _NamedDataSource('fast', 50)])
+        ids = []
+        for item in source:
+            ids.append(item.id)
+            if len(ids) >= 20:
+                break
+        assert len([id_ for id_ in ids if id_.startswith('fast_')]) >= 15
+
+    def test_mix_contains_id(self):
+        source = MixedDataSource([_NamedDataSource('a', 3), _NamedDataSource('b', 3)])
+        source.set_fn_contains_id(lambda id_: id_.endswith('_1'))
+        assert sorted(item.id for item in source) == ['a_0', 'a_2', 'b_0', 'b_2']
+
+    def test_mix_invalid(self):
+        with pytest.raises(ValueError):
+            MixedDataSource([])
+        with pytest.raises(ValueError):
+            MixedDataSource([_NamedDataSource('a', 3)], weights=[1, 2])
+        with pytest.raises(ValueError):
+            MixedDataSource([_NamedDataSource('a', 3)], weights=[0])
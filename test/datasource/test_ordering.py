@@ -0,0 +1,49 @@
+import pytest
+from PIL import Image
+
+from felinewhisker.datasource import BaseDataSource, OrderedDataSource
+
+
+class _ValueDataSource(BaseDataSource):
+    def __init__(self, values):
+        BaseDataSource.__init__(self)
+        self._values = values
+
+    def _iter(self):
+        for i, value in enumerate(self._values):
+            yield f'sample_{i}', Image.new('RGB', (1, 1)), value
+
+
+def _fn_score(items):
+    return [item.annotation for item in items]
+
+
+@pytest.mark.unittest
+class TestDatasourceOrdering:
+    def test_order_whole_buffer(self):
+        values = [3, 1, 4, 1, 5, 9, 2, 6]
+        source = OrderedDataSource(_ValueDataSource(values), _fn_score, buffer_size=8, batch_size=4)
+        with source:
+            assert [item.annotation for item in source] == sorted(values, reverse=True)
+        assert source.stats.pulled == 8
+        assert source.stats.scored == 8
+        assert source.stats.emitted == 8
+        assert source.stats.batches == 2
+
+    def test_order_window(self):
+        values = [1, 2, 3, 4, 5, 6]
+        source = OrderedDataSource(_ValueDataSource(values), _fn_score, buffer_size=2, batch_size=1)
+        assert [item.annotation for item in source] == [2, 3, 4, 5, 6, 1]
+
+    def test_order_contains_id(self):
+        values = [1, 2, 3, 4]
+        source = OrderedDataSource(_ValueDataSource(values), _fn_score, buffer_size=4, batch_size=2)
+        source.set_fn_contains_id(lambda id_: id_ == 'sample_3')
+        assert [item.id for item in source] == ['sample_2', 'sample_1', 'sample_0']
+
+    def test_order_invalid(self):
+        with pytest.raises(ValueError):
+            OrderedDataSource(_ValueDataSource([]), _fn_score, buffer_size=2, batch_size=4)
+        source = OrderedDataSource(_ValueDataSource([1, 2]), lambda items: [1.0], buffer_size=2, batch_size=2)
+        with pytest.raises(ValueError):
+            list(source)
@@ -0,0 +1,354 @@
+import glob
+import hashlib
+import os
+import shutil
+import tempfile
+from collections import Counter
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+from PIL import Image
+from hfutils.index import tar_file_download
+from hfutils.utils import parse_hf_fs_path, hf_normpath
+from huggingface_hub import CommitOperationAdd, CommitOperationDelete
+from huggingface_hub.errors import HfHubHTTPError
+from huggingface_hub.hf_api import RepoFile, RepoFolder
+
+from felinewhisker.repository import LocalRepository, HfOnlineRepository, SquashConflictError
+
+
+class _FakeHub:
+    def __init__(self, repo_dir: str):
+        self.repo_dir = repo_dir
+        self.version = 0
+        self.calls = Counter()
+        self.before_commit = None
+        self.preupload_failures = 0
+        self.preuploaded = []
+        self.downloads = []
+
+    @property
+    def sha(self) -> str:
+        return f'{self.version:040x}'
+
+    def commit(self):
+        self.version += 1
+
+    def _file(self, revision: str, filename: str) -> str:
+        assert revision in (self.sha, 'main')
+        return os.path.join(self.repo_dir, filename)
+
+    # client api
+    def repo_info(self, repo_id, repo_type, revision):
+        self.calls['repo_info'] += 1
+        return SimpleNamespace(sha=self.sha)
+
+    def list_repo_tree(self, repo_id, repo_type, revision, recursive=False):
+        self.calls['list_repo_tree'] += 1
+        assert recursive
+        for root, dirs, files in os.walk(self._file(revision, '.')):
+            for name in dirs:
+                path = hf_normpath(os.path.relpath(os.path.join(root, name), self.repo_dir))
+                yield RepoFolder(path=path, oid='0' * 40)
+            for name in files:
+                path = hf_normpath(os.path.relpath(os.path.join(root, name), self.repo_dir))
+                with open(os.path.join(root, name), 'rb') as f:
+                    oid = hashlib.sha1(f.read()).hexdigest()
+                yield RepoFile(path=path, size=os.path.getsize(os.path.join(root, name)), oid=oid)
+
+    def hf_hub_download(self, repo_id, repo_type, revision, filename):
+        self.calls['hf_hub_download'] += 1
+        self.downloads.append((filename, revision))
+        return self._file(revision, filename)
+
+    def preupload_lfs_files(self, repo_id, repo_type, revision, additions):
+        self.calls['preupload_lfs_files'] += 1
+        if self.preupload_failures > 0:
+            self.preupload_failures -= 1
+            response = SimpleNamespace(status_code=500, headers={}, request=None)
+            raise HfHubHTTPError('500 Internal Server Error', response=response)
+        self.preuploaded.append([addition.path_in_repo for addition in additions])
+
+    def create_commit(self, repo_id, repo_type, revision, operations, commit_message, parent_commit=None):
+        self.calls['create_commit'] += 1
+        if self.before_commit is not None:
+            self.before_commit()
+        if parent_commit is not None and parent_commit != self.sha:
+            response = SimpleNamespace(status_code=412, headers={}, request=None)
+            raise HfHubHTTPError('412 Precondition Failed: a commit has happened since', response=response)
+        for operation in operations:
+            dst_file = self._file(revision, operation.path_in_repo)
+            if isinstance(operation, CommitOperationAdd):
+                os.makedirs(os.path.dirname(dst_file), exist_ok=True)
+                shutil.copyfile(operation.path_or_fileobj, dst_file)
+            elif isinstance(operation, CommitOperationDelete):
+                os.remove(dst_file)
+        self.commit()
+
+    def hf_tar_file_download(self, repo_id, repo_type, revision, archive_in_repo, file_in_archive, local_file):
+        self.calls['hf_tar_file_download'] += 1
+        self.downloads.append((archive_in_repo, revision))
+        tar_file_download(self._file(revision, archive_in_repo), file_in_archive, local_file)
+
+    # file system api
+    def exists(self, path):
+        self.calls['exists'] += 1
+        p = parse_hf_fs_path(path)
+        return os.path.exists(self._file(p.revision, p.filename))
+
+    def read_text(self, path):
+        self.calls['read_text'] += 1
+        p = parse_hf_fs_path(path)
+        with open(self._file(p.revision, p.filename), 'r') as f:
+            return f.read()
+
+    def glob(self, path):
+        self.calls['glob'] += 1
+        p = parse_hf_fs_path(path)
+        return [
+            f'datasets/{p.repo_id}@{p.revision}/{hf_normpath(os.path.relpath(file, self.repo_dir))}'
+            for file in glob.glob(self._file(p.revision, p.filename), recursive=True)
+        ]
+
+
+@pytest.fixture
+def temp_dir():
+    dir = tempfile.mkdtemp()
+    yield dir
+    shutil.rmtree(dir)
+
+
+@pytest.fixture
+def local_repo(temp_dir):
+    return LocalRepository.init(
+        task_type='classification',
+        local_dir=os.path.join(temp_dir, 'repo'),
+        task_name='Test Task',
+        labels=['cat', 'dog'],
+    )
+
+
+@pytest.fixture
+def fake_hub(local_repo):
+    hub = _FakeHub(local_repo._repo_dir)
+    with patch('felinewhisker.repository.huggingface.get_hf_client', lambda *args, **kwargs: hub), \
+            patch('felinewhisker.repository.huggingface.get_hf_fs', lambda *args, **kwargs: hub), \
+            patch('felinewhisker.repository.huggingface.hf_tar_file_download', hub.hf_tar_file_download):
+        yield hub
+
+
+@pytest.fixture
+def image_files(temp_dir):
+    images_dir = os.path.join(temp_dir, 'images')
+    os.makedirs(images_dir, exist_ok=True)
+    files = []
+    for i in range(6):
+        file = os.path.join(images_dir, f'{i}.png')
+        Image.new('RGB', (64 + i, 48), color=(i * 20, 0, 0)).save(file)
+        files.append(file)
+    return files
+
+
+def _write_package(repo, image_files, author, prefix):
+    # packages are written to the directory served by the fake hub
+    with repo.write(author=author) as session:
+        for i, file in enumerate(image_files):
+            session.add(f'{prefix}_{i}', file, 'cat' if i % 2 == 0 else 'dog')
+
+
+@pytest.mark.unittest
+class TestRepositoryHuggingface:
+    def test_sync_unchanged(self, fake_hub):
+        repo = HfOnlineRepository('owner/dataset')
+        assert repo.meta_info['labels'] == ['cat', 'dog']
+
+        fake_hub.calls.clear()
+        repo.sync()
+        repo.sync()
+        assert fake_hub.calls == Counter()
+
+        repo._SHA_TTL = 0.0
+        repo.sync()
+        assert fake_hub.calls == Counter({'repo_info': 1})
+
+    def test_sync_changed(self, fake_hub):
+        repo = HfOnlineRepository('owner/dataset')
+        repo._SHA_TTL = 0.0
+        fake_hub.commit()
+        fake_hub.calls.clear()
+        repo.sync()
+        assert fake_hub.calls == Counter({'repo_info': 1, 'list_repo_tree': 1, 'hf_hub_download': 1})
+        assert repo.meta_info['labels'] == ['cat', 'dog']
+
+    def test_squash(self, fake_hub, local_repo, image_files):
+        repo = HfOnlineRepository('owner/dataset')
+        _write_package(local_repo, image_files, 'alice', 'a')
+        _write_package(local_repo, image_files[:3], 'bob', 'a')
+        fake_hub.commit()
+        repo._invalidate_sha()
+
+        fake_hub.calls.clear()
+        repo.squash()
+        assert fake_hub.calls == Counter({
+            'repo_info': 2,
+            'list_repo_tree': 2,
+            'hf_hub_download': 5,
+            'hf_tar_file_download': 6,
+            'preupload_lfs_files': 1,
+            'create_commit': 1,
+        })
+        assert len(repo.read_table()) == 6
+        assert len(repo.get_history('a_0')) == 1
+        assert repo.read_unarchived_tables() == []
+
+    def test_squash_compact(self, fake_hub, local_repo, image_files):
+        repo = HfOnlineRepository('owner/dataset')
+        _write_package(local_repo, image_files, 'alice', 'a')
+        fake_hub.commit()
+        repo._invalidate_sha()
+        repo.squash()
+        _write_package(local_repo, image_files[:5], 'bob', 'a')
+        fake_hub.commit()
+        repo._invalidate_sha()
+
+        fake_hub.downloads.clear()
+        repo.squash(compact=True)
+        df = repo.read_table()
+        assert len(df) == 6
+        assert set(df['archive_file']) == set(repo._list_archive_members())
+        assert repo.get_history('a_0')['archive_file'].isna().all()
+        # archives are read from the commit the squash is based on, not from the branch
+        assert any(filename.endswith('.tar') for filename, _ in fake_hub.downloads)
+        assert all(revision != 'main' for _, revision in fake_hub.downloads)
+
+    def test_iter_samples_pinned(self, fake_hub, local_repo, image_files):
+        repo = HfOnlineRepository('owner/dataset')
+        _write_package(local_repo, image_files, 'alice', 'a')
+        fake_hub.commit()
+        repo._invalidate_sha()
+        repo.squash()
+
+        fake_hub.downloads.clear()
+        samples = [row['id'] for batch in repo.iter_samples(batch_size=4) for row, _ in batch]
+        assert sorted(samples) == [f'a_{i}' for i in range(6)]
+        # the table and the archives are read from the same commit
+        assert {revision for _, revision in fake_hub.downloads} == {fake_hub.sha}
+
+    def test_squash_compact_max_packages(self, fake_hub, local_repo, image_files):
+        repo = HfOnlineRepository('owner/dataset')
+        _write_package(local_repo, image_files[:2], 'alice', 'a')
+        _write_package(local_repo, image_files[2:4], 'alice', 'b')
+        _write_package(local_repo, image_files[4:], 'alice', 'c')
+        fake_hub.commit()
+        repo._invalidate_sha()
+
+        # archives of the pending packages are not dead, they are just not merged yet
+        repo.squash(compact=True, max_packages=1)
+        assert sorted(repo.read_table()['id']) == ['a_0', 'a_1']
+        assert len(repo._list_archive_members()) == 3
+        repo.squash(compact=True)
+        df = repo.read_table()
+        assert len(df) == 6
+        assert set(df['archive_file']) == set(repo._list_archive_members())
+
+    def test_squash_conflict_new_package(self, fake_hub, local_repo, image_files):
+        repo = HfOnlineRepository('owner/dataset')
+        _write_package(local_repo, image_files[:4], 'alice', 'a')
+        fake_hub.commit()
+        repo._invalidate_sha()
+
+        def _push_package():
+            fake_hub.before_commit = None
+            _write_package(local_repo, image_files, 'bob', 'a')
+            fake_hub.commit()
+
+        fake_hub.before_commit = _push_package
+        fake_hub.calls.clear()
+        repo.squash()
+        assert fake_hub.calls['create_commit'] == 2
+        # meta.json, the first package, the package pushed meanwhile and the tables after squash
+        assert fake_hub.calls['hf_hub_download'] == 5
+        df = repo.read_table()
+        assert sorted(df['id']) == [f'a_{i}' for i in range(6)]
+        assert set(df['author']) == {'bob'}
+        assert len(repo.get_history('a_3')) == 1
+        assert repo.read_unarchived_tables() == []
+
+    def test_squash_history_merged(self, fake_hub, local_repo, image_files):
+        repo = HfOnlineRepository('owner/dataset')
+        _write_package(local_repo, image_files[:1], 'alice', 'a')
+        fake_hub.commit()
+        repo._invalidate_sha()
+        repo.squash()
+        for author in ['bob', 'carol']:
+            _write_package(local_repo, image_files[:1], author, 'a')
+            fake_hub.commit()
+            repo._invalidate_sha()
+            repo.squash()
+
+        # one file for the bucket, not one for each squash
+        history_files = glob.glob(os.path.join(local_repo._repo_dir, 'history', '*', '*.parquet'))
+        assert [os.path.basename(file) for file in history_files] == ['history.parquet']
+        assert repo.get_history('a_0')['author'].tolist() == ['alice', 'bob']
+
+    def test_squash_conflict_squashed_by_others(self, fake_hub, local_repo, image_files):
+        repo = HfOnlineRepository('owner/dataset')
+        _write_package(local_repo, image_files[:4], 'alice', 'a')
+        fake_hub.commit()
+        repo._invalidate_sha()
+
+        def _squash_by_others():
+            fake_hub.before_commit = None
+            _write_package(local_repo, image_files[4:], 'bob', 'b')
+            local_repo.squash()
+            fake_hub.commit()
+
+        fake_hub.before_commit = _squash_by_others
+        repo.squash()
+        assert fake_hub.calls['create_commit'] == 2
+        assert sorted(repo.read_table()['id']) == [*(f'a_{i}' for i in range(4)), 'b_0', 'b_1']
+        assert repo.read_unarchived_tables() == []
+
+    def test_squash_conflict_gave_up(self, fake_hub, local_repo, image_files):
+        repo = HfOnlineRepository('owner/dataset')
+        _write_package(local_repo, image_files, 'alice', 'a')
+        fake_hub.commit()
+        repo._invalidate_sha()
+
+        fake_hub.before_commit = fake_hub.commit
+        with pytest.raises(SquashConflictError):
+            repo.squash()
+        assert fake_hub.calls['create_commit'] == HfOnlineRepository._SQUASH_RETRIES
+
+    def test_squash_upload_batches(self, fake_hub, local_repo, image_files):
+        repo = HfOnlineRepository('owner/dataset')
+        repo._UPLOAD_BATCH_FILES = 2
+        repo._UPLOAD_RETRIES = 2
+        _write_package(local_repo, image_files, 'alice', 'a')
+        fake_hub.commit()
+        repo._invalidate_sha()
+
+        fake_hub.preupload_failures = 1
+        with patch('felinewhisker.repository.huggingface.time.sleep'):
+            repo.squash()
+        assert all(len(batch) <= 2 for batch in fake_hub.preuploaded)
+        uploaded = [path for batch in fake_hub.preuploaded for path in batch]
+        assert 'data.parquet' in uploaded
+        assert len(uploaded) == len(set(uploaded))
+        assert fake_hub.calls['preupload_lfs_files'] == len(fake_hub.preuploaded) + 1
+        assert fake_hub.calls['create_commit'] == 1
+        assert len(repo.read_table()) == 6
+
+    def test_squash_upload_gave_up(self, fake_hub, local_repo, image_files):
+        repo = HfOnlineRepository('owner/dataset')
+        repo._UPLOAD_RETRIES = 2
+        _write_package(local_repo, image_files, 'alice', 'a')
+        fake_hub.commit()
+        repo._invalidate_sha()
+
+        fake_hub.preupload_failures = 2
+        with patch('felinewhisker.repository.huggingface.time.sleep'), pytest.raises(HfHubHTTPError):
+            repo.squash()
+        assert fake_hub.calls['create_commit'] == 0
+        assert len(repo.read_unarchived_tables()) == 1
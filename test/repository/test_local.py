@@ -0,0 +1,402 @@
+import glob
+import io
+import json
+import os
+import shutil
+import tarfile
+import tempfile
+import threading
+from urllib.parse import unquote
+
+import pandas as pd
+import pytest
+from PIL import Image
+
+from felinewhisker.repository import LocalRepository, PackagePolicy, NavigationLog, watch_squash
+from felinewhisker.repository.history import history_bucket, history_bucket_dir
+
+
+@pytest.fixture
+def temp_dir():
+    dir = tempfile.mkdtemp()
+    yield dir
+    shutil.rmtree(dir)
+
+
+@pytest.fixture
+def repo(temp_dir):
+    return LocalRepository.init(
+        task_type='classification',
+        local_dir=os.path.join(temp_dir, 'repo'),
+        task_name='Test Task',
+        labels=['cat', 'dog'],
+    )
+
+
+@pytest.fixture
+def image_files(temp_dir):
+    images_dir = os.path.join(temp_dir, 'images')
+    os.makedirs(images_dir, exist_ok=True)
+    files = []
+    for i in range(10):
+        file = os.path.join(images_dir, f'{i}.png')
+        Image.new('RGB', (64 + i, 48), color=(i * 20, 0, 0)).save(file)
+        files.append(file)
+    return files
+
+
+def _write_samples(repo, image_files, package_policy=None, prefix='sample'):
+    with repo.write(author='tester', package_policy=package_policy) as session:
+        for i, file in enumerate(image_files):
+            session.add(f'{prefix}_{i}', file, 'cat' if i % 2 == 0 else 'dog')
+    return session.session_token
+
+
+@pytest.mark.unittest
+class TestRepositoryLocal:
+    def test_write_single_package(self, repo, image_files):
+        token = _write_samples(repo, image_files)
+        tar_files = glob.glob(os.path.join(repo._repo_dir, 'images', '*', '*.tar'))
+        assert [os.path.basename(file) for file in tar_files] == [f'{token}.tar']
+
+        (name, df), = repo.read_unarchived_tables()
+        assert name == token
+        assert len(df) == 10
+        assert set(df['archive_file']) == {f'images/{token[:8]}/{token}.tar'}
+
+    def test_write_sharded_by_members(self, repo, image_files):
+        token = _write_samples(repo, image_files, package_policy=PackagePolicy(max_members=3))
+        tar_files = glob.glob(os.path.join(repo._repo_dir, 'images', '*', '*.tar'))
+        assert sorted(os.path.basename(file) for file in tar_files) == [f'{token}-{i}.tar' for i in range(4)]
+        for tar_file in tar_files:
+            assert os.path.exists(os.path.splitext(tar_file)[0] + '.json')
+
+        (_, df), = repo.read_unarchived_tables()
+        assert df.groupby('archive_file').size().tolist() == [3, 3, 3, 1]
+
+        repo.squash()
+        df = repo.read_table()
+        for item in df.to_dict('records'):
+            dst_file = os.path.join(repo._repo_dir, '..', 'check', item['filename'])
+            repo._download_image_file(item['archive_file'], item['filename'], dst_file)
+            assert Image.open(dst_file).size == (item['width'], item['height'])
+
+    def test_write_sharded_by_size(self, repo, image_files):
+        # each member takes 1KiB, a 10KiB archive holds 9 of them with the end-of-archive marker
+        _write_samples(repo, image_files, package_policy=PackagePolicy(max_size='10KiB'))
+        (_, df), = repo.read_unarchived_tables()
+        assert len(df) == 10
+        assert sorted(df.groupby('archive_file').size()) == [1, 9]
+        for archive_file in set(df['archive_file']):
+            assert os.path.getsize(os.path.join(repo._repo_dir, archive_file)) <= 10240
+
+    def test_write_sharded_by_size_long_names(self, repo, image_files):
+        # names longer than 100 chars take extra pax header blocks
+        _write_samples(repo, image_files, package_policy=PackagePolicy(max_size='10KiB'), prefix='x' * 120)
+        (_, df), = repo.read_unarchived_tables()
+        assert len(df) == 10
+        assert df.groupby('archive_file').ngroups > 2
+        for archive_file in set(df['archive_file']):
+            assert os.path.getsize(os.path.join(repo._repo_dir, archive_file)) <= 10240
+
+    def test_package_policy_invalid(self):
+        with pytest.raises(ValueError):
+            PackagePolicy(max_members=0)
+        with pytest.raises(ValueError):
+            PackagePolicy(max_size=0)
+
+    def test_squash(self, repo, image_files):
+        _write_samples(repo, image_files[:6], prefix='a')
+        _write_samples(repo, image_files[4:], prefix='b')
+        repo.squash()
+        df = repo.read_table()
+        assert isinstance(df, pd.DataFrame)
+        assert len(df) == 12
+        assert repo.read_unarchived_tables() == []
+
+    def test_squash_compact(self, repo, image_files):
+        _write_samples(repo, image_files, prefix='a')
+        repo.squash()
+        # overwrite most of the samples of the first package
+        with repo.write(author='tester') as session:
+            for i, file in enumerate(image_files[:8]):
+                session.add(f'a_{i}', file, 'dog')
+        _write_samples(repo, image_files[:2], prefix='c')
+        old_archives = set(repo._list_archive_members())
+        assert len(old_archives) == 3
+
+        repo.squash(compact=True, compact_threshold=0.5, package_policy=PackagePolicy(max_members=4))
+        archive_members = repo._list_archive_members()
+        df = repo.read_table()
+        assert len(df) == 12
+        assert set(df['archive_file']) == set(archive_members)
+        # only the first package is compacted, the others are all alive
+        assert len(set(archive_members) & old_archives) == 2
+        assert sum(archive_members.values()) == 12
+        # images of the superseded records are dropped with the compacted archive
+        df_history = repo.get_history('a_0')
+        assert len(df_history) == 1
+        assert df_history['archive_file'].isna().all()
+        for item in df.to_dict('records'):
+            dst_file = os.path.join(repo._repo_dir, '..', 'check', item['filename'])
+            repo._download_image_file(item['archive_file'], item['filename'], dst_file)
+            assert Image.open(dst_file).size == (item['width'], item['height'])
+
+    def test_squash_compact_package_being_written(self, repo, image_files):
+        _write_samples(repo, image_files[:4], prefix='a')
+        repo.squash()
+        # tar is copied before its package table is written, it is not dead
+        tar_file = os.path.join(repo._repo_dir, 'images', 'writing', 'writing.tar')
+        os.makedirs(os.path.dirname(tar_file), exist_ok=True)
+        with tarfile.open(tar_file, 'w') as tar:
+            tar.add(image_files[4], '4.png')
+
+        repo.squash(compact=True)
+        assert os.path.exists(tar_file)
+        assert len(repo.read_table()) == 4
+
+    def test_export_webdataset(self, repo, image_files, temp_dir):
+        _write_samples(repo, image_files, package_policy=PackagePolicy(max_members=3))
+        repo.squash()
+        dst_dir = os.path.join(temp_dir, 'export')
+        shard_files = repo.export(dst_dir, format='webdataset', shard_size=4, shuffle=True, seed=0)
+        assert [os.path.basename(file) for file in shard_files] == \
+               ['data-000000.tar', 'data-000001.tar', 'data-000002.tar']
+
+        names = []
+        for file in shard_files:
+            with tarfile.open(file, 'r') as tar:
+                names.extend(tar.getnames())
+        assert sorted(names) == sorted([
+            *(f'sample_{i}.png' for i in range(10)),
+            *(f'sample_{i}.json' for i in range(10)),
+        ])
+
+    def test_export_webdataset_keys(self, repo, image_files, temp_dir):
+        ids = ['a.b', 'a_b', 'a b', 'a%2Eb']
+        with repo.write(author='tester') as session:
+            for id_, file in zip(ids, image_files):
+                session.add(id_, file, 'cat')
+        repo.squash()
+        shard_file, = repo.export(os.path.join(temp_dir, 'export'), format='webdataset')
+        with tarfile.open(shard_file, 'r') as tar:
+            keys = [name[:-len('.json')] for name in tar.getnames() if name.endswith('.json')]
+        assert len(set(keys)) == len(ids)
+        assert all('.' not in key and '/' not in key for key in keys)
+        assert sorted(unquote(key) for key in keys) == sorted(ids)
+
+    def test_export_parquet(self, repo, image_files, temp_dir):
+        _write_samples(repo, image_files)
+        repo.squash()
+        dst_dir = os.path.join(temp_dir, 'export')
+        shard_file, = repo.export(dst_dir, format='parquet', shard_size=100)
+        df = pd.read_parquet(shard_file)
+        assert len(df) == 10
+        for item in df.to_dict('records'):
+            image = Image.open(io.BytesIO(item['image']))
+            assert image.size == (item['width'], item['height'])
+
+    def test_iter_samples(self, repo, image_files):
+        _write_samples(repo, image_files, package_policy=PackagePolicy(max_members=4))
+        repo.squash()
+
+        batches = list(repo.iter_samples(columns=['id', 'annotation', 'width'], batch_size=3, workers=2))
+        assert [len(batch) for batch in batches] == [3, 3, 3, 1]
+        for batch in batches:
+            for row, image in batch:
+                assert set(row.keys()) == {'id', 'annotation', 'width'}
+                assert image.width == row['width']
+
+        ids = sorted(row['id'] for batch in repo.iter_samples(filters=[('annotation', '==', 'cat')])
+                     for row, _ in batch)
+        assert ids == [f'sample_{i}' for i in range(0, 10, 2)]
+
+    def test_iter_samples_empty(self, repo):
+        assert list(repo.iter_samples()) == []
+
+    def test_writer_session_proxy(self, repo, temp_dir):
+        large_file = os.path.join(temp_dir, 'large.png')
+        Image.new('RGB', (3000, 1500), 'red').save(large_file)
+        small_file = os.path.join(temp_dir, 'small.png')
+        Image.new('RGB', (300, 150), 'red').save(small_file)
+
+        session = repo.write(proxy_size=1024)
+        session.add('large', large_file, None)
+        session.add('small', small_file, None)
+        assert Image.open(session.get_proxy_path('large')).size == (1024, 512)
+        assert session.get_proxy_path('small') == session.get_image_path('small')
+        proxy_file = session.get_proxy_path('large')
+        del session['large']
+        assert not os.path.exists(proxy_file)
+        session.close()
+
+        # no proxy by default, it is only made for the annotator ui
+        with repo.write() as session:
+            session.add('large', large_file, None)
+            assert session.get_proxy_path('large') == session.get_image_path('large')
+
+    def test_writer_session_update(self, repo, image_files):
+        session = repo.write()
+        for i, image_file in enumerate(image_files[:3]):
+            session.add(f'sample_{i}', image_file, None)
+        session.update({'sample_0': 'cat', 'sample_2': 'dog'})
+        assert [session[f'sample_{i}'] for i in range(3)] == ['cat', None, 'dog']
+
+        with pytest.raises(KeyError):
+            session.update({'sample_1': 'cat', 'sample_x': 'dog'})
+        assert session['sample_1'] is None
+        with pytest.raises(Exception):
+            session.update({'sample_1': 'bird'})
+        assert session['sample_1'] is None
+        session.close()
+
+    def test_writer_session_navigation(self, repo, image_files):
+        session = repo.write()
+        navigation = session.navigation
+        assert navigation.position == -1
+        assert [navigation.append(f'sample_{i}') for i in range(3)] == [0, 1, 2]
+        navigation.seek(1)
+        navigation.finish()
+        with pytest.raises(IndexError):
+            navigation.seek(3)
+
+        replayed = NavigationLog(os.path.join(session.storage_dir, 'navigation.jsonl'))
+        assert replayed[:] == ['sample_0', 'sample_1', 'sample_2']
+        assert replayed.position == 1
+        assert replayed.max_length == 3
+        session.close()
+
+    def test_squash_qc_votes(self, repo, image_files):
+        for author, labels in [('alice', ['cat', 'dog', 'cat']), ('bob', ['cat', 'cat', 'cat'])]:
+            with repo.write(author=author) as session:
+                for i, label in enumerate(labels):
+                    session.add(f'sample_{i}', image_files[i], label)
+        with repo.write(author='carol') as session:
+            session.add('sample_9', image_files[9], 'dog')
+        repo.squash()
+
+        df_votes = pd.read_parquet(os.path.join(repo._repo_dir, 'qc', 'votes.parquet'))
+        assert len(df_votes) == 6
+        assert sorted(set(df_votes['author'])) == ['alice', 'bob']
+        with open(os.path.join(repo._repo_dir, 'qc', 'agreement.json'), 'r') as f:
+            agreement = json.load(f)
+        assert agreement['samples'] == 3
+        assert agreement['votes'] == 6
+        assert agreement['unanimous_ratio'] == pytest.approx(2 / 3)
+        assert agreement['authors']['alice']['agreement'] == pytest.approx(2 / 3)
+        assert agreement['labels']['dog']['agreement'] == 0.0
+
+    def test_squash_no_qc_votes(self, repo, image_files):
+        _write_samples(repo, image_files)
+        repo.squash()
+        assert not os.path.exists(os.path.join(repo._repo_dir, 'qc'))
+
+    def test_squash_history(self, repo, image_files):
+        _write_samples(repo, image_files[:4])
+        repo.squash()
+        assert len(repo.get_history('sample_0')) == 0
+
+        with repo.write(author='alice') as session:
+            session.add('sample_0', image_files[0], 'dog')
+            session.add('sample_1', image_files[1], 'cat')
+        with repo.write(author='bob') as session:
+            session.add('sample_0', image_files[0], 'cat')
+        repo.squash()
+
+        history_files = glob.glob(os.path.join(repo._repo_dir, 'history', 'bucket=*', '*.parquet'))
+        assert len(history_files) >= 1
+        df_history = repo.get_history('sample_0')
+        assert len(df_history) == 2
+        assert df_history['updated_at'].is_monotonic_increasing
+        assert df_history['author'].tolist()[0] == 'tester'
+        assert len(repo.get_history('sample_1')) == 1
+        assert len(repo.get_history('sample_2')) == 0
+        assert len(repo.read_table()) == 4
+
+        # files of the older layout, one for each squash
+        for file in history_files:
+            os.rename(file, os.path.join(os.path.dirname(file), '20240101000000_legacy.parquet'))
+        # merged into the bucket files, instead of one more file for each squash
+        for i in range(3):
+            with repo.write(author='carol') as session:
+                session.add('sample_0', image_files[0], 'dog' if i % 2 == 0 else 'cat')
+            repo.squash()
+        assert len(repo.get_history('sample_0')) == 5
+        bucket_files = glob.glob(os.path.join(repo._repo_dir, history_bucket_dir(history_bucket('sample_0')), '*'))
+        assert [os.path.basename(file) for file in bucket_files] == ['history.parquet']
+
+    def test_squash_max_packages(self, repo, image_files):
+        _write_samples(repo, image_files[:2], prefix='a')
+        _write_samples(repo, image_files[2:4], prefix='b')
+        _write_samples(repo, image_files[4:6], prefix='c')
+        readme_file = os.path.join(repo._repo_dir, 'README.md')
+        with open(readme_file, 'r') as f:
+            readme = f.read()
+
+        repo.squash(max_packages=2, readme=False)
+        assert sorted(repo.read_table()['id']) == ['a_0', 'a_1', 'b_0', 'b_1']
+        assert len(repo.list_unarchived_packages()) == 1
+        with open(readme_file, 'r') as f:
+            assert f.read() == readme
+
+        repo.squash(max_packages=2)
+        assert len(repo.read_table()) == 6
+        assert repo.list_unarchived_packages() == []
+        with open(readme_file, 'r') as f:
+            assert f.read() != readme
+
+        with pytest.raises(ValueError):
+            repo.squash(max_packages=0)
+
+    def test_squash_compact_max_packages(self, repo, image_files):
+        _write_samples(repo, image_files[:2], prefix='a')
+        _write_samples(repo, image_files[2:4], prefix='b')
+        _write_samples(repo, image_files[4:6], prefix='c')
+
+        # archives of the pending packages are not dead, they are just not merged yet
+        repo.squash(compact=True, max_packages=1)
+        assert sorted(repo.read_table()['id']) == ['a_0', 'a_1']
+        assert len(repo._list_archive_members()) == 3
+        repo.squash(compact=True)
+        df = repo.read_table()
+        assert len(df) == 6
+        for item in df.to_dict('records'):
+            dst_file = os.path.join(repo._repo_dir, '..', 'check', item['filename'])
+            repo._download_image_file(item['archive_file'], item['filename'], dst_file)
+            assert Image.open(dst_file).size == (item['width'], item['height'])
+
+    def test_watch_squash(self, repo, image_files):
+        for i in range(5):
+            _write_samples(repo, image_files[i * 2:i * 2 + 2], prefix=f'p{i}')
+
+        squash_calls = []
+        origin_squash = repo.squash
+
+        def _squash(**kwargs):
+            squash_calls.append(kwargs)
+            origin_squash(**kwargs)
+
+        repo.squash = _squash
+        stop_event = threading.Event()
+        thread = threading.Thread(target=watch_squash, kwargs=dict(
+            repo=repo, interval=0.05, max_packages=2, readme_interval=0.0, stop_event=stop_event))
+        thread.start()
+        try:
+            for _ in range(200):
+                if not repo.list_unarchived_packages() and squash_calls:
+                    break
+                threading.Event().wait(0.05)
+            assert repo.list_unarchived_packages() == []
+            _write_samples(repo, image_files[:1], prefix='late')
+            for _ in range(200):
+                if not repo.list_unarchived_packages():
+                    break
+                threading.Event().wait(0.05)
+        finally:
+            stop_event.set()
+            thread.join()
+
+        assert len(repo.read_table()) == 11
+        assert [call['max_packages'] for call in squash_calls] == [2, 2, 2, 2]
+        # readme is only rendered with the last batch of a backlog
+        assert [call['readme'] for call in squash_calls] == [False, False, True, True]
@@ -0,0 +1,43 @@
+import pandas as pd
+import pytest
+
+from felinewhisker.repository.qc import update_votes, compute_agreement
+
+
+def _votes(rows):
+    return pd.DataFrame(rows, columns=['id', 'author', 'annotation', 'updated_at'])
+
+
+@pytest.mark.unittest
+class TestRepositoryQc:
+    def test_update_votes(self):
+        df_data = _votes([('a', 'alice', 'cat', 1.0), ('b', 'alice', 'dog', 1.0)])
+        df_votes = update_votes(None, df_data, [
+            _votes([('a', 'bob', 'dog', 2.0), ('c', 'bob', 'cat', 2.0)]),
+            _votes([('a', 'bob', 'cat', 3.0), ('c', None, 'cat', 3.0)]),
+        ])
+        assert df_votes[['id', 'author', 'annotation']].values.tolist() == [
+            ['a', 'alice', 'cat'],
+            ['a', 'bob', 'cat'],
+        ]
+
+        df_votes = update_votes(df_votes, df_data, [_votes([('b', 'carol', 'cat', 4.0)])])
+        assert df_votes[['id', 'author']].values.tolist() == [
+            ['a', 'alice'], ['a', 'bob'], ['b', 'alice'], ['b', 'carol'],
+        ]
+
+    def test_compute_agreement(self):
+        agreement = compute_agreement(_votes([
+            ('a', 'alice', 'cat', 1.0), ('a', 'bob', 'cat', 1.0), ('a', 'carol', 'dog', 1.0),
+            ('b', 'alice', 'dog', 1.0), ('b', 'bob', 'dog', 1.0),
+        ]))
+        assert agreement['samples'] == 2
+        assert agreement['votes'] == 5
+        assert agreement['pairwise_agreement'] == pytest.approx((1 / 3 + 1) / 2)
+        assert agreement['unanimous_ratio'] == 0.5
+        assert agreement['labels']['cat'] == {'votes': 2, 'agreement': 0.5}
+        assert agreement['authors']['carol'] == {'votes': 1, 'agreement': 0.0}
+        assert agreement['authors']['bob']['agreement'] == pytest.approx(2 / 3)
+
+    def test_compute_agreement_empty(self):
+        assert compute_agreement(_votes([]))['samples'] == 0
@@ -0,0 +1,51 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+_HEAVY_MODULES = ['gradio', 'InquirerPy', 'cheesechaser', 'pilmoji', 'huggingface_hub']
+
+
+def _import_in_subprocess(module: str):
+    code = f'import sys, time\n' \
+           f't = time.perf_counter()\n' \
+           f'import {module}\n' \
+           f'print(time.perf_counter() - t)\n' \
+           f'print(",".join(name for name in {_HEAVY_MODULES!r} if name in sys.modules))\n'
+    output = subprocess.check_output([sys.executable, '-c', code], text=True)
+    seconds, loaded = output.split('\n')[:2]
+    return float(seconds), [name for name in loaded.split(',') if name]
+
+
+@pytest.mark.unittest
+class TestLazyImports:
+    @pytest.mark.parametrize('module', [
+        'felinewhisker.repository',
+        'felinewhisker.datasource',
+        'felinewhisker.tasks',
+        'felinewhisker.utils',
+    ])
+    def test_no_heavy_modules(self, module):
+        _, loaded = _import_in_subprocess(module)
+        assert loaded == []
+
+    def test_lazy_members(self):
+        from felinewhisker.repository import HfOnlineRepository
+        from felinewhisker.datasource import CheeseChaserDataSource
+        from felinewhisker.utils import emoji_image_file, MultiStringEmptyValidator
+        from felinewhisker.tasks.classification import create_annotator_ui_for_classification
+        assert all(map(callable, [HfOnlineRepository, CheeseChaserDataSource, emoji_image_file,
+                                  MultiStringEmptyValidator, create_annotator_ui_for_classification]))
+
+        import felinewhisker.repository
+        with pytest.raises(AttributeError):
+            _ = felinewhisker.repository.NotExistRepository
+
+
+@pytest.mark.benchmark
+class TestImportTime:
+    def test_repository_import_time(self):
+        budget = float(os.environ.get('FELINEWHISKER_IMPORT_BUDGET', '3.0'))
+        seconds, _ = _import_in_subprocess('felinewhisker.repository')
+        assert seconds < budget
@@ -0,0 +1,63 @@
+import time
+
+import pytest
+from PIL import Image
+
+from felinewhisker.datasource import BaseDataSource
+from felinewhisker.repository import LocalRepository
+from felinewhisker.ui.staging import SampleStager
+
+
+class _ColorDataSource(BaseDataSource):
+    def __init__(self, count):
+        BaseDataSource.__init__(self)
+        self._count = count
+
+    def _iter(self):
+        for i in range(self._count):
+            yield f'sample_{i}', Image.new('RGB', (32, 32), (i * 20, 0, 0)), None
+
+
+@pytest.fixture()
+def repo(tmp_path):
+    return LocalRepository.init(
+        task_type='classification',
+        local_dir=str(tmp_path / 'repo'),
+        task_name='Test Task',
+        labels=['cat', 'dog'],
+    )
+
+
+@pytest.mark.unittest
+class TestUiStaging:
+    def test_stager(self, repo):
+        with repo.write() as write_session:
+            stager = SampleStager(_ColorDataSource(5), write_session, ahead=2)
+            try:
+                assert stager.pop() == 'sample_0'
+                assert write_session.is_id_duplicated('sample_0')
+                popped = ['sample_0']
+                while True:
+                    assert len(stager.peek()) <= 2
+                    sample_id = stager.pop()
+                    if sample_id is None:
+                        break
+                    popped.append(sample_id)
+                assert popped == [f'sample_{i}' for i in range(5)]
+                assert stager.peek() == []
+            finally:
+                stager.close()
+
+    def test_stager_set_ahead(self, repo):
+        with repo.write() as write_session:
+            stager = SampleStager(_ColorDataSource(10), write_session, ahead=1)
+            try:
+                assert stager.pop() == 'sample_0'
+                stager.set_ahead(4)
+                for _ in range(100):
+                    if len(stager.peek()) == 4:
+                        break
+                    time.sleep(0.02)
+                assert stager.peek() == [f'sample_{i}' for i in range(1, 5)]
+            finally:
+                stager.close()
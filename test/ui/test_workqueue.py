@@ -0,0 +1,73 @@
+import time
+
+import pytest
+from PIL import Image
+
+from felinewhisker.datasource import ImageItem
+from felinewhisker.ui.workqueue import WorkQueue, is_qc_sample
+
+
+def _items(count):
+    return [ImageItem(f'sample_{i}', Image.new('RGB', (1, 1)), None) for i in range(count)]
+
+
+@pytest.mark.unittest
+class TestUiWorkQueue:
+    def test_acquire_no_duplicates(self):
+        queue = WorkQueue(_items(6), prefetch=2)
+        ids = []
+        while True:
+            item_a, item_b = queue.acquire('alice'), queue.acquire('bob')
+            ids.extend(item.id for item in (item_a, item_b) if item is not None)
+            if item_a is None or item_b is None:
+                break
+        assert sorted(ids) == [f'sample_{i}' for i in range(6)]
+        assert queue.acquire('alice') is None
+        assert queue.contains_id('sample_3')
+        assert not queue.contains_id('sample_6')
+
+    def test_lease_complete(self):
+        queue = WorkQueue(_items(2))
+        item = queue.acquire('alice')
+        assert queue.is_leased_by('alice', item.id)
+        assert not queue.is_leased_by('bob', item.id)
+        assert not queue.complete('bob', item.id)
+        assert queue.complete('alice', item.id)
+        assert queue.complete('alice', item.id)
+        assert queue.renew('alice', item.id)
+
+    def test_completed_evicted(self):
+        queue = WorkQueue(_items(6) + _items(2), qc_fraction=1.0, qc_annotators=2, completed_history=4)
+        for item in queue.iter_for('alice'):
+            assert queue.complete('alice', item.id)
+        # still waiting for the second annotator
+        assert len(queue._entries) == 6
+        for item in queue.iter_for('bob'):
+            assert queue.complete('bob', item.id)
+        assert queue._entries == {}
+        assert len(queue._completed) == 4
+        assert queue.contains_ids(['sample_0', 'sample_5', 'sample_6']) == [True, True, False]
+
+    def test_lease_expired(self):
+        queue = WorkQueue(_items(1), lease_timeout=0.1)
+        item = queue.acquire('alice')
+        time.sleep(0.2)
+        reassigned = queue.acquire('bob')
+        assert reassigned.id == item.id
+        assert not queue.renew('alice', item.id)
+        assert not queue.complete('alice', item.id)
+        assert queue.complete('bob', item.id)
+        assert queue.acquire('alice') is None
+
+    def test_qc_routing(self):
+        queue = WorkQueue(_items(20), qc_fraction=1.0, qc_annotators=2)
+        alice = [item.id for item in queue.iter_for('alice')]
+        bob = [item.id for item in queue.iter_for('bob')]
+        assert sorted(alice) == sorted(bob) == sorted(f'sample_{i}' for i in range(20))
+        assert queue.acquire('carol') is None
+
+    def test_qc_fraction(self):
+        assert sum(is_qc_sample(f'sample_{i}', 0.1) for i in range(10000)) == pytest.approx(1000, rel=0.15)
+        assert not any(is_qc_sample(f'sample_{i}', 0.0) for i in range(100))
+        with pytest.raises(ValueError):
+            WorkQueue([], qc_fraction=1.5)
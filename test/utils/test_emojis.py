@@ -0,0 +1,65 @@
+import os
+import threading
+from unittest.mock import patch
+
+import pytest
+
+from felinewhisker.utils import emoji_image_file, prefetch_emojis
+from felinewhisker.utils.emojis import dispatch
+
+
+@pytest.fixture
+def emoji_cache(tmp_path):
+    with patch.dict(os.environ, {'FELINEWHISKER_EMOJI_CACHE': str(tmp_path)}), \
+            patch.object(dispatch, '_pending', {}):
+        yield tmp_path
+
+
+def _fake_download(release: threading.Event = None, fail: bool = False):
+    def _download(emoji, style):
+        if release is not None:
+            release.wait()
+        if fail:
+            return None
+        dst_file = dispatch._cache_dir() / style / f'{dispatch._short_tag(emoji)}.png'
+        os.makedirs(dst_file.parent, exist_ok=True)
+        dst_file.write_bytes(b'png')
+        return str(dst_file)
+
+    return _download
+
+
+@pytest.mark.unittest
+class TestEmojis:
+    def test_bundled(self, emoji_cache):
+        with patch.object(dispatch, '_download_emoji', side_effect=AssertionError('no download expected')):
+            emojis = [
+                *(f':keycap_{i}:' for i in range(10)),
+                *(f':keycap_{chr(ord("A") + i)}:' for i in range(26)),
+                ':left_arrow:', ':right_arrow:', ':floppy_disk:', ':no_entry:',
+            ]
+            prefetch_emojis(emojis)
+            for emoji in emojis:
+                file = emoji_image_file(emoji)
+                assert os.path.dirname(file) == str(dispatch._EMOJIS_DIR)
+
+    def test_not_ready(self, emoji_cache):
+        release = threading.Event()
+        with patch.object(dispatch, '_download_emoji', side_effect=_fake_download(release)) as download:
+            assert emoji_image_file(':cat_face:', timeout=0.1) is None
+            prefetch_emojis([':cat_face:'], timeout=0.1)
+            release.set()
+            file = emoji_image_file(':cat_face:')
+            assert file == str(emoji_cache / 'twitter' / 'cat_face.png')
+            assert emoji_image_file(':cat_face:') == file
+            assert download.call_count == 1
+
+    def test_other_style(self, emoji_cache):
+        with patch.object(dispatch, '_download_emoji', side_effect=_fake_download()):
+            assert emoji_image_file(':no_entry:', style='apple') == str(emoji_cache / 'apple' / 'no_entry.png')
+
+    def test_failed(self, emoji_cache):
+        with patch.object(dispatch, '_download_emoji', side_effect=_fake_download(fail=True)) as download:
+            assert emoji_image_file(':dog_face:') is None
+            assert emoji_image_file(':dog_face:') is None
+            assert download.call_count == 2
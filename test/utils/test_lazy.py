@@ -0,0 +1,22 @@
+import types
+
+import pytest
+
+from felinewhisker.utils.lazy import lazy_attrs
+
+
+@pytest.mark.unittest
+class TestUtilsLazy:
+    def test_lazy_attrs(self):
+        module = types.ModuleType('felinewhisker.fake')
+        module.__getattr__, module.__dir__ = lazy_attrs('felinewhisker.fake', module.__dict__, {
+            'dict_merge': 'felinewhisker.utils.dict',
+        })
+        assert 'dict_merge' not in module.__dict__
+        assert 'dict_merge' in dir(module)
+
+        from felinewhisker.utils.dict import dict_merge
+        assert module.dict_merge is dict_merge
+        assert module.__dict__['dict_merge'] is dict_merge
+        with pytest.raises(AttributeError):
+            _ = module.not_exist
@@ -0,0 +1,123 @@
+import os
+import time
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+from PIL import Image, JpegImagePlugin
+from imgutils.data import load_image
+
+from felinewhisker.utils import padding_align, load_image_fit, area_fit_size, box_fit_size
+from felinewhisker.utils.resize import resize
+
+
+@pytest.fixture
+def jpeg_file(tmp_path):
+    file = str(tmp_path / 'large.jpg')
+    Image.new('RGB', (4000, 3000), 'red').save(file)
+    return file
+
+
+def _make_jpeg(tmp_path, size):
+    file = str(tmp_path / f'{size[0]}x{size[1]}.jpg')
+    array = np.random.RandomState(0).randint(0, 256, (size[1] // 8, size[0] // 8, 3), dtype=np.uint8)
+    Image.fromarray(array).resize(size, resample=Image.BILINEAR).save(file, quality=90)
+    return file
+
+
+@pytest.mark.unittest
+class TestUtilsResize:
+    def test_fit_size(self):
+        assert area_fit_size((100, 50), 10000) == (100, 50)
+        assert area_fit_size((4000, 3000), 2048 ** 2) == (2365, 1774)
+        assert box_fit_size((4000, 3000), (512, 768)) == (512, 384)
+        assert box_fit_size((10000, 1), (512, 768)) == (512, 1)
+
+    @pytest.mark.parametrize('size', [(64, 48), (4000, 3000)])
+    def test_load_image_fit_closed(self, tmp_path, size):
+        file = str(tmp_path / 'image.png')
+        Image.new('RGB', size, 'red').save(file)
+        opened = []
+
+        def _open(*args, **kwargs):
+            opened.append(origin_open(*args, **kwargs))
+            return opened[-1]
+
+        origin_open = Image.open
+        with patch.object(Image, 'open', side_effect=_open):
+            image = load_image_fit(file, lambda s: area_fit_size(s, 1024 ** 2))
+        assert len(opened) == 1 and opened[0].fp is None
+        assert image.getpixel((0, 0)) == (255, 0, 0)
+
+    def test_load_image_fit_draft(self, jpeg_file):
+        origin_draft = JpegImagePlugin.JpegImageFile.draft
+        with patch.object(JpegImagePlugin.JpegImageFile, 'draft', autospec=True, side_effect=origin_draft) as draft:
+            image = load_image_fit(jpeg_file, lambda size: area_fit_size(size, 1024 ** 2))
+        assert image.size == (1182, 887)
+        assert image.mode == 'RGB'
+        assert draft.call_count == 1
+
+    def test_load_image_fit_loaded(self):
+        image = Image.new('RGBA', (300, 200), (255, 0, 0, 0))
+        resized = load_image_fit(image, lambda size: box_fit_size(size, (150, 150)),
+                                 mode='RGBA', force_background=None)
+        assert resized.size == (150, 100)
+        assert resized.mode == 'RGBA'
+
+    @pytest.mark.parametrize('mode', ['RGB', 'L'])
+    def test_backends(self, mode):
+        image = Image.fromarray(np.random.RandomState(0).randint(0, 256, (400, 600, 3), dtype=np.uint8)).convert(mode)
+        pil_image = resize(image, (150, 100), backend='pil')
+        cv2_image = resize(image, (150, 100), backend='cv2')
+        assert pil_image.size == cv2_image.size == (150, 100)
+        assert pil_image.mode == cv2_image.mode == mode
+        diff = np.abs(np.asarray(pil_image, dtype=np.float32) - np.asarray(cv2_image, dtype=np.float32))
+        assert diff.mean() < 8.0
+
+    def test_backend_fallback(self):
+        image = Image.new('RGBA', (400, 300))
+        assert resize(image, (200, 150)).size == (200, 150)
+        assert resize(image, (400, 300)) is image
+        with patch('felinewhisker.utils.resize._get_cv2', return_value=None):
+            assert resize(Image.new('RGB', (400, 300)), (200, 150)).size == (200, 150)
+        with pytest.raises(RuntimeError):
+            resize(image, (200, 150), backend='cv2')
+        with pytest.raises(ValueError):
+            resize(image, (200, 150), backend='simd')
+
+    def test_padding_align(self, jpeg_file):
+        image = padding_align(jpeg_file, (512, 768), color='#00000000')
+        assert image.size == (512, 768)
+        assert image.mode == 'RGBA'
+        assert np.abs(np.array(image.getpixel((256, 384))) - [255, 0, 0, 255]).max() <= 2
+        assert image.getpixel((0, 0)) == (0, 0, 0, 0)
+
+
+@pytest.mark.benchmark
+class TestUtilsResizeBenchmark:
+    @pytest.mark.parametrize('size, drafted', [
+        ((3840, 2160), False),
+        ((7680, 4320), True),
+    ])
+    def test_decode_resize(self, tmp_path, size, drafted):
+        file = _make_jpeg(tmp_path, size)
+
+        def _naive():
+            image = load_image(file, mode='RGB', force_background='white')
+            return image.resize(area_fit_size(image.size, 1536 ** 2), resample=Image.BICUBIC)
+
+        def _fitted():
+            return load_image_fit(file, lambda s: area_fit_size(s, 1536 ** 2))
+
+        timings = {}
+        for name, fn in [('naive', _naive), ('fitted', _fitted)]:
+            fn()
+            start = time.perf_counter()
+            for _ in range(3):
+                image = fn()
+            timings[name] = (time.perf_counter() - start) / 3
+            assert image.size == area_fit_size(size, 1536 ** 2)
+        print(f'{os.path.basename(file)}: {timings!r}')
+        if drafted:
+            # decoded in half scale, the gain is large enough to be stable
+            assert timings['fitted'] < timings['naive']